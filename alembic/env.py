@@ -17,6 +17,7 @@ from core.models import WebsocketsConnections
 from core.models.pending_messages import PendingMessages
 from core.models.payments import Payments
 from core.models.ws_history_message import WebsocketMessageHistory
+from core.models.media import MediaFiles
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
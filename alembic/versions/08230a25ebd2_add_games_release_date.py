@@ -0,0 +1,97 @@
+"""add games release_date
+
+Revision ID: 08230a25ebd2
+Revises: 97e97f9feba8
+Create Date: 2026-10-18 11:40:52.671904
+
+"""
+
+from datetime import date, datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "08230a25ebd2"
+down_revision: Union[str, Sequence[str], None] = "97e97f9feba8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Копия parse_release_date из core/models/games.py на момент миграции: ее
+# изменения не должны менять то, что делает уже примененная миграция
+RELEASE_DATE_FORMATS = ["%B %d, %Y", "%b %d, %Y", "%Y-%m-%d", "%d.%m.%Y"]
+
+
+def parse_release_date(release_year: str | None) -> date | None:
+    if not release_year:
+        return None
+    for fmt in RELEASE_DATE_FORMATS:
+        try:
+            return datetime.strptime(release_year, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("games", sa.Column("release_date", sa.Date(), nullable=True))
+    # Заполняем тем же разбором, что и @validates в модели:
+    # невалидная дата (2016-02-30, Feb 30, 2016) дает NULL, а не ошибку
+    games = sa.table(
+        "games",
+        sa.column("id", sa.BigInteger),
+        sa.column("release_year", sa.String),
+        sa.column("release_date", sa.Date),
+    )
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(games.c.id, games.c.release_year).where(
+            games.c.release_year.is_not(None)
+        )
+    )
+    params = [
+        {"b_id": game_id, "b_date": release_date}
+        for game_id, release_year in rows
+        if (release_date := parse_release_date(release_year)) is not None
+    ]
+    if params:
+        bind.execute(
+            sa.update(games)
+            .where(games.c.id == sa.bindparam("b_id"))
+            .values(release_date=sa.bindparam("b_date")),
+            params,
+        )
+    # Индекс по выражению больше не нужен - is_future работает по release_date
+    op.drop_index("ix_games_release_date", table_name="games")
+    op.execute("DROP FUNCTION IF EXISTS games_release_date(text)")
+    op.create_index(op.f("ix_games_release_date"), "games", ["release_date"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_games_release_date"), table_name="games")
+    op.drop_column("games", "release_date")
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION games_release_date(release_year text)
+        RETURNS date
+        LANGUAGE plpgsql
+        IMMUTABLE
+        AS $$
+        BEGIN
+            RETURN to_date(release_year, 'Month DD, YYYY');
+        EXCEPTION WHEN data_exception THEN
+            -- Другой формат или несуществующая дата: NULL, а не ошибка INSERT
+            RETURN NULL;
+        END
+        $$
+        """
+    )
+    op.create_index(
+        "ix_games_release_date",
+        "games",
+        [sa.text("games_release_date(release_year)")],
+    )
@@ -0,0 +1,42 @@
+"""index games release_date nulls first
+
+Revision ID: 48320a8c5dc4
+Revises: e6ec3fadb28c
+Create Date: 2026-10-18 23:58:03.114927
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "48320a8c5dc4"
+down_revision: Union[str, Sequence[str], None] = "e6ec3fadb28c"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Прямой проход - release_date ASC NULLS FIRST, обратный - DESC NULLS LAST
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_games_release_date_id",
+            "games",
+            [sa.text("release_date ASC NULLS FIRST"), "id"],
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_games_release_date",
+            table_name="games",
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index("ix_games_release_date", "games", ["release_date"])
+    op.drop_index("ix_games_release_date_id", table_name="games")
@@ -0,0 +1,69 @@
+"""add dialog history cursor indexes
+
+Revision ID: 601f6135d411
+Revises: 08230a25ebd2
+Create Date: 2026-10-18 19:09:44.408627
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "601f6135d411"
+down_revision: Union[str, Sequence[str], None] = "08230a25ebd2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Составные индексы покрывают и поиск по пользователю, одиночные больше не нужны
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_websocketmessagehistory_from_user_id_created_at",
+            "websocketmessagehistory",
+            ["from_user_id", "created_at", "id"],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_websocketmessagehistory_to_user_id_created_at",
+            "websocketmessagehistory",
+            ["to_user_id", "created_at", "id"],
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_websocketmessagehistory_from_user_id",
+            table_name="websocketmessagehistory",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_websocketmessagehistory_to_user_id",
+            table_name="websocketmessagehistory",
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(
+        op.f("ix_websocketmessagehistory_to_user_id"),
+        "websocketmessagehistory",
+        ["to_user_id"],
+    )
+    op.create_index(
+        op.f("ix_websocketmessagehistory_from_user_id"),
+        "websocketmessagehistory",
+        ["from_user_id"],
+    )
+    op.drop_index(
+        "ix_websocketmessagehistory_to_user_id_created_at",
+        table_name="websocketmessagehistory",
+    )
+    op.drop_index(
+        "ix_websocketmessagehistory_from_user_id_created_at",
+        table_name="websocketmessagehistory",
+    )
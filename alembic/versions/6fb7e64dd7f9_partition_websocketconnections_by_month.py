@@ -0,0 +1,227 @@
+"""partition websocketconnections by month
+
+Revision ID: 6fb7e64dd7f9
+Revises: 601f6135d411
+Create Date: 2026-10-18 21:02:17.530194
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "6fb7e64dd7f9"
+down_revision: Union[str, Sequence[str], None] = "601f6135d411"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Партиция месяца: websocketconnections_pYYYY_MM, [начало месяца, начало следующего)
+CREATE_PARTITION = """
+CREATE OR REPLACE FUNCTION websocketconnections_create_partition(month timestamptz)
+RETURNS void LANGUAGE plpgsql AS $$
+DECLARE
+    lower_bound timestamptz := date_trunc('month', month);
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF websocketconnections '
+        'FOR VALUES FROM (%L) TO (%L)',
+        'websocketconnections_p' || to_char(lower_bound, 'YYYY_MM'),
+        lower_bound,
+        lower_bound + interval '1 month'
+    );
+END;
+$$;
+"""
+
+# Создать партиции на текущий и ahead следующих месяцев, удалить старше retention
+MAINTAIN = """
+CREATE OR REPLACE FUNCTION websocketconnections_maintain(ahead int, retention int)
+RETURNS void LANGUAGE plpgsql AS $$
+DECLARE
+    cutoff timestamptz := date_trunc('month', now()) - make_interval(months => retention);
+    partition_name text;
+BEGIN
+    -- Несколько воркеров обслуживают партиции по очереди
+    PERFORM pg_advisory_xact_lock(hashtext('websocketconnections_maintain'));
+    FOR i IN 0..ahead LOOP
+        PERFORM websocketconnections_create_partition(
+            now() + make_interval(months => i)
+        );
+    END LOOP;
+    FOR partition_name IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'websocketconnections'::regclass
+          AND c.relname ~ '^websocketconnections_p\\d{4}_\\d{2}$'
+    LOOP
+        IF to_timestamp(right(partition_name, 7), 'YYYY_MM') < cutoff THEN
+            EXECUTE format('DROP TABLE %I', partition_name);
+        END IF;
+    END LOOP;
+END;
+$$;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.rename_table("websocketconnections", "websocketconnections_old")
+    op.execute(
+        "ALTER TABLE websocketconnections_old "
+        "RENAME CONSTRAINT websocketconnections_pkey TO websocketconnections_old_pkey"
+    )
+    op.execute(
+        "ALTER TABLE websocketconnections_old "
+        "RENAME CONSTRAINT websocketconnections_fkey TO websocketconnections_old_fkey"
+    )
+    op.execute(
+        "ALTER INDEX ix_websocketconnections_username_connected_at "
+        "RENAME TO ix_websocketconnections_old_username_connected_at"
+    )
+
+    op.create_table(
+        "websocketconnections",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("username", sa.Text(), nullable=False),
+        sa.Column("connection_type", sa.Text(), nullable=False),
+        sa.Column(
+            "connected_at",
+            postgresql.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column("disconnected_at", postgresql.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column("ip_address", sa.String(length=50), nullable=True),
+        sa.Column("user_agent", sa.Text(), nullable=True),
+        sa.Column("duration_seconds", sa.Float(), nullable=True),
+        sa.Column(
+            "is_active", sa.Boolean(), server_default=sa.text("false"), nullable=False
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+            name="websocketconnections_fkey",
+            ondelete="CASCADE",
+        ),
+        sa.PrimaryKeyConstraint("id", "connected_at"),
+        postgresql_partition_by="RANGE (connected_at)",
+    )
+    op.create_index(
+        "ix_websocketconnections_username_connected_at",
+        "websocketconnections",
+        ["username", "connected_at"],
+    )
+    op.create_index(
+        "ix_websocketconnections_user_id_connected_at",
+        "websocketconnections",
+        ["user_id", "connected_at"],
+    )
+    op.execute(CREATE_PARTITION)
+    op.execute(MAINTAIN)
+
+    # Партиции под уже накопленные данные и на два месяца вперед
+    op.execute(
+        """
+        SELECT websocketconnections_create_partition(month)
+        FROM generate_series(
+            date_trunc('month', LEAST(
+                (SELECT min(connected_at) FROM websocketconnections_old), now()
+            )),
+            now() + interval '2 months',
+            interval '1 month'
+        ) AS month
+        """
+    )
+    # Строки вне созданных партиций не теряются, а ждут обслуживания здесь
+    op.execute(
+        "CREATE TABLE websocketconnections_default "
+        "PARTITION OF websocketconnections DEFAULT"
+    )
+    op.execute(
+        """
+        INSERT INTO websocketconnections (
+            id, user_id, username, connection_type, connected_at, disconnected_at,
+            ip_address, user_agent, duration_seconds, is_active
+        )
+        SELECT
+            gen_random_uuid(), user_id, username, connection_type,
+            COALESCE(connected_at, disconnected_at, now()), disconnected_at,
+            ip_address, user_agent,
+            EXTRACT(EPOCH FROM disconnected_at - connected_at), is_active
+        FROM websocketconnections_old
+        """
+    )
+    op.drop_table("websocketconnections_old")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.rename_table("websocketconnections", "websocketconnections_partitioned")
+    op.execute(
+        "ALTER TABLE websocketconnections_partitioned "
+        "RENAME CONSTRAINT websocketconnections_pkey "
+        "TO websocketconnections_partitioned_pkey"
+    )
+    op.execute(
+        "ALTER TABLE websocketconnections_partitioned "
+        "RENAME CONSTRAINT websocketconnections_fkey "
+        "TO websocketconnections_partitioned_fkey"
+    )
+    op.execute(
+        "ALTER INDEX ix_websocketconnections_username_connected_at "
+        "RENAME TO ix_websocketconnections_partitioned_username_connected_at"
+    )
+    op.create_table(
+        "websocketconnections",
+        sa.Column("id", sa.BigInteger(), sa.Identity(always=True), nullable=False),
+        sa.Column("username", sa.Text(), nullable=False),
+        sa.Column(
+            "connected_at",
+            postgresql.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.Column("disconnected_at", postgresql.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column("ip_address", sa.String(length=50), nullable=True),
+        sa.Column("user_agent", sa.Text(), nullable=True),
+        sa.Column(
+            "is_active", sa.Boolean(), server_default=sa.text("false"), nullable=False
+        ),
+        sa.Column("connection_type", sa.Text(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+            name="websocketconnections_fkey",
+            ondelete="CASCADE",
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.execute(
+        """
+        INSERT INTO websocketconnections (
+            username, connected_at, disconnected_at, ip_address, user_agent,
+            is_active, connection_type, user_id
+        )
+        SELECT
+            username, connected_at, disconnected_at, ip_address, user_agent,
+            is_active, connection_type, user_id
+        FROM websocketconnections_partitioned
+        ORDER BY connected_at
+        """
+    )
+    op.create_index(
+        "ix_websocketconnections_username_connected_at",
+        "websocketconnections",
+        ["username", "connected_at"],
+    )
+    op.drop_table("websocketconnections_partitioned")
+    op.execute("DROP FUNCTION websocketconnections_maintain(int, int)")
+    op.execute("DROP FUNCTION websocketconnections_create_partition(timestamptz)")
@@ -0,0 +1,72 @@
+"""add payment read model
+
+Revision ID: 8d66623e5696
+Revises: 9e9c1cd40db1
+Create Date: 2026-10-18 22:31:40.672018
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8d66623e5696"
+down_revision: Union[str, Sequence[str], None] = "9e9c1cd40db1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "payments",
+        sa.Column(
+            "updated_at",
+            postgresql.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+    )
+    op.create_table(
+        "savedpaymentmethods",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("payment_method_id", sa.Text(), nullable=False),
+        sa.Column("type", sa.Text(), nullable=True),
+        sa.Column("payment_details", sa.JSON(), nullable=True),
+        sa.Column(
+            "updated_at",
+            postgresql.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    # Последний сохраненный способ оплаты каждого пользователя из истории платежей
+    op.execute(
+        """
+        INSERT INTO savedpaymentmethods (
+            user_id, payment_method_id, type, payment_details, updated_at
+        )
+        SELECT DISTINCT ON (user_id)
+            user_id, payment_method_id, type::text, payment_details, created_at
+        FROM payments
+        WHERE user_id IS NOT NULL
+          AND payment_method_id IS NOT NULL
+          AND (
+            payment_for_linking
+            OR (status = 'succeeded' AND (payment_details->>'saved')::boolean)
+          )
+        ORDER BY user_id, created_at DESC
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("savedpaymentmethods")
+    op.drop_column("payments", "updated_at")
@@ -0,0 +1,120 @@
+"""add indexes for hot lookup columns
+
+Revision ID: 97e97f9feba8
+Revises: b27038c38da5
+Create Date: 2026-10-18 11:02:17.114035
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "97e97f9feba8"
+down_revision: Union[str, Sequence[str], None] = "b27038c38da5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # to_date() только STABLE, для индекса по выражению нужна IMMUTABLE обертка
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION games_release_date(release_year text)
+        RETURNS date
+        LANGUAGE plpgsql
+        IMMUTABLE
+        AS $$
+        BEGIN
+            RETURN to_date(release_year, 'Month DD, YYYY');
+        EXCEPTION WHEN data_exception THEN
+            -- Другой формат или несуществующая дата: NULL, а не ошибка INSERT
+            RETURN NULL;
+        END
+        $$
+        """
+    )
+    # Перед уникальным ограничением убираем повторные лайки
+    op.execute(
+        """
+        DELETE FROM gamesuserliked a
+        USING gamesuserliked b
+        WHERE a.user_id = b.user_id AND a.game_id = b.game_id AND a.id > b.id
+        """
+    )
+    op.create_unique_constraint(
+        "uq_gamesuserliked_user_id_game_id", "gamesuserliked", ["user_id", "game_id"]
+    )
+
+    # Индексы строим CONCURRENTLY, чтобы не блокировать запись в таблицы
+    with op.get_context().autocommit_block():
+        op.create_index(
+            op.f("ix_users_cookie"),
+            "users",
+            ["cookie"],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            op.f("ix_games_genre"),
+            "games",
+            ["genre"],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_games_release_date",
+            "games",
+            [sa.text("games_release_date(release_year)")],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            op.f("ix_gamesuserliked_game_id"),
+            "gamesuserliked",
+            ["game_id"],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            op.f("ix_websocketmessagehistory_from_user_id"),
+            "websocketmessagehistory",
+            ["from_user_id"],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            op.f("ix_websocketmessagehistory_to_user_id"),
+            "websocketmessagehistory",
+            ["to_user_id"],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_websocketconnections_username_connected_at",
+            "websocketconnections",
+            ["username", "connected_at"],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        "ix_websocketconnections_username_connected_at",
+        table_name="websocketconnections",
+    )
+    op.drop_index(
+        op.f("ix_websocketmessagehistory_to_user_id"),
+        table_name="websocketmessagehistory",
+    )
+    op.drop_index(
+        op.f("ix_websocketmessagehistory_from_user_id"),
+        table_name="websocketmessagehistory",
+    )
+    op.drop_index(op.f("ix_gamesuserliked_game_id"), table_name="gamesuserliked")
+    op.drop_index("ix_games_release_date", table_name="games")
+    op.drop_index(op.f("ix_games_genre"), table_name="games")
+    op.drop_index(op.f("ix_users_cookie"), table_name="users")
+    op.drop_constraint(
+        "uq_gamesuserliked_user_id_game_id", "gamesuserliked", type_="unique"
+    )
+    op.execute("DROP FUNCTION IF EXISTS games_release_date(text)")
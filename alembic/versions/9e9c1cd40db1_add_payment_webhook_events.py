@@ -0,0 +1,51 @@
+"""add payment webhook events
+
+Revision ID: 9e9c1cd40db1
+Revises: 6fb7e64dd7f9
+Create Date: 2026-10-18 21:48:05.214873
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9e9c1cd40db1"
+down_revision: Union[str, Sequence[str], None] = "6fb7e64dd7f9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "paymentwebhookevents",
+        sa.Column("id", sa.BigInteger(), sa.Identity(always=True), nullable=False),
+        sa.Column("payment_id", sa.Text(), nullable=False),
+        sa.Column("event", sa.Text(), nullable=False),
+        sa.Column(
+            "received_at",
+            postgresql.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("payment_id", "event"),
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_payments_payment_id",
+            "payments",
+            ["payment_id"],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_payments_payment_id", table_name="payments")
+    op.drop_table("paymentwebhookevents")
@@ -0,0 +1,60 @@
+"""add games rating_sum rating_count
+
+Revision ID: b27038c38da5
+Revises: d4a46cebf101
+Create Date: 2026-10-18 10:12:41.503218
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b27038c38da5"
+down_revision: Union[str, Sequence[str], None] = "d4a46cebf101"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "games",
+        sa.Column(
+            "rating_sum", sa.BigInteger(), server_default=sa.text("0"), nullable=False
+        ),
+    )
+    op.add_column(
+        "games",
+        sa.Column(
+            "rating_count", sa.BigInteger(), server_default=sa.text("0"), nullable=False
+        ),
+    )
+    op.execute(
+        """
+        UPDATE games
+        SET rating_sum = r.total_ratings, rating_count = r.rating_count
+        FROM (
+            SELECT game_id, SUM(rating) AS total_ratings, COUNT(rating) AS rating_count
+            FROM gamesuserratings
+            GROUP BY game_id
+        ) AS r
+        WHERE games.id = r.game_id
+        """
+    )
+    op.create_index(
+        "ix_games_rating_sum",
+        "games",
+        [sa.text("rating_sum DESC")],
+        postgresql_where=sa.text("rating_count > 0"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_games_rating_sum", table_name="games")
+    op.drop_column("games", "rating_count")
+    op.drop_column("games", "rating_sum")
@@ -0,0 +1,43 @@
+"""count media refs from history
+
+Revision ID: c3b1d7a94e52
+Revises: 48320a8c5dc4
+Create Date: 2026-10-19 10:12:44.208731
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c3b1d7a94e52"
+down_revision: Union[str, Sequence[str], None] = "48320a8c5dc4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.alter_column("mediafiles", "ref_count", server_default=sa.text("0"))
+    # Ссылки считались по загрузкам - пересчитываем по строкам истории
+    op.execute(
+        """
+        UPDATE mediafiles AS m
+        SET ref_count = r.refs
+        FROM (
+            SELECT f.sha256, count(h.id) AS refs
+            FROM mediafiles AS f
+            LEFT JOIN websocketmessagehistory AS h ON h.file_url = f.file_url
+            GROUP BY f.sha256
+        ) AS r
+        WHERE m.sha256 = r.sha256
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.alter_column("mediafiles", "ref_count", server_default=sa.text("1"))
@@ -0,0 +1,99 @@
+"""add websocketmessagehistory seq
+
+Revision ID: e6ec3fadb28c
+Revises: 6fe4b120cdbe
+Create Date: 2026-10-18 23:41:27.518304
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e6ec3fadb28c"
+down_revision: Union[str, Sequence[str], None] = "6fe4b120cdbe"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "websocketmessagehistory", sa.Column("seq", sa.BigInteger(), nullable=True)
+    )
+    # Старые сообщения нумеруем в прежнем порядке выдачи
+    op.execute(
+        """
+        UPDATE websocketmessagehistory AS h
+        SET seq = n.seq
+        FROM (
+            SELECT id, row_number() OVER (ORDER BY created_at, id) AS seq
+            FROM websocketmessagehistory
+        ) AS n
+        WHERE h.id = n.id
+        """
+    )
+    op.alter_column("websocketmessagehistory", "seq", nullable=False)
+    op.execute(
+        "ALTER TABLE websocketmessagehistory "
+        "ALTER COLUMN seq ADD GENERATED ALWAYS AS IDENTITY"
+    )
+    op.execute(
+        """
+        SELECT setval(
+            pg_get_serial_sequence('websocketmessagehistory', 'seq'),
+            coalesce(max(seq), 0) + 1,
+            false
+        )
+        FROM websocketmessagehistory
+        """
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_websocketmessagehistory_from_user_id_seq",
+            "websocketmessagehistory",
+            ["from_user_id", "seq", "id"],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_websocketmessagehistory_to_user_id_seq",
+            "websocketmessagehistory",
+            ["to_user_id", "seq", "id"],
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_websocketmessagehistory_from_user_id_created_at",
+            table_name="websocketmessagehistory",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_websocketmessagehistory_to_user_id_created_at",
+            table_name="websocketmessagehistory",
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(
+        "ix_websocketmessagehistory_to_user_id_created_at",
+        "websocketmessagehistory",
+        ["to_user_id", "created_at", "id"],
+    )
+    op.create_index(
+        "ix_websocketmessagehistory_from_user_id_created_at",
+        "websocketmessagehistory",
+        ["from_user_id", "created_at", "id"],
+    )
+    op.drop_index(
+        "ix_websocketmessagehistory_to_user_id_seq",
+        table_name="websocketmessagehistory",
+    )
+    op.drop_index(
+        "ix_websocketmessagehistory_from_user_id_seq",
+        table_name="websocketmessagehistory",
+    )
+    op.drop_column("websocketmessagehistory", "seq")
@@ -0,0 +1,67 @@
+"""
+Подпись и проверка RS256: PEM, который PyJWT разбирает при каждом вызове,
+против ключей, разобранных один раз (как в JWTKeys из core/auth/helper.py).
+Ключ RSA 2048 генерируется на время запуска.
+
+    python bench/jwt_keys.py [число вызовов]
+"""
+
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+ALGORITHM = "RS256"
+REPEAT = 5
+
+
+def make_keys() -> tuple[bytes, bytes]:
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    )
+    public_pem = key.public_key().public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+    return private_pem, public_pem
+
+
+def per_call_us(stmt, number: int) -> float:
+    """Лучшее из REPEAT прогонов, микросекунд на вызов"""
+    return min(timeit.repeat(stmt, number=number, repeat=REPEAT)) / number * 1e6
+
+
+def main(number: int) -> None:
+    private_pem, public_pem = make_keys()
+    private_key = serialization.load_pem_private_key(private_pem, password=None)
+    public_key = serialization.load_pem_public_key(public_pem)
+
+    now = datetime.now(tz=timezone.utc)
+    expire = now + timedelta(days=1)
+    payload = {"sub": "1", "username": "bench", "iat": now, "exp": expire}
+    token = jwt.encode(payload, private_key, algorithm=ALGORITHM)
+
+    cases = {
+        "encode, PEM": lambda: jwt.encode(payload, private_pem, algorithm=ALGORITHM),
+        "encode, ключ": lambda: jwt.encode(payload, private_key, algorithm=ALGORITHM),
+        "decode, PEM": lambda: jwt.decode(token, public_pem, algorithms=[ALGORITHM]),
+        "decode, ключ": lambda: jwt.decode(token, public_key, algorithms=[ALGORITHM]),
+    }
+    results = {name: per_call_us(stmt, number) for name, stmt in cases.items()}
+
+    print(f"{number} вызовов x {REPEAT} прогонов, лучший результат")
+    for name, us in results.items():
+        print(f"{name:<14} {us:10.1f} мкс/вызов")
+    for operation in ("encode", "decode"):
+        pem, cached = results[f"{operation}, PEM"], results[f"{operation}, ключ"]
+        print(f"{operation}: разобранный ключ быстрее в {pem / cached:.1f} раза")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
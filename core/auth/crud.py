@@ -13,38 +13,35 @@ from starlette.requests import Request
 from core import db_helper
 from core.models import Users, PendingMessages
 from core.auth import helper
+from core.auth.password_hasher import password_hasher
+from core.auth.session_cache import session_cache
 from core.models.ws_connections import WebsocketConnections
+from core.config import settings
+from core.redis.advertising import connection_window, pending_inbox
+from core.redis.sessions import session_store
 from core.schemas.privilege_level import PrivilegeLevel
 
 
 async def advertising_offer_to_client(
     session: AsyncSession,
-    client: str,
+    user_id: int,
 ):
+    """Предложение подписки тем, кто подключался к чату 3+ раз за неделю"""
 
-    now = datetime.now(tz=timezone.utc)
-    time_up = timedelta(days=7)
-    expires_time = now - time_up
-    operators = ["bob", "john"]
-    stmt = (
-        select(
-            func.count(WebsocketConnections.connected_at),
+    async def load_connections() -> list[datetime]:
+        # Только если окна еще нет в Redis
+        since = datetime.now(tz=timezone.utc) - timedelta(
+            days=settings.redis.connection_window_days
         )
-        .join(Users, WebsocketConnections.user_id == Users.id)
-        .where(
+        stmt = select(WebsocketConnections.connected_at).where(
             and_(
-                Users.username == client,
-                WebsocketConnections.connected_at >= expires_time,
+                WebsocketConnections.user_id == user_id,
+                WebsocketConnections.connected_at >= since,
             )
         )
-        .group_by(WebsocketConnections.username)
-    )
-    res = await session.scalar(stmt)
-    if res is None:
-        return False
-    if res >= 3:
-        return True
-    return False
+        return list((await session.scalars(stmt)).all())
+
+    return await connection_window.count(user_id, load_connections) >= 3
 
 
 async def get_user_by_cookie(
@@ -56,6 +53,22 @@ async def get_user_by_cookie(
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="User unauthorized"
         )
+    if not is_logout:
+        # Один запрос - один поиск пользователя
+        cached = getattr(request.state, "user", None) or session_cache.get(cookie)
+        if cached:
+            request.state.user = cached
+            return cached
+        stored = await session_store.get(cookie)
+        if stored:
+            user_data = {
+                "username": stored["username"],
+                "user_id": stored["user_id"],
+                "is_super_user": stored["is_superuser"],
+            }
+            session_cache.set(cookie, user_data, stored["expires"])
+            request.state.user = user_data
+            return user_data
     stmt = select(Users).where(Users.cookie == cookie)
     result = await session.execute(stmt)
     user = result.scalar_one_or_none()
@@ -69,11 +82,22 @@ async def get_user_by_cookie(
         )
     if is_logout:
         return user
-    return {
+    user_data = {
         "username": user.username,
         "user_id": user.id,
         "is_super_user": user.is_superuser,
     }
+    session_cache.set(cookie, user_data, user.cookie_expires)
+    await session_store.save(
+        session_id=cookie,
+        user_id=user.id,
+        username=user.username,
+        is_superuser=user.is_superuser,
+        privilege=user.privilege,
+        expires=user.cookie_expires,
+    )
+    request.state.user = user_data
+    return user_data
 
 
 async def get_current_user(
@@ -96,10 +120,14 @@ async def login(
 
     if not user:
         return False
-    hashed_pwd = helper.hash_password(password)
-    is_valid = helper.validate_password(password=password, hashed_password=hashed_pwd)
-    is_offer = await advertising_offer_to_client(session, username)
+    is_valid = await password_hasher.validate_password(
+        password=password, hashed_password=user.password
+    )
+    is_offer = await advertising_offer_to_client(session, user.id)
     if is_valid:
+        # Старая cookie перестает быть действительной после логина
+        session_cache.invalidate_user(user.id)
+        await session_store.delete(user.cookie)
 
         if is_offer:
             await session.execute(
@@ -119,6 +147,7 @@ async def login(
             session.add(pending_msg)
 
             await session.commit()
+            await pending_inbox.push(user.id, pending_msg.id, pending_msg.message)
 
         await session.execute(
             update(Users)
@@ -139,13 +168,13 @@ async def add_user(
     session: AsyncSession = Depends(db_helper.session_dependency()),
 ) -> None:
     try:
-        hash_password = helper.hash_password(password=password)
+        hash_password = await password_hasher.hash_password(password=password)
         access_token = helper.encode_jwt(
             payload={"sub": username, "username": username}
         )
         stmt = insert(Users).values(
             username=username,
-            password=str(hash_password),
+            password=hash_password.decode("utf-8"),
             access_token=access_token,
         )
 
@@ -203,3 +232,5 @@ async def create_privilege_level(
         )
     )
     await session.commit()
+    session_cache.invalidate_user(user["user_id"])
+    await session_store.delete(request.cookies.get("session_id"))
@@ -1,7 +1,11 @@
-from datetime import datetime, timedelta
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
 from json import JSONEncoder
+from pathlib import Path
 
 import jwt
+from cryptography.hazmat.primitives import serialization
 from core.config import settings
 import bcrypt
 
@@ -17,47 +21,105 @@ def convert_to_iso_string(data):
         return data
 
 
+class JWTKeys:
+    """
+    Ключи RSA разбираются из PEM один раз - PyJWT принимает готовые объекты ключей.
+    reload() перечитывает файлы (вызывается по SIGHUP из lifespan).
+    """
+
+    def __init__(self, private_key_path: Path, public_key_path: Path):
+        self.private_key_path = private_key_path
+        self.public_key_path = public_key_path
+        self.reload()
+
+    def reload(self) -> None:
+        self.private_key = serialization.load_pem_private_key(
+            self.private_key_path.read_bytes(), password=None
+        )
+        self.public_key = serialization.load_pem_public_key(
+            self.public_key_path.read_bytes()
+        )
+
+
 class JWTHelper:
+    def __init__(self, keys: JWTKeys, claims_cache_size: int):
+        self.keys = keys
+        self.claims_cache_size = claims_cache_size
+        # token -> (exp timestamp, claims) для недавно проверенных токенов
+        self._claims: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+
+    def reload_keys(self) -> None:
+        self.keys.reload()
+        self._claims.clear()
 
     def encode_jwt(
         self,
         payload: dict,
         expire_minutes_access: int = settings.auth_jwt.access_token_expire_minutes,
         expire_minutes_refresh: int = settings.auth_jwt.refresh_token_expire_days,
-        private_key: str = settings.auth_jwt.private_key_path.read_text(),
+        private_key=None,
         algorithm: str = settings.auth_jwt.algorithm,
         is_refresh: bool = False,
     ):
 
-        now = datetime.now()
+        now = datetime.now(tz=timezone.utc)
         to_copy = payload.copy()
         if is_refresh:
             expire = now + timedelta(minutes=expire_minutes_refresh)
         else:
             expire = now + timedelta(minutes=expire_minutes_access)
 
-        converted_payload = convert_to_iso_string(to_copy | {"iat": now, "exp": expire})
+        # iat/exp остаются datetime - PyJWT сам переводит их в NumericDate
+        converted_payload = convert_to_iso_string(to_copy) | {"iat": now, "exp": expire}
         return jwt.encode(
-            payload=converted_payload, key=private_key, algorithm=algorithm
+            payload=converted_payload,
+            key=private_key or self.keys.private_key,
+            algorithm=algorithm,
         )
 
     def decode_jwt(
         self,
         token: str,
-        public_key: str = settings.auth_jwt.public_key_path.read_text(),
+        public_key=None,
         algorithm: str = settings.auth_jwt.algorithm,
     ):
-        return jwt.decode(token=token, key=public_key, algorithms=[algorithm])
+        if public_key is None:
+            cached = self._claims.get(token)
+            if cached and cached[0] > time.time():
+                self._claims.move_to_end(token)
+                return cached[1]
+
+        claims = jwt.decode(
+            jwt=token,
+            key=public_key or self.keys.public_key,
+            algorithms=[algorithm],
+        )
+        if public_key is None:
+            self._claims[token] = (float(claims.get("exp", 0)), claims)
+            if len(self._claims) > self.claims_cache_size:
+                self._claims.popitem(last=False)
+        return claims
 
     def hash_password(self, password: str) -> bytes:
         pwd_encode = password.encode("utf-8")
-        salt = bcrypt.gensalt()
+        salt = bcrypt.gensalt(rounds=settings.password_hash.rounds)
         return bcrypt.hashpw(pwd_encode, salt)
 
-    def validate_password(self, password: str, hashed_password: bytes) -> bool:
+    def validate_password(self, password: str, hashed_password: bytes | str) -> bool:
+        if isinstance(hashed_password, str):
+            # Старые записи хранились как str(bytes): "b'$2b$12$...'"
+            if hashed_password.startswith(("b'", 'b"')):
+                hashed_password = hashed_password[2:-1]
+            hashed_password = hashed_password.encode("utf-8")
         return bcrypt.checkpw(
             password=password.encode("utf-8"), hashed_password=hashed_password
         )
 
 
-helper = JWTHelper()
+helper = JWTHelper(
+    keys=JWTKeys(
+        private_key_path=settings.auth_jwt.private_key_path,
+        public_key_path=settings.auth_jwt.public_key_path,
+    ),
+    claims_cache_size=settings.auth_jwt.claims_cache_size,
+)
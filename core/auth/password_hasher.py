@@ -0,0 +1,83 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+from starlette import status
+
+from core.auth.helper import helper
+from core.config import settings
+
+
+class PasswordHasher:
+    """
+    bcrypt в отдельном пуле потоков (bcrypt отпускает GIL), чтобы логин не
+    блокировал event loop. Не больше max_pending операций в очереди - остальные
+    ждут queue_timeout секунд и получают 503.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, queue_timeout: float):
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="bcrypt"
+        )
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(max_pending)
+        self.pending = 0
+        self.rejected = 0
+        self.total = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    async def _run(self, func, *args):
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many login attempts, try again later",
+            )
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.pending -= 1
+            self.total += 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+            self._slots.release()
+
+    async def hash_password(self, password: str) -> bytes:
+        return await self._run(helper.hash_password, password)
+
+    async def validate_password(
+        self, password: str, hashed_password: bytes | str
+    ) -> bool:
+        return await self._run(helper.validate_password, password, hashed_password)
+
+    def metrics(self) -> dict:
+        return {
+            "queue_depth": self.pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+            "total": self.total,
+            "avg_latency_ms": (
+                self.total_seconds / self.total * 1000 if self.total else 0.0
+            ),
+            "max_latency_ms": self.max_seconds * 1000,
+            "rounds": settings.password_hash.rounds,
+        }
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
+
+
+password_hasher = PasswordHasher(
+    max_workers=settings.password_hash.max_workers,
+    max_pending=settings.password_hash.max_pending,
+    queue_timeout=settings.password_hash.queue_timeout,
+)
@@ -0,0 +1,72 @@
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from core.config import settings
+
+
+class SessionCache:
+    """
+    In-process LRU кэш сессий: session_id -> данные пользователя.
+    Запись живет не дольше ttl секунд и не дольше cookie_expires пользователя.
+    """
+
+    def __init__(self, max_size: int, ttl: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        # session_id -> (monotonic deadline, user dict)
+        self._data: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        # user_id -> session_id's, чтобы сбрасывать сессии пользователя при логине
+        self._by_user: dict[int, set[str]] = {}
+
+    def get(self, session_id: str) -> dict | None:
+        entry = self._data.get(session_id)
+        if entry is None:
+            return None
+        deadline, user = entry
+        if deadline <= time.monotonic():
+            self._pop(session_id)
+            return None
+        self._data.move_to_end(session_id)
+        return user
+
+    def set(self, session_id: str, user: dict, expires: datetime) -> None:
+        left = (expires - datetime.now(tz=timezone.utc)).total_seconds()
+        if left <= 0:
+            return
+        deadline = time.monotonic() + min(self.ttl, left)
+        self._pop(session_id)
+        self._data[session_id] = (deadline, user)
+        self._by_user.setdefault(user["user_id"], set()).add(session_id)
+        while len(self._data) > self.max_size:
+            oldest, _ = next(iter(self._data.items()))
+            self._pop(oldest)
+
+    def invalidate(self, session_id: str | None) -> None:
+        if session_id:
+            self._pop(session_id)
+
+    def invalidate_user(self, user_id: int) -> None:
+        for session_id in self._by_user.pop(user_id, set()):
+            self._data.pop(session_id, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._by_user.clear()
+
+    def _pop(self, session_id: str) -> None:
+        entry = self._data.pop(session_id, None)
+        if entry is None:
+            return
+        user_id = entry[1]["user_id"]
+        sessions = self._by_user.get(user_id)
+        if sessions is not None:
+            sessions.discard(session_id)
+            if not sessions:
+                del self._by_user[user_id]
+
+
+session_cache = SessionCache(
+    max_size=settings.session_cache.max_size,
+    ttl=settings.session_cache.ttl_seconds,
+)
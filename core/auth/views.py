@@ -11,8 +11,13 @@ from core.auth.crud import (
     get_user_by_cookie,
     user_statistics,
 )
+from core.auth.session_cache import session_cache
+from core.crud import discount_user_ratings
+from core.media.helper import release_user_media, remove_media_files
 from core.models import Users
 from core.models.ws_connections import WebsocketConnections
+from core.redis.redis_crud import catalog_cache
+from core.redis.sessions import session_store
 
 router = APIRouter(
     prefix="/auth",
@@ -30,10 +35,24 @@ async def register_user(
     cookie = str(generate_session_id())
     response.set_cookie(key="session_id", value=cookie, max_age=604800, path="/")
     await add_user(session=session, username=username, password=password)
-    await session.execute(
-        update(Users).where(Users.username == username).values(cookie=cookie)
+    res = await session.execute(
+        update(Users)
+        .where(Users.username == username)
+        .values(cookie=cookie)
+        .returning(
+            Users.id, Users.is_superuser, Users.privilege, Users.cookie_expires
+        )
     )
+    user = res.one()
     await session.commit()
+    await session_store.save(
+        session_id=cookie,
+        user_id=user.id,
+        username=username,
+        is_superuser=user.is_superuser,
+        privilege=user.privilege,
+        expires=user.cookie_expires,
+    )
     return {"username": username, "password": password, "cookie_session_id": cookie}
 
 
@@ -57,14 +76,26 @@ async def user_login(
             path="/",
             secure=False,
         )
-        await session.execute(
+        res = await session.execute(
             update(Users)
             .where(Users.username == username)
             .values(
                 cookie=cookie_update,
             )
+            .returning(
+                Users.id, Users.is_superuser, Users.privilege, Users.cookie_expires
+            )
         )
+        user = res.one()
         await session.commit()
+        await session_store.save(
+            session_id=cookie_update,
+            user_id=user.id,
+            username=username,
+            is_superuser=user.is_superuser,
+            privilege=user.privilege,
+            expires=user.cookie_expires,
+        )
         return {
             "cookie_session_id": cookie_update,
         }
@@ -109,8 +140,16 @@ async def logout(
         request=request, session=session, is_logout=True
     )
 
+    await discount_user_ratings(session=session, user_id=user_by_cookie.id)
+    # История пользователя удаляется каскадом - вместе с ней ссылки на медиафайлы
+    released = await release_user_media(session=session, user_id=user_by_cookie.id)
     await session.delete(user_by_cookie)
     await session.commit()
+    # Файлы удаляются только после COMMIT - откат не оставит строку без файла
+    await remove_media_files(session, released)
+    await catalog_cache.bump()
+    session_cache.invalidate_user(user_by_cookie.id)
+    await session_store.delete(user_by_cookie.cookie)
     response.delete_cookie(key="session_id")
     return "Buy"
 
@@ -0,0 +1,269 @@
+import asyncio
+import logging
+import os
+import pickle
+import socket
+import time
+import uuid
+from pathlib import Path
+
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from core.config import settings
+
+log = logging.getLogger(__name__)
+
+
+# Владелец spool-файлов: воркеры одного узла пишут и забирают только свои файлы.
+# Точки в hostname заменены - по ним разбирается имя файла
+PROCESS_ID = f"{socket.gethostname()}-{os.getpid()}".replace(".", "_")
+
+# serialization_failure, deadlock_detected - повтор транзакции обычно проходит
+RETRY_SQLSTATES = {"40001", "40P01"}
+
+
+def is_transient(error: Exception) -> bool:
+    """Ошибка связи с БД, а не данных пачки - повтор той же пачки может пройти"""
+    if isinstance(error, (OperationalError, InterfaceError, OSError, PoolTimeoutError)):
+        return True
+    if isinstance(error, DBAPIError) and error.connection_invalidated:
+        return True
+    return getattr(getattr(error, "orig", None), "sqlstate", None) in RETRY_SQLSTATES
+
+
+class BatchWriter:
+    """
+    Write-behind запись в Postgres. Элементы копятся в ограниченной очереди и
+    пишутся одной транзакцией каждые batch_size элементов или flush_interval
+    секунд. Наследник реализует _write(session, batch).
+
+    Пачка не теряется при ошибке: запись повторяется с растущей задержкой,
+    если пачку валят данные одной записи - остальные пишутся по одной, а то,
+    что записать так и не удалось, откладывается в spool_dir и дописывается
+    при следующем старте.
+    """
+
+    name = "batch"
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        batch_size: int,
+        flush_interval: float,
+        max_queue: int,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._task: asyncio.Task | None = None
+        self.max_retries = settings.batch_writer.max_retries
+        self.retry_backoff = settings.batch_writer.retry_backoff_ms / 1000
+        self.retry_backoff_max = settings.batch_writer.retry_backoff_max_ms / 1000
+        self.flushed = 0
+        self.failed = 0
+        self.retries = 0
+        self.batches = 0
+        self.flush_seconds_total = 0.0
+        self.flush_seconds_last = 0.0
+
+    async def put(self, item) -> None:
+        # Если очередь заполнена - отправитель ждет (backpressure), а не теряет запись
+        await self.queue.put(item)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановить фоновую задачу и дописать все, что осталось в очереди"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while not self.queue.empty():
+            await self._flush(self._take(self.batch_size))
+
+    def _take(self, limit: int) -> list:
+        batch = []
+        while len(batch) < limit and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def _run(self) -> None:
+        batch: list = []
+        in_flight: asyncio.Future | None = None
+        try:
+            await self._replay_spool()
+            while True:
+                batch = [await self.queue.get()]
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                # shield: отмена задачи не обрывает запись посередине
+                in_flight = asyncio.ensure_future(self._flush(batch))
+                batch = []
+                await asyncio.shield(in_flight)
+        except asyncio.CancelledError:
+            if in_flight is not None and not in_flight.done():
+                await in_flight
+            await self._flush(batch)
+            raise
+
+    async def _write(self, session: AsyncSession, batch: list) -> None:
+        raise NotImplementedError
+
+    async def _write_once(self, batch: list) -> None:
+        async with self.session_factory() as session:
+            await self._write(session, batch)
+            await session.commit()
+
+    async def _flush(self, batch: list) -> bool:
+        """Записать пачку; False - часть пачки не записана и отложена в spool"""
+        if not batch:
+            return True
+        started = time.perf_counter()
+        try:
+            error = await self._write_with_retry(batch)
+            if error is None:
+                self.flushed += len(batch)
+                return True
+            if len(batch) == 1 or is_transient(error):
+                self._dead_letter(batch, error)
+                return False
+            # Пачку валит одна из записей - пишем по одной, чтобы не потерять остальные
+            log.warning(f"{self.name}: пачка ({len(batch)}) пишется по одной: {error}")
+            ok = True
+            for item in batch:
+                try:
+                    await self._write_once([item])
+                    self.flushed += 1
+                except Exception as e:
+                    self._dead_letter([item], e)
+                    ok = False
+            return ok
+        finally:
+            elapsed = time.perf_counter() - started
+            self.batches += 1
+            self.flush_seconds_total += elapsed
+            self.flush_seconds_last = elapsed
+
+    async def _write_with_retry(self, batch: list) -> Exception | None:
+        """Повторы с растущей задержкой; последняя ошибка или None, если записали"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self._write_once(batch)
+                return None
+            except Exception as e:
+                log.warning(
+                    f"{self.name}: не удалось записать пачку ({len(batch)}), "
+                    f"попытка {attempt + 1}/{self.max_retries + 1}: {e}"
+                )
+                if attempt == self.max_retries or not is_transient(e):
+                    return e
+                self.retries += 1
+                await asyncio.sleep(
+                    min(self.retry_backoff * 2**attempt, self.retry_backoff_max)
+                )
+
+    def _spool_prefix(self) -> str:
+        return type(self).__name__.lower()
+
+    def _dead_letter(self, batch: list, error: Exception) -> None:
+        """
+        Незаписанная пачка откладывается на диск, а не теряется: каждая в свой
+        файл <класс>.<узел-pid>.<uuid>.pickle, который появляется атомарно
+        """
+        self.failed += len(batch)
+        spool_dir = settings.batch_writer.spool_dir
+        spool_dir.mkdir(parents=True, exist_ok=True)
+        name = f"{self._spool_prefix()}.{PROCESS_ID}.{uuid.uuid4().hex}"
+        path = spool_dir / f"{name}.pickle"
+        part_path = spool_dir / f"{name}.part"
+        with open(part_path, "wb") as f:
+            pickle.dump(batch, f)
+        os.replace(part_path, path)
+        log.error(f"✗ {self.name}: пачка ({len(batch)}) отложена в {path}: {error}")
+
+    def _claim(self, path: Path, name: str) -> Path | None:
+        """
+        Забрать файл себе переименованием в <name>.<узел-pid>.replay: rename
+        атомарен, поэтому один файл дописывает только один воркер
+        """
+        claimed = path.with_name(f"{name}.{PROCESS_ID}.replay")
+        try:
+            os.rename(path, claimed)
+        except FileNotFoundError:
+            # Файл уже забрал другой воркер
+            return None
+        return claimed
+
+    @staticmethod
+    def _abandoned(path: Path) -> bool:
+        """.replay процесса этого узла, который умер, не дописав его"""
+        host, _, pid = path.stem.rsplit(".", 1)[-1].rpartition("-")
+        if host != PROCESS_ID.rpartition("-")[0] or not pid.isdigit():
+            return False
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            return False
+        return False
+
+    def _claim_spool(self) -> list[Path]:
+        spool_dir = settings.batch_writer.spool_dir
+        prefix = self._spool_prefix()
+        claimed = []
+        for path in sorted(spool_dir.glob(f"{prefix}.*.pickle")):
+            claimed.append(self._claim(path, path.stem))
+        for path in sorted(spool_dir.glob(f"{prefix}.*.replay")):
+            if self._abandoned(path):
+                claimed.append(self._claim(path, path.stem.rsplit(".", 1)[0]))
+        return [path for path in claimed if path is not None]
+
+    async def _replay_spool(self) -> None:
+        """Дописать пачки, отложенные при прошлых ошибках"""
+        for replay in self._claim_spool():
+            batches = []
+            with open(replay, "rb") as f:
+                while True:
+                    try:
+                        batches.append(pickle.load(f))
+                    except EOFError:
+                        break
+                    except pickle.UnpicklingError as e:
+                        log.error(f"✗ {self.name}: {replay} поврежден после пачки: {e}")
+                        break
+            log.info(
+                f"{self.name}: дописываем отложенные пачки из {replay}: {len(batches)}"
+            )
+            for batch in batches:
+                # Снова не записанное уйдет в новый spool-файл
+                await self._flush(batch)
+            os.remove(replay)
+
+    def metrics(self) -> dict:
+        return {
+            "queue_depth": self.queue.qsize(),
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "retries": self.retries,
+            "batches": self.batches,
+            "flush_last_ms": self.flush_seconds_last * 1000,
+            "flush_avg_ms": (
+                self.flush_seconds_total / self.batches * 1000 if self.batches else 0.0
+            ),
+        }
@@ -32,8 +32,8 @@ from core.models import (
     GamesUserRatings,
 )
 from core.schemas import GamesBase
-from core.redis.manager import redis_manager
-from core.redis.redis_crud import redis_crud
+from core.pagination import DEFAULT_LIMIT, fetch_page, select_fields
+from core.redis.redis_crud import catalog_cache
 
 
 class SortDate(enum.Enum):
@@ -49,64 +49,47 @@ class GameRating(enum.Enum):
     FIVE = 5
 
 
+# Колонки, доступные через ?fields= в списках игр
+GAMES_FIELDS = {
+    "id": Games.id,
+    "name": Games.name,
+    "genre": Games.genre,
+    "release_year": Games.release_year,
+    "release_date": Games.release_date,
+    "story": Games.story,
+    "gameplay": Games.gameplay,
+    "graphics": Games.graphics,
+    "game_development": Games.game_development,
+    "gallery": Games.gallery,
+}
+
+
 async def get_games(
-    request: Request, session: AsyncSession = Depends(db_helper.session_dependency())
+    request: Request,
+    session: AsyncSession = Depends(db_helper.session_dependency()),
+    cursor: str | None = None,
+    limit: int = DEFAULT_LIMIT,
+    fields: str | None = None,
 ):
-    stmt_sub = (
-        select(
-            Games.id,
-            Games.name,
-            Games.genre,
-            Games.release_year,
-            Games.story,
-            Games.gameplay,
-            Games.graphics,
-            Games.game_development,
-            Games.gallery,
-            func.sum(GamesUserRatings.rating).label("total_ratings"),
-            func.count(GamesUserRatings.rating).label("rating_count"),
-        )
-        .join(GamesUserRatings, Games.id == GamesUserRatings.game_id)
-        .group_by(Games.id)  # ← group_by НА select!
-        .subquery()
-    )
     stmt = select(
-        stmt_sub.c.id,
-        stmt_sub.c.name,
-        stmt_sub.c.genre,
-        stmt_sub.c.release_year,
-        stmt_sub.c.story,
-        stmt_sub.c.gameplay,
-        stmt_sub.c.graphics,
-        stmt_sub.c.game_development,
-        stmt_sub.c.gallery,
-        (stmt_sub.c.total_ratings / stmt_sub.c.rating_count).label("average_rating"),
-        stmt_sub.c.rating_count,
-    ).order_by(desc(stmt_sub.c.total_ratings))
-    result = await session.execute(stmt)
-    data = result.all()
-    result = await session.execute(stmt)
-    games_data = []
-    for row in result.all():
-        games_data.append(
-            {
-                "id": row.id,
-                "name": row.name,
-                "genre": row.genre,
-                "release_year": row.release_year,
-                "story": row.story,
-                "gameplay": row.gameplay,
-                "graphics": row.graphics,
-                "game_development": row.game_development,
-                "gallery": row.gallery,
-                "average_rating": (
-                    float(row.average_rating) if row.average_rating else 0
-                ),
-                "rating_count": row.rating_count,
-            }
+        *select_fields(fields, GAMES_FIELDS),
+        (Games.rating_sum / Games.rating_count).label("average_rating"),
+        Games.rating_count,
+    ).where(Games.rating_count > 0)
+    page = await fetch_page(
+        session,
+        stmt,
+        sort_key=Games.rating_sum,
+        id_col=Games.id,
+        cursor=cursor,
+        limit=limit,
+        descending=True,
+    )
+    for game in page["items"]:
+        game["average_rating"] = (
+            float(game["average_rating"]) if game["average_rating"] else 0
         )
-
-    return games_data
+    return page
 
 
 async def get_genres(session: AsyncSession = Depends(db_helper.session_dependency)):
@@ -140,14 +123,15 @@ async def get_game(
 async def games_catalog(
     session: AsyncSession = Depends(db_helper.session_dependency()),
 ):
-    extracted_year = func.cast(func.split_part(Games.release_year, ",", 2), Integer)
-
     # Создание подзапроса с группировкой по жанрам и сортировкой по году
     subquery = (
         select(
             Games,
             func.row_number()
-            .over(partition_by=Games.genre, order_by=desc(extracted_year))
+            .over(
+                partition_by=Games.genre,
+                order_by=desc(Games.release_date).nulls_last(),
+            )
             .label("row_num"),
         ).select_from(
             Games
@@ -171,18 +155,23 @@ async def games_catalog(
 async def game_select_genre(
     genre: Literal["ACTION", "ADVENTURE", "RPG", "STRATEGY", "SIMULATION"],
     session: AsyncSession = Depends(db_helper.session_dependency()),
+    cursor: str | None = None,
+    limit: int = DEFAULT_LIMIT,
+    fields: str | None = None,
 ):
-    stmt = select(Games).where(Games.genre == genre)
-    res = await session.execute(stmt)
-    games = res.scalars().all()
-    return games
+    stmt = select(*select_fields(fields, GAMES_FIELDS)).where(Games.genre == genre)
+    return await fetch_page(
+        session, stmt, sort_key=Games.id, id_col=Games.id, cursor=cursor, limit=limit
+    )
 
 
 async def delete_games_user_liked(
     session: AsyncSession = Depends(db_helper.session_dependency()),
 ):
     await session.execute(delete(GamesUserRatings))
+    await session.execute(update(Games).values(rating_sum=0, rating_count=0))
     await session.commit()
+    await catalog_cache.bump()
 
 
 async def my_account(
@@ -266,6 +255,7 @@ async def like_game(
         )
         await session.execute(stmt_2)
         await session.commit()
+        await catalog_cache.bump()
         return {"Game added successfully"}
 
 
@@ -273,73 +263,48 @@ async def sort_date(
     decreasing: bool = Query(True),
     sort_by: Literal["date", "year", "ranking_popularity"] = Query("date"),
     session: AsyncSession = Depends(db_helper.session_dependency),
+    cursor: str | None = None,
+    limit: int = DEFAULT_LIMIT,
+    fields: str | None = None,
 ):
-    if sort_by == "date":
-        order_field = Games.release_year
-    elif sort_by == "year":
-        extracted_year = func.cast(
-            func.split_part(Games.release_year, ", ", 2), Integer
-        )
-        order_field = extracted_year
-
-    elif sort_by == "ranking_popularity":
+    columns = select_fields(fields, GAMES_FIELDS)
+    if sort_by == "ranking_popularity":
         likes_subquery = (
             select(
-                GamesUserLiked.game, func.count(GamesUserLiked.game).label("like_count")
+                GamesUserLiked.game_id,
+                func.count(GamesUserLiked.game_id).label("like_count"),
             )
-            .group_by(GamesUserLiked.game)
+            .group_by(GamesUserLiked.game_id)
             .subquery()
         )
-        # JOIN по полю name (Games.name = likes_subquery.game)
-        stmt = (
-            select(Games, likes_subquery.c.like_count)
-            .join(
-                likes_subquery, Games.name == likes_subquery.c.game
-            )  # ← JOIN по name!
-            .order_by(
-                desc(likes_subquery.c.like_count)
-                if decreasing
-                else asc(likes_subquery.c.like_count)
-            )
+        stmt = select(*columns, likes_subquery.c.like_count).join(
+            likes_subquery, Games.id == likes_subquery.c.game_id
         )
-        result = await session.execute(stmt)
-        rows = result.all()
-        return [
-            {
-                "id": game_obj.id,
-                "name": game_obj.name,
-                "genre": (
-                    game_obj.genre.value
-                    if hasattr(game_obj.genre, "value")
-                    else str(game_obj.genre)
-                ),
-                "release_year": game_obj.release_year,
-                "story": game_obj.story,
-                "gameplay": game_obj.gameplay,
-                "graphics": game_obj.graphics,
-                "game_development": game_obj.game_development,
-                "gallery": game_obj.gallery,
-                "like_count": like_count or 0,
-                "is_popular": (like_count or 0) > 5,
-            }
-            for game_obj, like_count in rows
-        ]
-
-    else:
-        extracted_year = func.cast(
-            func.split_part(Games.release_year, ", ", 2), Integer
+        page = await fetch_page(
+            session,
+            stmt,
+            sort_key=likes_subquery.c.like_count,
+            id_col=Games.id,
+            cursor=cursor,
+            limit=limit,
+            descending=decreasing,
         )
-        order_field = extracted_year
-
-    if decreasing and not sort_by == "ranking_popularity":
-        stmt = select(Games).order_by(desc(order_field))
-    else:
-        stmt = select(Games).order_by(asc(order_field))
-
-    result = await session.execute(stmt)
-    games = result.scalars().all()
-
-    return games
+        for game in page["items"]:
+            game["like_count"] = game["like_count"] or 0
+            game["is_popular"] = game["like_count"] > 5
+        return page
+
+    # Игры без даты выхода - в конце списка при сортировке по убыванию
+    return await fetch_page(
+        session,
+        select(*columns),
+        sort_key=Games.release_date,
+        id_col=Games.id,
+        cursor=cursor,
+        limit=limit,
+        descending=decreasing,
+        nullable=True,
+    )
 
 
 async def add_rating_for_game(
@@ -360,9 +325,25 @@ async def add_rating_for_game(
             rating=rating,
         )
         await session.execute(stmt_game_rating)
+        # Новые агрегаты отдает тот же UPDATE - рейтинг всех игр здесь не пересчитываем
+        totals = (
+            await session.execute(
+                update(Games)
+                .where(Games.id == game_id)
+                .values(
+                    rating_sum=Games.rating_sum + rating,
+                    rating_count=Games.rating_count + 1,
+                )
+                .returning(Games.rating_sum, Games.rating_count)
+            )
+        ).one()
         await session.commit()
-        games = await algorithm_rating_games(session)
-        return games
+        await catalog_cache.bump()
+        return {
+            "game": game,
+            "rating_sum": totals.rating_sum,
+            "rating_count": totals.rating_count,
+        }
 
     except IntegrityError as e:
         if "duplicate key" in str(e):
@@ -374,11 +355,14 @@ async def add_rating_for_game(
 
 async def check_games_ratings(
     session: AsyncSession = Depends(db_helper.session_dependency),
+    cursor: str | None = None,
+    limit: int = DEFAULT_LIMIT,
+    fields: str | None = None,
 ):
-    stmt = select(Games).order_by(asc(Games.id))
-    res = await session.execute(stmt)
-    games = res.scalars().all()
-    return games
+    stmt = select(*select_fields(fields, GAMES_FIELDS))
+    return await fetch_page(
+        session, stmt, sort_key=Games.id, id_col=Games.id, cursor=cursor, limit=limit
+    )
 
 
 async def get_rating_games(
@@ -387,26 +371,16 @@ async def get_rating_games(
     is_one: bool = False,
 ):
     if not is_one:
-        stmt_sub = (
+        stmt = (
             select(
                 Games.name,
                 Games.gallery[0].label("photo"),
-                func.sum(GamesUserRatings.rating).label("total_ratings"),
-                func.count(GamesUserRatings.rating).label("rating_count"),
+                (Games.rating_sum / Games.rating_count).label("average_rating"),
+                Games.rating_count,
             )
-            .join(GamesUserRatings, Games.id == GamesUserRatings.game_id)
-            .group_by(Games.name, Games.gallery)  # ← group_by НА select!
-            .subquery()
+            .where(Games.rating_count > 0)
+            .order_by(desc(Games.rating_sum))
         )
-
-        stmt = select(
-            stmt_sub.c.name,
-            stmt_sub.c.photo,
-            (stmt_sub.c.total_ratings / stmt_sub.c.rating_count).label(
-                "average_rating"
-            ),
-            stmt_sub.c.rating_count,
-        ).order_by(desc(stmt_sub.c.total_ratings))
         result = await session.execute(stmt)
         data = result.all()
 
@@ -420,16 +394,11 @@ async def get_rating_games(
             for game, photo, average_rating, rating_count in data
         ]
     else:
-        stmt = (
-            select(
-                Games.name,
-                func.avg(GamesUserRatings.rating).label("average_rating"),
-                func.count(GamesUserRatings.rating).label("rating_count"),
-            )
-            .join(GamesUserRatings, Games.id == GamesUserRatings.game_id)
-            .where(GamesUserRatings.game_id == is_one_game)
-            .group_by(GamesUserRatings.game_id)
-        )
+        stmt = select(
+            Games.name,
+            (Games.rating_sum * 1.0 / Games.rating_count).label("average_rating"),
+            Games.rating_count,
+        ).where(and_(Games.name == is_one_game, Games.rating_count > 0))
 
         result = await session.execute(stmt)
         data = result.first()
@@ -453,21 +422,15 @@ async def get_rating_games(
 async def algorithm_rating_games(
     session: AsyncSession = Depends(db_helper.session_dependency),
 ):
-    stmt_sub = (
+    stmt = (
         select(
             Games.name,
-            func.sum(GamesUserRatings.rating).label("total_ratings"),
-            func.count(GamesUserRatings.rating).label("rating_count"),
+            (Games.rating_sum / Games.rating_count).label("average_rating"),
+            Games.rating_count,
         )
-        .join(GamesUserRatings, Games.id == GamesUserRatings.game_id)
-        .group_by(Games.name, Games.gallery)  # ← group_by НА select!
-        .subquery()
+        .where(Games.rating_count > 0)
+        .order_by(desc(Games.rating_sum))
     )
-    stmt = select(
-        stmt_sub.c.name,
-        (stmt_sub.c.total_ratings / stmt_sub.c.rating_count).label("average_rating"),
-        stmt_sub.c.rating_count,
-    ).order_by(desc(stmt_sub.c.total_ratings))
     result = await session.execute(stmt)
     data = result.all()
 
@@ -481,30 +444,53 @@ async def algorithm_rating_games(
     ]
 
 
+async def discount_user_ratings(session: AsyncSession, user_id: int):
+    """
+    Вычесть оценки пользователя из агрегатов games (перед удалением пользователя,
+    иначе каскад удалит строки gamesuserratings мимо rating_sum/rating_count)
+    """
+    await session.execute(
+        update(Games)
+        .where(
+            and_(
+                Games.id == GamesUserRatings.game_id,
+                GamesUserRatings.user_id == user_id,
+            )
+        )
+        .values(
+            rating_sum=Games.rating_sum - GamesUserRatings.rating,
+            rating_count=Games.rating_count - 1,
+        )
+    )
+
+
 async def hidden_games(
     request: Request,
     selected_games: bool = True,
     session: AsyncSession = Depends(db_helper.session_dependency),
+    cursor: str | None = None,
+    limit: int = DEFAULT_LIMIT,
+    fields: str | None = None,
 ):
     try:
-        cookie = request.cookies.get("session_id")
+        user = await get_user_by_cookie(session, request)
 
-        subquery = (
-            select(GamesUserLiked.game)
-            .join(Users, GamesUserLiked.user_id == Users.id)
-            .where(Users.cookie == cookie)
-            .subquery()  # ← подзапрос
+        liked = select(GamesUserLiked.game_id).where(
+            GamesUserLiked.user_id == user["user_id"]
         )
+        stmt = select(*select_fields(fields, GAMES_FIELDS))
         if selected_games:
-            stmt = select(Games).where(Games.name.not_in(select(subquery.c.game)))
-            res = await session.execute(stmt)
-            data_t = res.scalars().all()
-            return data_t
+            stmt = stmt.where(Games.id.not_in(liked))
         else:
-            stmt = select(Games).where(Games.name.in_(select(subquery.c.game)))
-            res = await session.execute(stmt)
-            data_t = res.scalars().all()
-            return data_t
+            stmt = stmt.where(Games.id.in_(liked))
+        return await fetch_page(
+            session,
+            stmt,
+            sort_key=Games.id,
+            id_col=Games.id,
+            cursor=cursor,
+            limit=limit,
+        )
 
     except IntegrityError as e:
         raise HTTPException(
@@ -543,7 +529,7 @@ async def distribution_future(
     session: AsyncSession = Depends(db_helper.session_dependency),
 ):
 
-    select_stmt = select(Games).where(Games.is_future == True)
+    select_stmt = select(Games).where(Games.is_future)
     result = await session.execute(select_stmt)
     future_games = result.scalars().all()
     return future_games
@@ -749,17 +735,7 @@ async def get_list_games(  # For Websockets
 async def get_list_genres(  # For Websockets
     session: AsyncSession = Depends(db_helper.session_dependency),
 ):
-    stmt = select(Games.genre)
+    # Жанров всего несколько - дедупликация в БД, а не по всем строкам games
+    stmt = select(Games.genre).distinct().order_by(Games.genre)
     res = await session.execute(stmt)
-    genres = res.scalars().all()
-    # Преобразуем в множество строк с нижним регистром
-    unique_genres = set()
-    for genre in genres:
-        # Преобразуем объект в строку и приводим к нижнему регистру
-        genre_str = str(genre).split(".")[-1].lower()  # "rpg", "action", "strategy"
-        unique_genres.add(genre_str)
-
-    # Если нужен список (для JSON)
-    result_list = list(unique_genres)
-    str_res = ". ".join(result_list)
-    return str_res
+    return ". ".join(genre.value for genre in res.scalars().all())
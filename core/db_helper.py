@@ -1,20 +1,64 @@
+import time
 from typing import AsyncGenerator
 
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import (
     create_async_engine,
     AsyncEngine,
     async_sessionmaker,
     AsyncSession,
 )
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from core.config import settings
 
 
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """Пул, который считает время ожидания свободного соединения"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+
 class DatabaseHelper:
-    def __init__(self, url: str, echo: str) -> None:
+    def __init__(
+        self,
+        url: str,
+        echo: str,
+        pool_size: int = 5,
+        max_overflow: int = 10,
+        pool_timeout: float = 30.0,
+        pool_pre_ping: bool = False,
+        pool_recycle: int = -1,
+        statement_cache_size: int = 100,
+    ) -> None:
         self.engine: AsyncEngine = create_async_engine(
             url=url,
             echo=echo,
+            poolclass=MeteredQueuePool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_pre_ping=pool_pre_ping,
+            pool_recycle=pool_recycle,
+            connect_args={"prepared_statement_cache_size": statement_cache_size},
         )
         self.session_factory: async_sessionmaker[AsyncSession] = async_sessionmaker(
             bind=self.engine,
@@ -30,8 +74,33 @@ class DatabaseHelper:
         async with self.session_factory() as session:
             yield session
 
+    def pool_status(self) -> dict:
+        pool: MeteredQueuePool = self.engine.pool
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            # overflow() отрицательный, пока пул не заполнен до pool_size
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+            "checkouts": pool.checkouts,
+            "timeouts": pool.timeouts,
+            "wait_avg_ms": (
+                pool.wait_seconds_total / pool.checkouts * 1000
+                if pool.checkouts
+                else 0.0
+            ),
+            "wait_max_ms": pool.wait_seconds_max * 1000,
+        }
+
 
 db_helper = DatabaseHelper(
     url=str(settings.db_url),
     echo=settings.db_echo,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    pool_pre_ping=settings.db_pool_pre_ping,
+    pool_recycle=settings.db_pool_recycle,
+    statement_cache_size=settings.db_statement_cache_size,
 )
@@ -1,15 +1,24 @@
 import asyncio
 
 from fastapi import Depends
+from faststream import AckPolicy
+from faststream.exceptions import RejectMessage
+from faststream.rabbit import Channel
 
 from core import db_helper
+from core.config import settings
+from core.payments.events import PoisonWebhook, payment_events
 from core.websockets import manager
+from core.websockets.codec import Frame
 from core.faststream.broker import (
     broker,
     queue_operators,
     queue_clients,
     queue_notify_client,
+    queue_broadcast,
+    queue_payment_webhooks,
     exchange,
+    exchange_broadcast,
 )
 
 
@@ -25,9 +34,10 @@ from core.faststream.broker import (
 
 
 @broker.subscriber(queue=queue_clients, exchange=exchange)
-async def handler_from_client_to_operator(
-    msg: dict | str | bytes,
-):
+async def handler_from_client_to_operator(body: bytes):
+    # Кадр приходит уже в msgpack - те же байты уйдут оператору без пересборки
+    frame = Frame.from_packed(body)
+    msg = frame.payload
     async with db_helper.session_factory() as session:
         if "file_url" in msg:
             await manager.send_media_to_operator(
@@ -37,6 +47,7 @@ async def handler_from_client_to_operator(
                 message=msg["message"],
                 mime_type=msg["mime_type"],
                 file_url=msg["file_url"],
+                frame=frame,
             )
         # if msg["type"] == "disconnect_client":  напрямую из endpoint вызываю, поэтому убрал
         #         #     await manapger.disconnect_client(client=msg["from"])
@@ -46,13 +57,20 @@ async def handler_from_client_to_operator(
                 client=msg["from"],  # ← 2. client
                 operator=msg["to"],  # ← 3. operator
                 message=msg["message"],  # ← 4. message
+                frame=frame,
             )
 
 
 @broker.subscriber(queue=queue_operators, exchange=exchange)
-async def handler_from_operator_to_client(msg: dict):
+async def handler_from_operator_to_client(body: bytes):
+    frame = Frame.from_packed(body)
+    msg = frame.payload
     async with db_helper.session_factory() as session:
-        if "file_url" in msg:
+        if msg.get("type") == "notify_connect_to_client":
+            await manager.notify_connect_to_client(
+                operator=msg["from"], client=msg["to"]
+            )
+        elif "file_url" in msg:
             await manager.send_media_to_client(
                 session=session,
                 operator=msg["from"],
@@ -60,6 +78,7 @@ async def handler_from_operator_to_client(msg: dict):
                 message=msg["message"],
                 mime_type=msg["mime_type"],
                 file_url=msg["file_url"],
+                frame=frame,
             )
         # if "notify_connect" in msg:
         #     await manager.notify_connect_to_client(
@@ -71,4 +90,32 @@ async def handler_from_operator_to_client(msg: dict):
                 operator=msg["from"],
                 client=msg["to"],
                 message=msg["message"],
+                frame=frame,
             )
+
+
+@broker.subscriber(queue=queue_broadcast, exchange=exchange_broadcast)
+async def handler_notify_operators(msg: dict):
+    """Очередь ожидающих клиентов есть на каждом узле, назначает свободный оператор"""
+    if msg["type"] == "notify_connect":
+        manager.clients_asks_help[msg["from"]] = msg["message"]
+        await manager.request_operator(msg["from"])
+    elif msg["type"] == "assigned":
+        manager.scheduler.dequeue(msg["from"])
+    elif msg["type"] == "notify_disconnect":
+        manager.clients_asks_help.pop(msg["from"], None)
+        await manager.notify_disconnect_to_operators(msg["from"])
+
+
+@broker.subscriber(
+    queue=queue_payment_webhooks,
+    channel=Channel(prefetch_count=settings.payment_webhooks.prefetch_count),
+    ack_policy=AckPolicy.NACK_ON_ERROR,
+)
+async def handler_payment_webhook(notification: dict):
+    # Подтверждаем сообщение только после COMMIT пачки, иначе оно вернется в очередь
+    try:
+        await payment_events.apply(notification)
+    except PoisonWebhook:
+        # Повторная доставка упадет так же - отклоняем без возврата в очередь
+        raise RejectMessage()
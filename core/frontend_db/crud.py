@@ -8,6 +8,7 @@ from sqlalchemy import (
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core import db_helper
+from core.pagination import DEFAULT_LIMIT, fetch_page, select_fields
 from core.models import (
     Games,
     Users,
@@ -16,14 +17,28 @@ from core.models import (
 )
 
 
+# Колонки, доступные через ?fields=. Пароль, cookie и токен не отдаются
+USERS_FIELDS = {
+    "id": Users.id,
+    "username": Users.username,
+    "date_registration": Users.date_registration,
+    "is_superuser": Users.is_superuser,
+    "privilege": Users.privilege,
+    "favorite_genre": Users.favorite_genre,
+}
+
+
 async def check_users(
     session: AsyncSession = Depends(db_helper.session_dependency),
+    cursor: str | None = None,
+    limit: int = DEFAULT_LIMIT,
+    fields: str | None = None,
 ):
 
-    stmt = select(Users).order_by(asc(Users.id))
-    res = await session.execute(stmt)
-    users = res.scalars().all()
-    return users
+    stmt = select(*select_fields(fields, USERS_FIELDS))
+    return await fetch_page(
+        session, stmt, sort_key=Users.id, id_col=Users.id, cursor=cursor, limit=limit
+    )
 
 
 async def user_vote_ratings(
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core import db_helper
@@ -8,6 +8,7 @@ from core.frontend_db.crud import (
 )
 from core.crud import get_genre_rpg, get_genre_strategy, get_genre_action
 from core.models import GamesUserRatings
+from core.pagination import DEFAULT_LIMIT, MAX_LIMIT
 from core.schemas import GamesBase
 
 router = APIRouter(tags=["GamesFront"], prefix="/games")
@@ -30,9 +31,14 @@ router = APIRouter(tags=["GamesFront"], prefix="/games")
 
 @router.get("/users-watch")
 async def watch_users(
+    cursor: str | None = Query(None, description="Cursor from next_cursor"),
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    fields: str | None = Query(None, description="Columns, e.g. 'name,genre'"),
     session: AsyncSession = Depends(db_helper.session_dependency),
 ):
-    return await check_users(session=session)
+    return await check_users(
+        session=session, cursor=cursor, limit=limit, fields=fields
+    )
 
 
 @router.get("/check_rating")
@@ -0,0 +1,45 @@
+from fastapi import APIRouter, status
+
+from core import db_helper
+from core.auth.password_hasher import password_hasher
+from core.payments.events import payment_events
+from core.websockets import manager
+from core.websockets.audit_writer import connection_audit
+from core.websockets.history_writer import history_writer
+
+router = APIRouter(prefix="/internal", tags=["Internal"])
+
+
+@router.get("/db-pool", status_code=status.HTTP_200_OK)
+async def db_pool():
+    return db_helper.pool_status()
+
+
+@router.get("/chat-history-writer", status_code=status.HTTP_200_OK)
+async def chat_history_writer():
+    return history_writer.metrics()
+
+
+@router.get("/connection-audit-writer", status_code=status.HTTP_200_OK)
+async def connection_audit_writer():
+    return connection_audit.metrics()
+
+
+@router.get("/ws-outbound", status_code=status.HTTP_200_OK)
+async def ws_outbound():
+    return manager.outbound_metrics()
+
+
+@router.get("/operator-scheduler", status_code=status.HTTP_200_OK)
+async def operator_scheduler():
+    return manager.scheduler.metrics()
+
+
+@router.get("/payment-webhooks", status_code=status.HTTP_200_OK)
+async def payment_webhooks():
+    return payment_events.metrics()
+
+
+@router.get("/password-hasher", status_code=status.HTTP_200_OK)
+async def password_hasher_metrics():
+    return password_hasher.metrics()
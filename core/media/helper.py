@@ -1,62 +1,336 @@
+import hashlib
 import os
 import uuid
+from collections import Counter
+from contextlib import suppress
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import AsyncIterator, Callable, Iterable
+
 import aiofiles
-from fastapi import UploadFile
-import mimetypes
+from fastapi import HTTPException, UploadFile, status
+from sqlalchemy import case, delete, func, or_, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core import db_helper
+from core.models.media import MediaFiles
+from core.models.ws_history_message import WebsocketMessageHistory
 
 ALLOWED_IMAGE_TYPES = ["image/jpeg", "image/png", "image/gif", "image/webp"]
 ALLOWED_VIDEO_TYPES = ["video/mp4", "video/webm", "video/ogg"]
+# Основные бренды ftyp обычного MP4; HEIC, AVIF, MOV и 3GP тоже начинаются с ftyp
+MP4_BRANDS = {
+    b"isom", b"iso2", b"iso4", b"iso5", b"iso6", b"mp41", b"mp42", b"avc1", b"dash",
+}
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50 MB
+# Файл читается и пишется кусками - память на загрузку не зависит от размера файла
+CHUNK_SIZE = 256 * 1024
+MEDIA_DIR = "static/media"
+
+EXTENSIONS = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+    "video/mp4": ".mp4",
+    "video/webm": ".webm",
+    "video/ogg": ".ogv",
+}
+
+
+@dataclass
+class SavedFile:
+    file_url: str
+    size: int
+    mime_type: str
+    sha256: str
+
+
+def sniff_mime_type(head: bytes) -> str | None:
+    """MIME по сигнатуре начала файла - имени и content_type клиента не доверяем"""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:8] == b"ftyp" and head[8:12] in MP4_BRANDS:
+        return "video/mp4"
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "video/webm"
+    if head.startswith(b"OggS"):
+        return "video/ogg"
+    return None
+
+
+def too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+        detail=f"Файл больше {MAX_FILE_SIZE // (1024 * 1024)} МБ",
+    )
+
+
+async def iter_upload(file: UploadFile) -> AsyncIterator[bytes]:
+    # Каждый проход читает файл с начала
+    await file.seek(0)
+    while chunk := await file.read(CHUNK_SIZE):
+        yield chunk
+
+
+async def iter_bytes(data: bytes) -> AsyncIterator[memoryview]:
+    # Срезы memoryview не копируют данные
+    view = memoryview(data)
+    for start in range(0, len(view), CHUNK_SIZE):
+        yield view[start : start + CHUNK_SIZE]
 
 
-async def save_uploaded_file(
-    file_data: bytes, file_info: dict = None
-) -> str:
+async def scan_stream(chunks: AsyncIterator[bytes]) -> tuple[int, str, str]:
     """
-    Сохраняет загруженный файл и возвращает URL для доступа к нему
+    Проверка и хэширование потока без записи на диск: недопустимый тип
+    отсекается по первому куску, превышение размера - как только набрано
+    MAX_FILE_SIZE. Возвращает (размер, MIME, sha256).
     """
-    # Создаем директорию для медиафайлов, если её нет
-    media_dir = "static/media"
-    os.makedirs(media_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    mime_type = None
+    async for chunk in chunks:
+        if mime_type is None:
+            mime_type = sniff_mime_type(bytes(chunk[:16]))
+            if mime_type not in ALLOWED_IMAGE_TYPES + ALLOWED_VIDEO_TYPES:
+                raise HTTPException(
+                    status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                    detail="Поддерживаются только изображения и видео",
+                )
+        size += len(chunk)
+        if size > MAX_FILE_SIZE:
+            raise too_large()
+        digest.update(chunk)
+    if mime_type is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Пустой файл",
+        )
+    return size, mime_type, digest.hexdigest()
+
 
-    # Генерируем уникальное имя файла
-    file_extension = file_info.get("extension", "") if file_info else ""
-    if not file_extension:
-        # Пытаемся определить расширение из content_type
-        content_type = file_info.get("file_type", "") if file_info else ""
-        if content_type:
-            ext = mimetypes.guess_extension(content_type)
-            file_extension = ext if ext else ""
+def media_path(sha256: str, mime_type: str) -> str:
+    """static/media/ab/cd/abcd...<ext> - не больше 256 файлов-каталогов на уровень"""
+    filename = sha256 + EXTENSIONS[mime_type]
+    return os.path.join(MEDIA_DIR, sha256[:2], sha256[2:4], filename)
 
-    filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = os.path.join(media_dir, filename)
 
-    # Сохраняем файл
-    async with aiofiles.open(file_path, "wb") as f:
-        await f.write(file_data)
+async def write_stream(chunks: AsyncIterator[bytes], path: str) -> None:
+    """Пишет поток кусками во временный .part и атомарно переименовывает"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    part_path = f"{path}.{uuid.uuid4().hex}.part"
+    try:
+        async with aiofiles.open(part_path, "wb") as f:
+            async for chunk in chunks:
+                await f.write(chunk)
+    except BaseException:
+        with suppress(FileNotFoundError):
+            os.remove(part_path)
+        raise
+    os.replace(part_path, path)
 
-    # Формируем URL для доступа к файлу
-    file_url = f"/static/media/{filename}"
 
-    return file_url
+def media_sha256(file_url: str) -> str:
+    """sha256 из file_url вида /static/media/ab/cd/<sha256>.<ext>"""
+    return os.path.splitext(os.path.basename(file_url))[0]
 
 
-async def save_uploaded_file_from_form(file: UploadFile):
+async def lock_media(session: AsyncSession, sha256: str) -> None:
     """
-    Сохраняет файл из формы (для HTTP эндпоинтов)
+    Блокировка sha256 до конца транзакции: store_media и release_media одного
+    файла не пересекаются, и файл не удаляется между проверкой и вставкой строки
+    """
+    await session.execute(
+        text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": f"media:{sha256}"}
+    )
+
+
+async def store_media(
+    session: AsyncSession, open_chunks: Callable[[], AsyncIterator[bytes]]
+) -> SavedFile:
     """
-    media_dir = "static/media"
-    os.makedirs(media_dir, exist_ok=True)
+    Сохранение по содержимому. Первый проход только считает sha256; если
+    такой файл уже есть, отдаем его file_url, не трогая диск. Иначе второй
+    проход пишет файл в шардированный каталог. Загрузка ссылку не берет -
+    ref_count растет, когда file_url попадает в историю (acquire_media).
+    """
+    size, mime_type, sha256 = await scan_stream(open_chunks())
+    await lock_media(session, sha256)
+    # Файл без ссылок удаляет sweep_unreferenced_media - повторная загрузка
+    # продлевает ему срок, чтобы он дожил до отправки сообщения
+    file_url = await session.scalar(
+        update(MediaFiles)
+        .where(MediaFiles.sha256 == sha256)
+        .values(
+            created_at=case(
+                (MediaFiles.ref_count <= 0, func.now()), else_=MediaFiles.created_at
+            )
+        )
+        .returning(MediaFiles.file_url)
+    )
+    if file_url is None:
+        path = media_path(sha256, mime_type)
+        if not os.path.exists(path):
+            await write_stream(open_chunks(), path)
+        # Под блокировкой строку никто не вставит, ON CONFLICT - страховка
+        stmt = insert(MediaFiles).values(
+            sha256=sha256,
+            file_url="/" + path.replace(os.sep, "/"),
+            mime_type=mime_type,
+            size=size,
+            ref_count=0,
+        )
+        file_url = await session.scalar(
+            stmt.on_conflict_do_update(
+                index_elements=[MediaFiles.sha256],
+                set_={"created_at": func.now()},
+            ).returning(MediaFiles.file_url)
+        )
+    await session.commit()
+    return SavedFile(
+        file_url=file_url, size=size, mime_type=mime_type, sha256=sha256
+    )
+
 
-    # Генерируем уникальное имя файла
-    file_extension = os.path.splitext(file.filename)[1]
-    filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = os.path.join(media_dir, filename)
+def count_file_urls(file_urls: Iterable[str | None]) -> list[tuple[str, str, int]]:
+    """
+    (sha256, file_url, сколько раз) в порядке sha256: блокировки берем в одном
+    порядке во всех транзакциях - без deadlock
+    """
+    counts = Counter(file_url for file_url in file_urls if file_url)
+    return sorted(
+        (media_sha256(file_url), file_url, count) for file_url, count in counts.items()
+    )
 
-    # Сохраняем файл
-    async with aiofiles.open(file_path, "wb") as f:
-        content = await file.read()
-        await f.write(content)
 
-    file_url = f"/static/media/{filename}"
-    return file_url
+async def acquire_media(session: AsyncSession, file_urls: Iterable[str | None]) -> None:
+    """
+    +1 ссылка за каждую строку истории с file_url, в транзакции вставки.
+    file_url присылает клиент: URL, которого нет в mediafiles, ничего не
+    меняет, а release_media для такой строки так же ничего не снимет.
+    """
+    for sha256, file_url, count in count_file_urls(file_urls):
+        await lock_media(session, sha256)
+        await session.execute(
+            update(MediaFiles)
+            .where(MediaFiles.sha256 == sha256, MediaFiles.file_url == file_url)
+            .values(ref_count=MediaFiles.ref_count + count)
+        )
+
+
+async def release_media(
+    session: AsyncSession, file_urls: Iterable[str | None]
+) -> list[str]:
+    """
+    Снять по ссылке за каждую удаляемую строку истории; строки файлов без
+    ссылок удаляются. Возвращает пути этих файлов - удалять их с диска можно
+    только после COMMIT (remove_media_files), иначе откат оставит строку без файла.
+    """
+    paths = []
+    for sha256, file_url, count in count_file_urls(file_urls):
+        await lock_media(session, sha256)
+        mime_type = await session.scalar(
+            delete(MediaFiles)
+            .where(
+                MediaFiles.sha256 == sha256,
+                MediaFiles.file_url == file_url,
+                MediaFiles.ref_count <= count,
+            )
+            .returning(MediaFiles.mime_type)
+        )
+        if mime_type is not None:
+            paths.append(media_path(sha256, mime_type))
+            continue
+        await session.execute(
+            update(MediaFiles)
+            .where(MediaFiles.sha256 == sha256, MediaFiles.file_url == file_url)
+            .values(ref_count=MediaFiles.ref_count - count)
+        )
+    return paths
+
+
+async def release_user_media(session: AsyncSession, user_id: int) -> list[str]:
+    """Снять ссылки сообщений пользователя на медиафайлы перед удалением истории"""
+    file_urls = await session.scalars(
+        select(WebsocketMessageHistory.file_url).where(
+            or_(
+                WebsocketMessageHistory.from_user_id == user_id,
+                WebsocketMessageHistory.to_user_id == user_id,
+            ),
+            WebsocketMessageHistory.file_url.is_not(None),
+        )
+    )
+    return await release_media(session, file_urls.all())
+
+
+async def remove_media_files(session: AsyncSession, paths: Iterable[str]) -> None:
+    """
+    Удалить с диска файлы, чьи строки удалены закоммиченной транзакцией.
+    Под блокировкой sha256 перепроверяем строку: файл могли загрузить заново
+    между COMMIT и удалением, тогда он снова нужен.
+    """
+    for path in sorted(paths, key=media_sha256):
+        sha256 = media_sha256(path)
+        await lock_media(session, sha256)
+        exists = await session.scalar(
+            select(MediaFiles.sha256).where(MediaFiles.sha256 == sha256)
+        )
+        if exists is None:
+            with suppress(FileNotFoundError):
+                os.remove(path)
+    await session.commit()
+
+
+async def sweep_unreferenced_media(session: AsyncSession, grace_seconds: int) -> int:
+    """
+    Удалить загрузки, которые так и не попали в историю за grace_seconds.
+    Возвращает число удаленных файлов.
+    """
+    stale = MediaFiles.created_at < func.now() - timedelta(seconds=grace_seconds)
+    candidates = await session.scalars(
+        select(MediaFiles.sha256)
+        .where(MediaFiles.ref_count <= 0, stale)
+        .order_by(MediaFiles.sha256)
+    )
+    paths = []
+    for sha256 in candidates.all():
+        await lock_media(session, sha256)
+        # Пока ждали блокировку, файл могли отправить или загрузить заново
+        mime_type = await session.scalar(
+            delete(MediaFiles)
+            .where(MediaFiles.sha256 == sha256, MediaFiles.ref_count <= 0, stale)
+            .returning(MediaFiles.mime_type)
+        )
+        if mime_type is not None:
+            paths.append(media_path(sha256, mime_type))
+    await session.commit()
+    await remove_media_files(session, paths)
+    return len(paths)
+
+
+async def save_uploaded_file(file_data: bytes) -> str:
+    """
+    Сохраняет загруженный файл и возвращает URL для доступа к нему
+    """
+    async with db_helper.session_factory() as session:
+        saved = await store_media(session, lambda: iter_bytes(file_data))
+    return saved.file_url
+
+
+async def save_uploaded_file_from_form(
+    file: UploadFile, session: AsyncSession
+) -> SavedFile:
+    """
+    Сохраняет файл из формы (для HTTP эндпоинтов)
+    """
+    # Размер известен до чтения - слишком большой файл отклоняем сразу
+    if file.size is not None and file.size > MAX_FILE_SIZE:
+        raise too_large()
+    return await store_media(session, lambda: iter_upload(file))
@@ -1,4 +1,7 @@
-from fastapi import APIRouter, Depends, Request, File, UploadFile, Form
+from fastapi import APIRouter, Depends, Request, File, UploadFile, Form, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core import db_helper
 from core.auth.crud import get_current_user
 from core.media.helper import save_uploaded_file_from_form
 from pydantic import BaseModel
@@ -20,19 +23,21 @@ class FileUploadResponse(BaseModel):
 @router.post("/upload-file")
 async def upload_file(
     file: UploadFile = File(...),
+    session: AsyncSession = Depends(db_helper.session_dependency),
 ):
     try:
-        file_url = await save_uploaded_file_from_form(file)
-
-        # Определяем тип автоматически по content_type
-        content_type = file.content_type or "application/octet-stream"
+        # Повторная загрузка того же файла возвращает уже сохраненный file_url
+        saved = await save_uploaded_file_from_form(file, session)
 
+        # Тип определен по содержимому файла, а не по content_type клиента
         return FileUploadResponse(
-            file_url=file_url,
+            file_url=saved.file_url,
             file_name=file.filename,
-            file_size=file.size,
-            mime_type=content_type,
+            file_size=saved.size,
+            mime_type=saved.mime_type,
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         return {"error": str(e)}
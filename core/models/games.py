@@ -1,9 +1,9 @@
 import enum
-from datetime import datetime
+from datetime import datetime, date
 
 from sqlalchemy import func, ForeignKey
 from sqlalchemy.ext.hybrid import hybrid_property
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.orm import Mapped, mapped_column, relationship, validates
 from sqlalchemy.dialects.postgresql import JSONB
 from core.config import Base
 from sqlalchemy.dialects.postgresql import TIMESTAMP
@@ -15,9 +15,25 @@ from sqlalchemy import (
     func,
     text,
     BigInteger,
+    Index,
+    Date,
 )
 
 
+RELEASE_DATE_FORMATS = ["%B %d, %Y", "%b %d, %Y", "%Y-%m-%d", "%d.%m.%Y"]
+
+
+def parse_release_date(release_year: str | None) -> date | None:
+    if not release_year:
+        return None
+    for fmt in RELEASE_DATE_FORMATS:
+        try:
+            return datetime.strptime(release_year, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
 class GameGenre(enum.Enum):
     ACTION = "action"
     ADVENTURE = "adventure"
@@ -41,14 +57,32 @@ class Games(Base):
         name="name",
     )
     release_year: Mapped[str] = mapped_column(nullable=True)
+    release_date: Mapped[date] = mapped_column(Date, nullable=True)
     genre: Mapped[GameGenre] = mapped_column(
-        nullable=False, default=GameGenre.ADVENTURE
+        nullable=False, default=GameGenre.ADVENTURE, index=True
     )
     story: Mapped[str] = mapped_column(Text, nullable=False)
     gameplay: Mapped[str] = mapped_column(Text, nullable=False)
     graphics: Mapped[str] = mapped_column(Text, nullable=True)
     game_development: Mapped[str] = mapped_column(Text, nullable=True)
     gallery: Mapped[list[str]] = mapped_column(JSONB, nullable=True)
+    # Агрегаты оценок обновляются вместе со вставкой в gamesuserratings
+    rating_sum: Mapped[int] = mapped_column(
+        BigInteger, nullable=False, default=0, server_default=text("0")
+    )
+    rating_count: Mapped[int] = mapped_column(
+        BigInteger, nullable=False, default=0, server_default=text("0")
+    )
+
+    __table_args__ = (
+        Index(
+            "ix_games_rating_sum",
+            rating_sum.desc(),
+            postgresql_where=text("rating_count > 0"),
+        ),
+        # Сортировка по дате: NULL меньше любой даты, порядок (release_date, id)
+        Index("ix_games_release_date_id", release_date.asc().nulls_first(), id),
+    )
 
     system_requirements = relationship("GamesCharacteristics", back_populates="game")
 
@@ -64,28 +98,24 @@ class Games(Base):
         back_populates="games",
     )
 
+    @validates("release_year")
+    def sync_release_date(self, key, value):
+        """release_date всегда соответствует строке release_year"""
+        self.release_date = parse_release_date(value)
+        return value
+
     @hybrid_property
     def release_date_converted(self):
         """Внутреннее свойство для преобразования строки в объект даты"""
-        if not self.release_year:
-            return None
-
-        formats = ["%B %d, %Y", "%b %d, %Y", "%Y-%m-%d", "%d.%m.%Y"]
-        for fmt in formats:
-            try:
-                return datetime.strptime(self.release_year, fmt).date()
-            except ValueError:
-                continue
-        return None
+        return self.release_date
 
     @hybrid_property
     def is_future(self) -> bool:
         """Это поле увидит Pydantic"""
-        rd = self.release_date_converted
+        rd = self.release_date
         return rd > datetime.now().date() if rd else False
 
     @is_future.expression
     def is_future(cls):
         """Это поле будет использовать эндпоинт в .where(Games.is_future == True)"""
-        # to_date в Postgres отлично справляется с "May 13, 2016"
-        return func.to_date(cls.release_year, "Month DD, YYYY") > func.current_date()
+        return cls.release_date > func.current_date()
@@ -1,13 +1,15 @@
 from sqlalchemy import func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, ForeignKey
+from sqlalchemy import String, ForeignKey, UniqueConstraint
 from core.config import Base
 from sqlalchemy.dialects.postgresql import TIMESTAMP
 
 
 class GamesUserLiked(Base):
     id: Mapped[int] = mapped_column(primary_key=True)
-    game_id: Mapped[int] = mapped_column(ForeignKey("games.id", ondelete="CASCADE"))
+    game_id: Mapped[int] = mapped_column(
+        ForeignKey("games.id", ondelete="CASCADE"), index=True
+    )
     user_id: Mapped[int] = mapped_column(
         ForeignKey(
             "users.id",
@@ -23,3 +25,9 @@ class GamesUserLiked(Base):
     users = relationship("Users", back_populates="games_user_liked")
 
     games = relationship("Games", back_populates="games_user_liked")
+
+    __table_args__ = (
+        UniqueConstraint(
+            "user_id", "game_id", name="uq_gamesuserliked_user_id_game_id"
+        ),
+    )
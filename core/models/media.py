@@ -0,0 +1,26 @@
+from sqlalchemy import BigInteger, String, Text, func, text
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import TIMESTAMP
+
+from core.config import Base
+
+
+class MediaFiles(Base):
+    """
+    Медиафайл чата, адресуемый содержимым: sha256 - ключ, ref_count - сколько
+    строк истории на него ссылается. Файл лежит в static/media/<sha[:2]>/<sha[2:4]>/
+    """
+
+    sha256: Mapped[str] = mapped_column(String(64), primary_key=True)
+    file_url: Mapped[str] = mapped_column(Text, nullable=False)
+    mime_type: Mapped[str] = mapped_column(Text, nullable=False)
+    size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    ref_count: Mapped[int] = mapped_column(
+        nullable=False,
+        server_default=text("0"),
+    )
+    created_at: Mapped[TIMESTAMP] = mapped_column(
+        TIMESTAMP(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+    )
@@ -1,6 +1,7 @@
 import enum
 
-from sqlalchemy import ForeignKey, func, JSON, Identity, BigInteger
+from sqlalchemy import ForeignKey, func, JSON, Identity, BigInteger, Index
+from sqlalchemy import UniqueConstraint
 from sqlalchemy.orm import mapped_column, Mapped
 from sqlalchemy.dialects.postgresql import TIMESTAMP
 from core.config import Base
@@ -55,6 +56,54 @@ class Payments(Base):
         nullable=False,
         server_default=func.now(),
     )
+    # Когда статус последний раз подтвержден вебхуком или шлюзом
+    updated_at: Mapped[TIMESTAMP] = mapped_column(
+        TIMESTAMP(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+    )
+
+    # Вебхуки обновляют платеж по payment_id
+    __table_args__ = (Index("ix_payments_payment_id", payment_id),)
+
+
+class PaymentWebhookEvents(Base):
+    """
+    Уже примененные события вебхука: повторная доставка того же
+    (payment_id, event) от ЮKassa или из очереди отбрасывается
+    """
+
+    id: Mapped[int] = mapped_column(
+        BigInteger,
+        Identity(always=True),
+        primary_key=True,
+    )
+    payment_id: Mapped[str] = mapped_column(Text, nullable=False)
+    event: Mapped[str] = mapped_column(Text, nullable=False)
+    received_at: Mapped[TIMESTAMP] = mapped_column(
+        TIMESTAMP(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+    )
+
+    __table_args__ = (UniqueConstraint(payment_id, event),)
+
+
+class SavedPaymentMethods(Base):
+    """Сохраненный способ оплаты пользователя - для платежей без указания карты"""
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    payment_method_id: Mapped[str] = mapped_column(Text, nullable=False)
+    type: Mapped[str] = mapped_column(Text, nullable=True)
+    payment_details: Mapped[dict] = mapped_column(JSON, nullable=True)
+    updated_at: Mapped[TIMESTAMP] = mapped_column(
+        TIMESTAMP(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+    )
 
 
 """
@@ -21,7 +21,7 @@ class Users(Base):
         nullable=False,
         server_default=func.now(),
     )
-    cookie: Mapped[str] = mapped_column(nullable=True)
+    cookie: Mapped[str] = mapped_column(nullable=True, index=True)
     cookie_expires: Mapped[TIMESTAMP] = mapped_column(
         TIMESTAMP(timezone=True),
         nullable=True,
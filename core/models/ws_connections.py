@@ -1,8 +1,9 @@
 import enum
 import datetime as dt
+import uuid
 from typing import Optional
 
-from sqlalchemy import func, ForeignKey, String, Integer, DateTime
+from sqlalchemy import func, ForeignKey, String, Integer, DateTime, UUID, Float
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import JSONB
@@ -10,22 +11,22 @@ from core.config import Base
 from sqlalchemy.dialects.postgresql import TIMESTAMP
 from sqlalchemy import (
     Text,
-    Identity,
     create_engine,
     CheckConstraint,
     func,
     text,
-    BigInteger,
+    Index,
 )
 
 from core.models import Users
 
 
 class WebsocketConnections(Base):
-    id: Mapped[int] = mapped_column(
-        BigInteger,
-        Identity(always=True),
+    # id генерируется в приложении - отключение обновляет строку, не дожидаясь INSERT
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
         primary_key=True,
+        default=uuid.uuid4,
     )
     user_id = mapped_column(
         ForeignKey("users.id", ondelete="CASCADE"),
@@ -40,10 +41,11 @@ class WebsocketConnections(Base):
         nullable=False,
     )
 
+    # Ключ партиционирования, поэтому входит в первичный ключ
     connected_at: Mapped[TIMESTAMP] = mapped_column(
         TIMESTAMP(timezone=True),
         server_default=func.now(),
-        nullable=True,
+        primary_key=True,
     )
     disconnected_at: Mapped[TIMESTAMP] = mapped_column(
         TIMESTAMP(timezone=True),
@@ -54,8 +56,16 @@ class WebsocketConnections(Base):
         nullable=True,
     )
     user_agent: Mapped[str] = mapped_column(Text, nullable=True)
+    duration_seconds: Mapped[float] = mapped_column(Float, nullable=True)
     is_active: Mapped[bool] = mapped_column(
         default=None,
         server_default=text("false"),
         nullable=None,
     )
+
+    # Таблица разбита на партиции по месяцам, старые удаляются целиком
+    __table_args__ = (
+        Index("ix_websocketconnections_username_connected_at", username, connected_at),
+        Index("ix_websocketconnections_user_id_connected_at", user_id, connected_at),
+        {"postgresql_partition_by": "RANGE (connected_at)"},
+    )
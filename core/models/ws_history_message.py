@@ -17,6 +17,7 @@ from sqlalchemy import (
     func,
     text,
     BigInteger,
+    Index,
 )
 
 from core.models import Users
@@ -37,8 +38,12 @@ class WebsocketMessageHistory(Base):
         default=uuid.uuid4,  # ← генерируется автоматически
         server_default=text("gen_random_uuid()"),  # ← для БД
     )
-    from_user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=True)
-    to_user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=True)
+    from_user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id"), nullable=True
+    )
+    to_user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id"), nullable=True
+    )
     message: Mapped[str] = mapped_column(Text, nullable=False)
     file_url: Mapped[str] = mapped_column(nullable=True)
     mime_type: Mapped[str] = mapped_column(nullable=True)
@@ -51,9 +56,17 @@ class WebsocketMessageHistory(Base):
         nullable=False,
         server_default=func.now(),
     )
+    # Номер сообщения из последовательности БД - курсор синхронизации истории
+    seq: Mapped[int] = mapped_column(BigInteger, Identity(always=True), nullable=False)
     from_user = relationship(
         "Users", foreign_keys=[from_user_id], back_populates="ws_message_from_user"
     )
     to_user = relationship(
         "Users", foreign_keys=[to_user_id], back_populates="ws_message_to_user"
     )
+
+    # История диалога читается страницами по (seq, id) для каждой стороны
+    __table_args__ = (
+        Index("ix_websocketmessagehistory_from_user_id_seq", from_user_id, seq, id),
+        Index("ix_websocketmessagehistory_to_user_id_seq", to_user_id, seq, id),
+    )
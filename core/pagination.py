@@ -0,0 +1,184 @@
+import base64
+import binascii
+import enum
+import json
+import uuid
+from datetime import date, datetime
+
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import Select, tuple_, literal, asc, desc
+from sqlalchemy.ext.asyncio import AsyncSession
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def encode_cursor(sort_value, last_id) -> str:
+    raw = json.dumps(jsonable_encoder([sort_value, last_id])).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_key, id_col, nullable: bool = False) -> list:
+    """
+    Курсор обратно в [sort_value, last_id] в типах колонок. Любой курсор, который
+    не разбирается или не подходит по типам, - 400, а не ошибка в запросе к БД.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, last_id = json.loads(raw)
+        if sort_value is None and not nullable or last_id is None:
+            raise ValueError("NULL в курсоре")
+        return [_restore(sort_value, sort_key), _restore(last_id, id_col)]
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+def select_fields(fields: str | None, columns: dict) -> list:
+    """
+    Колонки для SELECT по параметру fields="name,genre".
+    Неуказанные тяжелые колонки (story, gallery и т.д.) в запрос не попадают.
+    id выбирается всегда - по нему строится курсор.
+    """
+    if not fields:
+        return list(columns.values())
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = set(names) - columns.keys()
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}",
+        )
+    return [columns["id"]] + [columns[name] for name in names if name != "id"]
+
+
+def _restore(value, column):
+    """
+    Значение из курсора обратно в тип колонки (даты, uuid и enum хранятся
+    строкой). Значение не того типа - ValueError/TypeError.
+    """
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if value is None:
+        return None
+    if python_type in (datetime, date, uuid.UUID):
+        if not isinstance(value, str):
+            raise TypeError(f"{python_type.__name__} в курсоре должен быть строкой")
+        if python_type is uuid.UUID:
+            return uuid.UUID(value)
+        return python_type.fromisoformat(value)
+    if issubclass(python_type, enum.Enum):
+        return python_type(value)
+    # bool - подкласс int, но в курсоре числовой колонки ему не место
+    if isinstance(value, bool) and python_type is not bool:
+        raise TypeError("bool в курсоре")
+    if python_type is float and isinstance(value, int):
+        return float(value)
+    if not isinstance(value, python_type):
+        raise TypeError(f"в курсоре ожидается {python_type.__name__}")
+    return value
+
+
+async def _rows(session: AsyncSession, stmt: Select) -> list[dict]:
+    result = await session.execute(stmt)
+    return [dict(row) for row in result.mappings().all()]
+
+
+async def _fetch_nullable(
+    session: AsyncSession,
+    stmt: Select,
+    sort_key,
+    id_col,
+    after: list | None,
+    limit: int,
+    descending: bool,
+) -> list[dict]:
+    """
+    NULL в sort_key меньше любого значения: в начале по возрастанию, в конце по
+    убыванию. Сравнение кортежей с NULL не работает, поэтому строки с NULL и
+    без него читаются отдельными запросами - остаток сегмента, где стоит курсор,
+    затем начало следующего. Оба запроса идут по индексу (sort_key NULLS FIRST, id).
+    """
+    order = desc if descending else asc
+    if descending:
+        sort_order = desc(sort_key).nulls_last()
+    else:
+        sort_order = asc(sort_key).nulls_first()
+    in_nulls = after is not None and after[0] is None
+
+    async def nulls(count: int) -> list[dict]:
+        part = stmt.where(sort_key.is_(None))
+        if in_nulls:
+            last_id = literal(after[1], id_col.type)
+            part = part.where(id_col < last_id if descending else id_col > last_id)
+        return await _rows(session, part.order_by(order(id_col)).limit(count))
+
+    async def values(count: int) -> list[dict]:
+        part = stmt.where(sort_key.is_not(None))
+        if after is not None and not in_nulls:
+            key = tuple_(
+                literal(after[0], sort_key.type), literal(after[1], id_col.type)
+            )
+            row_key = tuple_(sort_key, id_col)
+            part = part.where(row_key < key if descending else row_key > key)
+        part = part.order_by(sort_order, order(id_col)).limit(count)
+        return await _rows(session, part)
+
+    if descending:
+        rows = [] if in_nulls else await values(limit)
+        if len(rows) < limit:
+            rows += await nulls(limit - len(rows))
+    else:
+        rows = await nulls(limit) if after is None or in_nulls else []
+        if len(rows) < limit:
+            rows += await values(limit - len(rows))
+    return rows
+
+
+async def fetch_page(
+    session: AsyncSession,
+    stmt: Select,
+    sort_key,
+    id_col,
+    cursor: str | None = None,
+    limit: int = DEFAULT_LIMIT,
+    descending: bool = False,
+    nullable: bool = False,
+) -> dict:
+    """
+    Keyset-пагинация по (sort_key, id): следующая страница начинается строго после
+    последней строки предыдущей, без OFFSET. sort_key не должен быть NULL, если
+    не указан nullable (см. _fetch_nullable).
+    """
+    limit = max(1, min(limit, MAX_LIMIT))
+    stmt = stmt.add_columns(sort_key.label("sort_key"))
+    after = None
+    if cursor:
+        after = decode_cursor(cursor, sort_key, id_col, nullable)
+
+    if nullable:
+        rows = await _fetch_nullable(
+            session, stmt, sort_key, id_col, after, limit + 1, descending
+        )
+    else:
+        if after is not None:
+            key = tuple_(
+                literal(after[0], sort_key.type), literal(after[1], id_col.type)
+            )
+            row_key = tuple_(sort_key, id_col)
+            stmt = stmt.where(row_key < key if descending else row_key > key)
+        order = desc if descending else asc
+        stmt = stmt.order_by(order(sort_key), order(id_col)).limit(limit + 1)
+        rows = await _rows(session, stmt)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["sort_key"], rows[-1]["id"])
+    for row in rows:
+        row.pop("sort_key")
+    return {"items": rows, "next_cursor": next_cursor}
@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import os
+import uuid
+from typing import Any
+
+import httpx
+from dotenv import load_dotenv
+
+from core.config import settings
+
+log = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Ответы, после которых запрос можно безопасно повторить с тем же ключом идемпотентности
+RETRY_STATUSES = {202, 429, 500, 502, 503, 504}
+
+
+class PaymentGatewayError(Exception):
+    def __init__(self, status_code: int, code: str | None = None, description: str = ""):
+        super().__init__(f"{status_code} {code}: {description}")
+        self.status_code = status_code
+        self.code = code
+        self.description = description
+
+
+class YooKassaClient:
+    """
+    Асинхронный клиент API ЮKassa поверх httpx: пул keep-alive соединений,
+    таймауты, ограничение одновременных запросов и повтор временных ошибок.
+    POST-запрос повторяется с тем же Idempotence-Key, поэтому платеж не
+    создается дважды.
+    """
+
+    def __init__(
+        self,
+        api_url: str,
+        account_id: str | None,
+        secret_key: str | None,
+        timeout: float,
+        connect_timeout: float,
+        max_connections: int,
+        max_keepalive_connections: int,
+        keepalive_expiry: float,
+        max_concurrency: int,
+        max_retries: int,
+        retry_backoff: float,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.api_url = api_url
+        self.auth = httpx.BasicAuth(account_id or "", secret_key or "")
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        # Для тестов - httpx.MockTransport вместо сети
+        self.transport = transport
+        self.client: httpx.AsyncClient | None = None
+
+    async def initialize(self) -> None:
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                base_url=self.api_url,
+                auth=self.auth,
+                timeout=self.timeout,
+                limits=self.limits,
+                transport=self.transport,
+            )
+
+    async def close(self) -> None:
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    def _delay(self, attempt: int, response: httpx.Response | None) -> float:
+        if response is not None:
+            if response.status_code == 202:
+                # Запрос еще обрабатывается: ЮKassa сама говорит, когда спросить снова
+                try:
+                    retry_after = response.json().get("retry_after")
+                except ValueError:
+                    retry_after = None
+                if retry_after:
+                    return retry_after / 1000
+            elif "Retry-After" in response.headers:
+                try:
+                    return float(response.headers["Retry-After"])
+                except ValueError:
+                    pass
+        return self.retry_backoff * 2**attempt
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        json: dict | None = None,
+        params: dict | None = None,
+        idempotency_key: str | uuid.UUID | None = None,
+    ) -> dict[str, Any]:
+        await self.initialize()
+        headers = {}
+        if method == "POST":
+            headers["Idempotence-Key"] = str(idempotency_key or uuid.uuid4())
+
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                async with self.semaphore:
+                    response = await self.client.request(
+                        method, path, json=json, params=params, headers=headers
+                    )
+                if response.status_code not in RETRY_STATUSES:
+                    break
+                log.warning(
+                    f"ЮKassa {method} {path}: {response.status_code}, "
+                    f"попытка {attempt + 1}/{self.max_retries + 1}"
+                )
+            except httpx.TransportError as e:
+                log.warning(
+                    f"ЮKassa {method} {path}: {e!r}, "
+                    f"попытка {attempt + 1}/{self.max_retries + 1}"
+                )
+                if attempt == self.max_retries:
+                    raise PaymentGatewayError(503, "transport_error", str(e)) from e
+            if attempt < self.max_retries:
+                await asyncio.sleep(self._delay(attempt, response))
+
+        if response.is_success and response.status_code != 202:
+            return response.json()
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        raise PaymentGatewayError(
+            response.status_code, body.get("code"), body.get("description", "")
+        )
+
+    async def create_payment(
+        self, body: dict, idempotency_key: str | uuid.UUID | None = None
+    ) -> dict:
+        return await self._request(
+            "POST", "/payments", json=body, idempotency_key=idempotency_key
+        )
+
+    async def find_payment(self, payment_id: str) -> dict:
+        return await self._request("GET", f"/payments/{payment_id}")
+
+    async def list_payments(self, params: dict | None = None) -> dict:
+        return await self._request("GET", "/payments", params=params)
+
+    async def capture_payment(
+        self,
+        payment_id: str,
+        body: dict | None = None,
+        idempotency_key: str | uuid.UUID | None = None,
+    ) -> dict:
+        return await self._request(
+            "POST",
+            f"/payments/{payment_id}/capture",
+            json=body or {},
+            idempotency_key=idempotency_key,
+        )
+
+    async def cancel_payment(
+        self, payment_id: str, idempotency_key: str | uuid.UUID | None = None
+    ) -> dict:
+        return await self._request(
+            "POST",
+            f"/payments/{payment_id}/cancel",
+            json={},
+            idempotency_key=idempotency_key,
+        )
+
+    async def create_invoice(
+        self, body: dict, idempotency_key: str | uuid.UUID | None = None
+    ) -> dict:
+        return await self._request(
+            "POST", "/invoices", json=body, idempotency_key=idempotency_key
+        )
+
+
+yookassa_client = YooKassaClient(
+    api_url=settings.payment_gateway.api_url,
+    account_id=os.getenv("YOOKASSA__ACCOUNT__ID"),
+    secret_key=os.getenv("YOOKASSA__SECRET__KEY"),
+    timeout=settings.payment_gateway.timeout_seconds,
+    connect_timeout=settings.payment_gateway.connect_timeout_seconds,
+    max_connections=settings.payment_gateway.max_connections,
+    max_keepalive_connections=settings.payment_gateway.max_keepalive_connections,
+    keepalive_expiry=settings.payment_gateway.keepalive_expiry_seconds,
+    max_concurrency=settings.payment_gateway.max_concurrency,
+    max_retries=settings.payment_gateway.max_retries,
+    retry_backoff=settings.payment_gateway.retry_backoff_seconds,
+)
@@ -0,0 +1,108 @@
+import asyncio
+import logging
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core import db_helper
+from core.batch_writer import BatchWriter, is_transient
+from core.config import settings
+from core.models.payments import PaymentStatus, PaymentWebhookEvents
+from core.payments.read_model import apply_payment_updates
+from core.redis.payments import payment_cache
+
+log = logging.getLogger(__name__)
+
+
+class PoisonWebhook(Exception):
+    """Уведомление не записывается даже отдельно от пачки - повтор не поможет"""
+
+
+class PaymentEventApplier(BatchWriter):
+    """
+    Применение уведомлений ЮKassa из очереди payment_webhooks. Пачка
+    отбрасывает уже примененные (payment_id, event) через paymentwebhookevents
+    и записывает остальные в локальную модель платежей (read_model).
+    apply() ждет COMMIT своей пачки - только после него сообщение
+    подтверждается в RabbitMQ, а кэш статусов сбрасывается. Если пачку валит
+    одно уведомление, остальные пишутся по одному, а оно само завершается
+    PoisonWebhook и отклоняется без возврата в очередь.
+    """
+
+    name = "вебхуки платежей"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Пользователи, чей способ оплаты изменился в текущей пачке
+        self._changed_users: set[int] = set()
+
+    async def apply(self, notification: dict) -> None:
+        done = asyncio.get_running_loop().create_future()
+        await self.put((notification, done))
+        await done
+
+    async def _write(
+        self, session: AsyncSession, batch: list[tuple[dict, asyncio.Future]]
+    ) -> None:
+        events: dict[tuple[str, str], dict] = {}
+        for notification, _ in batch:
+            event = notification["event"]
+            if not event.startswith("payment."):
+                log.info(f"Событие {event} не меняет статус платежа, пропускаем")
+                continue
+            payment = notification["object"]
+            if payment.get("status") not in PaymentStatus.__members__:
+                log.warning(f"Неизвестный статус платежа {payment['id']}: {payment}")
+                continue
+            events.setdefault((payment["id"], event), payment)
+        if not events:
+            return
+
+        stmt = (
+            insert(PaymentWebhookEvents)
+            .values([{"payment_id": key[0], "event": key[1]} for key in events])
+            .on_conflict_do_nothing(index_elements=["payment_id", "event"])
+            .returning(PaymentWebhookEvents.payment_id, PaymentWebhookEvents.event)
+        )
+        fresh = {tuple(row) for row in await session.execute(stmt)}
+        if len(fresh) < len(events):
+            log.info(f"Повторных уведомлений в пачке: {len(events) - len(fresh)}")
+
+        # Пачка может писаться по одному уведомлению - копим, а не перезаписываем
+        self._changed_users |= await apply_payment_updates(
+            session, [payment for key, payment in events.items() if key in fresh]
+        )
+
+    def _dead_letter(self, batch: list, error: Exception) -> None:
+        # Неподтвержденные сообщения остаются в RabbitMQ - на диск их не откладываем
+        self.failed += len(batch)
+        if len(batch) == 1 and not is_transient(error):
+            notification, done = batch[0]
+            log.error(f"✗ {self.name}: уведомление отклонено: {error}; {notification}")
+            done.set_exception(PoisonWebhook(str(error)))
+            return
+        log.error(f"✗ {self.name}: пачка ({len(batch)}) не записана: {error}")
+        for _, done in batch:
+            done.set_exception(RuntimeError("пачка вебхуков не записана"))
+
+    async def _flush(self, batch: list) -> bool:
+        self._changed_users = set()
+        ok = await super()._flush(batch)
+        # Незаписанные уже получили исключение в _dead_letter, остальные - COMMIT
+        written = [(item, done) for item, done in batch if not done.done()]
+        if written:
+            await payment_cache.invalidate(
+                payment_ids={item["object"]["id"] for item, _ in written},
+                user_ids=self._changed_users,
+            )
+        for _, done in written:
+            done.set_result(None)
+        return ok
+
+
+payment_events = PaymentEventApplier(
+    session_factory=db_helper.session_factory,
+    batch_size=settings.payment_webhooks.batch_size,
+    flush_interval=settings.payment_webhooks.flush_interval_ms / 1000,
+    max_queue=settings.payment_webhooks.max_queue,
+)
@@ -2,33 +2,40 @@ import uuid
 from datetime import datetime, timedelta, timezone
 
 from fastapi import HTTPException, status, Depends, Request
-from sqlalchemy import select, and_
 from sqlalchemy.ext.asyncio import AsyncSession
-from starlette.concurrency import run_in_threadpool
-from yookassa import Configuration, Payment
-from yookassa.invoice import Invoice
-import os
-from dotenv import load_dotenv
-from yookassa.domain.exceptions import NotFoundError
-
-from dotenv import load_dotenv
 
 from core import db_helper
 from core.auth.crud import get_user_by_cookie
 from core.models.payments import Payments
+from core.payments.client import PaymentGatewayError, yookassa_client
+from core.payments.read_model import get_payment, get_saved_method
 from core.schemas.payments import PaymentSchema
 
-load_dotenv()
-Configuration.account_id = os.getenv("YOOKASSA__ACCOUNT__ID")
-Configuration.secret_key = os.getenv("YOOKASSA__SECRET__KEY")
+
+def gateway_error(e: PaymentGatewayError) -> HTTPException:
+    if e.status_code == status.HTTP_404_NOT_FOUND:
+        return HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Идентификатор платежа указан не верно",
+        )
+    return HTTPException(
+        status_code=status.HTTP_502_BAD_GATEWAY,
+        detail=f"Платежный шлюз недоступен: {e.description or e.code}",
+    )
 
 
-def payment_cancel(payment):
-    Payment.cancel(payment)
+async def payment_cancel(payment):
+    try:
+        return await yookassa_client.cancel_payment(payment)
+    except PaymentGatewayError as e:
+        raise gateway_error(e)
 
 
-def payment_find(payment):
-    data = Payment.find_one(payment)
+async def payment_find(payment, session: AsyncSession):
+    try:
+        data = await get_payment(session, payment)
+    except PaymentGatewayError as e:
+        raise gateway_error(e)
     return data
     # try:
     #     if data:
@@ -55,31 +62,33 @@ async def create_payment_with_future_linking_card_during_payment(
     session: AsyncSession = Depends(db_helper.session_dependency),
 ):
     user = await get_user_by_cookie(request=request, session=session)
-    data = await run_in_threadpool(
-        Payment.create,
-        {
-            "amount": {"value": amount, "currency": "RUB"},
-            "confirmation": {
-                "type": "redirect",
-                "return_url": f"http://localhost:5173/games",
+    try:
+        data = await yookassa_client.create_payment(
+            {
+                "amount": {"value": amount, "currency": "RUB"},
+                "confirmation": {
+                    "type": "redirect",
+                    "return_url": f"http://localhost:5173/games",
+                },
+                "capture": True,
+                "description": "Заказ №1",
+                # """
+                #  Если save_payment_method = False, или не указан
+                #  - payment_method_id не вернется (нужен для оплаты без указания карты)
+                # """
+                "save_payment_method": True,
             },
-            "capture": True,
-            "description": "Заказ №1",
-            # """
-            #  Если save_payment_method = False, или не указан
-            #  - payment_method_id не вернется (нужен для оплаты без указания карты)
-            # """
-            "save_payment_method": True,
-        },
-        idempotency_key=uuid.uuid4(),
-    )
-    created_at = datetime.fromisoformat(data.created_at.replace("Z", "+00:00"))
+            idempotency_key=uuid.uuid4(),
+        )
+    except PaymentGatewayError as e:
+        raise gateway_error(e)
+    created_at = datetime.fromisoformat(data["created_at"].replace("Z", "+00:00"))
     stmt = Payments(
-        payment_id=data.id,
+        payment_id=data["id"],
         user_id=user["user_id"],
-        price=data.amount.value,
-        description=data.description,
-        status=data.status,
+        price=data["amount"]["value"],
+        description=data.get("description"),
+        status=data["status"],
         created_at=created_at,
     )
     session.add(stmt)
@@ -94,45 +103,41 @@ async def payment_with_linked_card(
     session: AsyncSession = Depends(db_helper.session_dependency),
 ):
     user = await get_user_by_cookie(request=request, session=session)
-    stmt = select(Payments.payment_method_id).where(
-        and_(Payments.user_id == user["user_id"], Payments.payment_for_linking == True)
-    )
-    res = await session.execute(stmt)
-    payment_method_id = res.scalar()
-
-    data = await run_in_threadpool(
-        Payment.create,
-        {
-            "amount": {"value": amount, "currency": "RUB"},
-            "payment_method_id": payment_method_id,  # ID сохранённой карты
-            "description": "Платеж без указания карты",
-        },
-        idempotency_key=uuid.uuid4(),
-    )
+    payment_method_id = await get_saved_method(session, user["user_id"])
+    if payment_method_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Нет сохраненного способа оплаты",
+        )
+
+    try:
+        data = await yookassa_client.create_payment(
+            {
+                "amount": {"value": amount, "currency": "RUB"},
+                "payment_method_id": payment_method_id,  # ID сохранённой карты
+                "description": "Платеж без указания карты",
+            },
+            idempotency_key=uuid.uuid4(),
+        )
+    except PaymentGatewayError as e:
+        raise gateway_error(e)
 
     return data
 
 
-def check_payment_linking_card_during_payment(payment_id):
-    try:
-        data = Payment.find_one(payment_id)
-        if data["status"] == "succeeded" and data["payment_method"]["saved"]:
-            # return "Платеж обработан успешно и привязка создана"
-            # return data["payment_method"]["id"]
-            return data
-        elif data["status"] == "pending":
-            return "Платеж в обработке"
-
-        elif data["status"] == "waiting_for_capture":
-            return "Платеж ожидает подтверждения"
-        else:
-            return "Привязка еще не создана"
-
-    except NotFoundError:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Идентификатор платежа указан не верно",
-        )
+async def check_payment_linking_card_during_payment(payment_id, session: AsyncSession):
+    data = await payment_find(payment_id, session)
+    if data["status"] == "succeeded" and data["payment_method"].get("saved"):
+        # return "Платеж обработан успешно и привязка создана"
+        # return data["payment_method"]["id"]
+        return data
+    elif data["status"] == "pending":
+        return "Платеж в обработке"
+
+    elif data["status"] == "waiting_for_capture":
+        return "Платеж ожидает подтверждения"
+    else:
+        return "Привязка еще не создана"
 
 
 async def create_payment(
@@ -141,31 +146,32 @@ async def create_payment(
     session: AsyncSession = Depends(db_helper.session_dependency),
 ):
     user = await get_user_by_cookie(session, request)
-    payment = await run_in_threadpool(
-        Payment.create,
-        {
-            "amount": {"value": price, "currency": "RUB"},
-            "confirmation": {
-                "type": "redirect",
-                "return_url": f"http://localhost:5173/games",
+    try:
+        payment = await yookassa_client.create_payment(
+            {
+                "amount": {"value": price, "currency": "RUB"},
+                "confirmation": {
+                    "type": "redirect",
+                    "return_url": f"http://localhost:5173/games",
+                },
+                # "capture": True - Платеж одностадийный, False - платеж двухстадийный
+                # Двух стадийный платеж полезен, когда после оплаты, деньги не сразу
+                # же переходят к продавцу. Пример: Авито. Деньги покупателя
+                # приходят после сделки
+                "capture": False,
+                "description": "Заказ №1",
             },
-            """
-                "capture": True - Платеж одностадийный, False - платеж двухстадийный
-                Двух стадийный платеж полезен, когда после оплаты, деньги не сразу же переходят к продавцу
-                Пример: Авито. Деньги покупателя приходят после сделки
-            """
-            "capture": False,
-            "description": "Заказ №1",
-        },
-        idempotency_key=uuid.uuid4(),
-    )
-    created_at = datetime.fromisoformat(payment.created_at.replace("Z", "+00:00"))
+            idempotency_key=uuid.uuid4(),
+        )
+    except PaymentGatewayError as e:
+        raise gateway_error(e)
+    created_at = datetime.fromisoformat(payment["created_at"].replace("Z", "+00:00"))
     stmt = Payments(
-        payment_id=payment.id,
+        payment_id=payment["id"],
         user_id=user.get("user_id"),
         price=price,
-        description=payment.description,
-        status=payment.status,
+        description=payment.get("description"),
+        status=payment["status"],
         created_at=created_at,
     )
     session.add(stmt)
@@ -174,19 +180,29 @@ async def create_payment(
     return payment
 
 
-def partial_debiting(payment_id):
-    payment = Payment.capture(
-        payment_id,
-        {
-            "amount": {
-                "value": 5,
-                "currency": "RUB",
-            },  # в бд надо будет искать value по payment_id
-        },
-    )
+async def partial_debiting(payment_id):
+    try:
+        payment = await yookassa_client.capture_payment(
+            payment_id,
+            {
+                "amount": {
+                    "value": 5,
+                    "currency": "RUB",
+                },  # в бд надо будет искать value по payment_id
+            },
+        )
+    except PaymentGatewayError as e:
+        raise gateway_error(e)
     return payment
 
 
+async def list_payments():
+    try:
+        return await yookassa_client.list_payments()
+    except PaymentGatewayError as e:
+        raise gateway_error(e)
+
+
 async def create_invoice():
     expires_at = (
         (datetime.now(timezone.utc) + timedelta(hours=1))
@@ -194,26 +210,28 @@ async def create_invoice():
         .replace("+00:00", "Z")
     )
 
-    invoice = await run_in_threadpool(
-        Invoice.create,
-        {
-            "payment_data": {
-                "amount": {"value": "10.00", "currency": "RUB"},
-                "capture": True,
-                "description": "Заказ №37",
-            },
-            "cart": [
-                {
-                    "description": "Товар",
-                    "price": {"value": "10.00", "currency": "RUB"},
-                    "quantity": 1.000,
+    try:
+        invoice = await yookassa_client.create_invoice(
+            {
+                "payment_data": {
+                    "amount": {"value": "10.00", "currency": "RUB"},
+                    "capture": True,
+                    "description": "Заказ №37",
                 },
-            ],
-            "delivery_method_data": {"type": "self"},
-            "locale": "ru_RU",
-            "expires_at": expires_at,
-            "description": "Счет",
-        },
-        idempotency_key=uuid.uuid4(),
-    )
+                "cart": [
+                    {
+                        "description": "Товар",
+                        "price": {"value": "10.00", "currency": "RUB"},
+                        "quantity": 1.000,
+                    },
+                ],
+                "delivery_method_data": {"type": "self"},
+                "locale": "ru_RU",
+                "expires_at": expires_at,
+                "description": "Счет",
+            },
+            idempotency_key=uuid.uuid4(),
+        )
+    except PaymentGatewayError as e:
+        raise gateway_error(e)
     return invoice
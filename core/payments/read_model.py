@@ -0,0 +1,196 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import Boolean, bindparam, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from core.models.payments import (
+    Payments,
+    PaymentStatus,
+    PaymentType,
+    SavedPaymentMethods,
+)
+from core.payments.client import PaymentGatewayError, yookassa_client
+from core.redis.payments import payment_cache
+
+log = logging.getLogger(__name__)
+
+# Из каких статусов можно перейти в данный - опоздавший вебхук не откатывает платеж назад
+ALLOWED_FROM = {
+    PaymentStatus.pending: (),
+    PaymentStatus.waiting_for_capture: (PaymentStatus.pending,),
+    PaymentStatus.succeeded: (PaymentStatus.pending, PaymentStatus.waiting_for_capture),
+    PaymentStatus.canceled: (PaymentStatus.pending, PaymentStatus.waiting_for_capture),
+}
+FINAL_STATUSES = {PaymentStatus.succeeded.value, PaymentStatus.canceled.value}
+
+
+def _update_statement(status: PaymentStatus):
+    payments = Payments.__table__
+    return (
+        update(payments)
+        .where(payments.c.payment_id == bindparam("b_payment_id"))
+        .where(
+            or_(
+                payments.c.status.is_(None),
+                # Тот же статус тоже пишем - обновляется updated_at
+                payments.c.status.in_((status, *ALLOWED_FROM[status])),
+            )
+        )
+        .values(
+            status=status,
+            payment_method_id=func.coalesce(
+                bindparam("b_method_id", type_=payments.c.payment_method_id.type),
+                payments.c.payment_method_id,
+            ),
+            type=func.coalesce(
+                bindparam("b_type", type_=payments.c.type.type), payments.c.type
+            ),
+            payment_details=func.coalesce(
+                bindparam("b_details", type_=payments.c.payment_details.type),
+                payments.c.payment_details,
+            ),
+            payment_for_linking=func.coalesce(
+                bindparam("b_for_linking", type_=Boolean),
+                payments.c.payment_for_linking,
+            ),
+            updated_at=func.now(),
+        )
+    )
+
+
+def _params(payment: dict) -> dict:
+    method = payment.get("payment_method") or {}
+    method_type = method.get("type")
+    known_type = method_type in PaymentType.__members__
+    return {
+        "b_payment_id": payment["id"],
+        "b_method_id": method.get("id"),
+        "b_type": PaymentType(method_type) if known_type else None,
+        "b_details": method or None,
+        # Карта из вебхука больше не считается платежом для привязки
+        "b_for_linking": False if method_type == PaymentType.bank_card.value else None,
+    }
+
+
+async def apply_payment_updates(session: AsyncSession, payments: list[dict]) -> set[int]:
+    """
+    Записать статусы платежей (объекты payment из вебхука или шлюза) в payments
+    и сохраненные способы оплаты в savedpaymentmethods. Один executemany UPDATE
+    на каждый целевой статус. Возвращает user_id с обновленным способом оплаты.
+    """
+    by_status: dict[PaymentStatus, list[dict]] = defaultdict(list)
+    saved: dict[str, dict] = {}
+    for payment in payments:
+        status = PaymentStatus[payment["status"]]
+        by_status[status].append(_params(payment))
+        method = payment.get("payment_method") or {}
+        if status == PaymentStatus.succeeded and method.get("saved"):
+            saved[payment["id"]] = method
+    for status, params in by_status.items():
+        await session.execute(_update_statement(status), params)
+    if not saved:
+        return set()
+
+    owners = await session.execute(
+        select(Payments.payment_id, Payments.user_id).where(
+            Payments.payment_id.in_(saved)
+        )
+    )
+    rows = {
+        user_id: {
+            "user_id": user_id,
+            "payment_method_id": saved[payment_id]["id"],
+            "type": saved[payment_id].get("type"),
+            "payment_details": saved[payment_id],
+        }
+        for payment_id, user_id in owners
+    }
+    if rows:
+        stmt = insert(SavedPaymentMethods).values(list(rows.values()))
+        await session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[SavedPaymentMethods.user_id],
+                set_={
+                    "payment_method_id": stmt.excluded.payment_method_id,
+                    "type": stmt.excluded.type,
+                    "payment_details": stmt.excluded.payment_details,
+                    "updated_at": func.now(),
+                },
+            )
+        )
+    return set(rows)
+
+
+def _is_stale(payment: dict) -> bool:
+    if payment["status"] in FINAL_STATUSES:
+        return False
+    age = datetime.now(tz=timezone.utc) - datetime.fromisoformat(payment["updated_at"])
+    return age > timedelta(seconds=settings.payment_gateway.status_stale_seconds)
+
+
+async def _load_payment(session: AsyncSession, payment_id: str) -> dict | None:
+    stmt = select(Payments.status, Payments.payment_details, Payments.updated_at).where(
+        Payments.payment_id == payment_id
+    )
+    row = (await session.execute(stmt)).first()
+    if row is None:
+        return None
+    return {
+        "id": payment_id,
+        "status": row.status.value if row.status else None,
+        "payment_method": row.payment_details or {},
+        "updated_at": row.updated_at.isoformat(),
+    }
+
+
+async def get_payment(session: AsyncSession, payment_id: str) -> dict:
+    """
+    Последний известный статус платежа: Redis, затем payments. Шлюз
+    спрашиваем, только если платежа нет локально или его незавершенный
+    статус давно не обновлялся.
+    """
+    payment = await payment_cache.get_payment(payment_id)
+    if payment is None:
+        payment = await _load_payment(session, payment_id)
+        if payment is not None and not _is_stale(payment):
+            await payment_cache.set_payment(payment)
+    if payment is not None and not _is_stale(payment):
+        return payment
+
+    try:
+        remote = await yookassa_client.find_payment(payment_id)
+    except PaymentGatewayError as e:
+        if payment is None:
+            raise
+        log.warning(f"Шлюз недоступен, отдаем локальный статус {payment_id}: {e}")
+        return payment
+    user_ids = await apply_payment_updates(session, [remote])
+    await session.commit()
+    await payment_cache.invalidate(user_ids=user_ids)
+
+    payment = await _load_payment(session, payment_id) or {
+        "id": payment_id,
+        "status": remote["status"],
+        "payment_method": remote.get("payment_method") or {},
+        "updated_at": datetime.now(tz=timezone.utc).isoformat(),
+    }
+    await payment_cache.set_payment(payment)
+    return payment
+
+
+async def get_saved_method(session: AsyncSession, user_id: int) -> str | None:
+    """payment_method_id сохраненного способа оплаты пользователя"""
+    cached = await payment_cache.get_saved_method(user_id)
+    if cached is not None:
+        return cached["payment_method_id"]
+    payment_method_id = await session.scalar(
+        select(SavedPaymentMethods.payment_method_id).where(
+            SavedPaymentMethods.user_id == user_id
+        )
+    )
+    await payment_cache.set_saved_method(user_id, payment_method_id)
+    return payment_method_id
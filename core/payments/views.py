@@ -1,6 +1,5 @@
 from fastapi import APIRouter, Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from yookassa import Configuration, Payment
 import logging
 from core import db_helper
 from core.auth.crud import get_current_user
@@ -13,6 +12,7 @@ from core.payments.manager import (
     check_payment_linking_card_during_payment,
     payment_with_linked_card,
     create_invoice,
+    list_payments,
 )
 
 router = APIRouter(
@@ -33,7 +33,7 @@ async def create(
 
 @router.get("/get")
 async def get_payments():
-    return Payment.list()
+    return await list_payments()
 
 
 @router.post("/invoice/add")
@@ -71,20 +71,27 @@ async def linked_payment(
 
 
 @router.get("/check/with/linking")
-def check_with_linking(payment_id):
-    return check_payment_linking_card_during_payment(payment_id)
+async def check_with_linking(
+    payment_id,
+    session: AsyncSession = Depends(db_helper.session_dependency),
+):
+    return await check_payment_linking_card_during_payment(payment_id, session)
 
 
 @router.get("/find")
-def find_by_id(payment_id):
-    return payment_find(payment_id)
+async def find_by_id(
+    payment_id,
+    session: AsyncSession = Depends(db_helper.session_dependency),
+):
+    """Статус из локальной модели платежей, шлюз - только если она устарела"""
+    return await payment_find(payment_id, session)
 
 
 @router.post("/add/partial")
-def create_partial_debiting(payment_id):
-    return partial_debiting(payment_id)
+async def create_partial_debiting(payment_id):
+    return await partial_debiting(payment_id)
 
 
 @router.delete("/delete")
-def cancel(payment_id):
-    return payment_cancel(payment_id)
+async def cancel(payment_id):
+    return await payment_cancel(payment_id)
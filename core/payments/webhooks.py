@@ -1,62 +1,33 @@
-import json
-
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, HTTPException, Request, status
 import logging
 
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import update, delete
-from yookassa import Configuration, Webhook
 from yookassa.domain.notification import WebhookNotification
 
-from core import db_helper
-from core.models.payments import Payments
+from core.faststream.broker import broker, queue_payment_webhooks
 
 log = logging.getLogger(__name__)
 router = APIRouter(prefix="/payments", tags=["Webhooks"])
 
 
 @router.post("/webhook")
-async def payment_webhook(
-    request: Request,
-    session: AsyncSession = Depends(db_helper.session_dependency),
-):
+async def payment_webhook(request: Request):
+    """
+    Только проверка и постановка в очередь: статус платежа обновляет
+    handler_payment_webhook, поэтому ответ ЮKassa не ждет БД
+    """
     try:
         event_json = await request.json()
-        log.info(f"Получен webhook: {event_json}")
-
         notification = WebhookNotification(event_json)
-        payment = notification.object
-        event_type = notification.event
-
-        if payment.payment_method.type == "yoo_money":
-            await session.execute(
-                update(Payments)
-                .where(Payments.payment_id == payment.id)
-                .values(
-                    status=payment.status,
-                    payment_method_id=payment.payment_method.id,
-                    type=event_type,
-                    payment_details=payment.payment_method.__dict__,
-                )
-            )
-            await session.commit()
-        elif payment.payment_method.type == "bank_card":
-            payment_details = json.loads(payment.payment_method.json())
-            await session.execute(
-                update(Payments)
-                .where(Payments.payment_id == payment.id)
-                .values(
-                    payment_details=payment_details,
-                    payment_method_id=payment_details["id"],
-                    type=payment_details["type"],
-                    status=payment.status,
-                    payment_for_linking=False,
-                )
-            )
-            await session.commit()
     except Exception as e:
-        log.error(f"Ошибка обработки webhook: {e}")
-        return {"status": "error", "message": str(e)}
+        log.warning(f"Некорректный webhook: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректное уведомление",
+        )
+    log.info(f"Получен webhook {notification.event} для {notification.object.id}")
+
+    await broker.publish(event_json, queue=queue_payment_webhooks, persist=True)
+    return {"status": "ok"}
 
 
 # payment_id=payment.id,
@@ -0,0 +1,176 @@
+import json
+import logging
+import time
+import uuid
+from datetime import datetime
+from typing import Awaitable, Callable
+
+from redis.exceptions import RedisError
+
+from core.config import settings
+from core.redis.manager import RedisManager, redis_manager
+
+log = logging.getLogger(__name__)
+
+# Ключ окна существует только после загрузки из БД - до этого запись пропускаем
+_RECORD_IF_SEEDED = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[1], ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return 1
+"""
+# Окно заполняет только первый из одновременных холодных чтений - иначе
+# элементы второго добавились бы к первым и удвоили счет
+_SEED_IF_ABSENT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+for i = 2, #ARGV, 2 do
+    redis.call('ZADD', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+_PUSH_IF_LOADED = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('RPUSH', KEYS[2], ARGV[1])
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+return 1
+"""
+# Служебный элемент с бесконечным score: окно не исчезает, даже если в нем пусто
+_SEED_MEMBER = "seed"
+
+
+class ConnectionWindow:
+    """
+    Скользящее окно подключений пользователя: sorted set connections:{user_id}
+    со временем подключения в score. Старые элементы срезаются при каждой
+    записи и чтении, поэтому ZCARD - число подключений за последние window секунд.
+    Окно один раз заполняется из websocketconnections, дальше БД не читается.
+    """
+
+    prefix = "connections:"
+
+    def __init__(self, manager: RedisManager, window: int):
+        self.manager = manager
+        self.window = window
+
+    def _key(self, user_id: int) -> str:
+        return f"{self.prefix}{user_id}"
+
+    async def record(self, user_id: int) -> None:
+        if self.manager.client is None:
+            return
+        now = time.time()
+        try:
+            await self.manager.client.eval(
+                _RECORD_IF_SEEDED,
+                1,
+                self._key(user_id),
+                now,
+                f"{now}:{uuid.uuid4().hex[:8]}",
+                now - self.window,
+                self.window,
+            )
+        except RedisError as e:
+            log.warning(f"Не удалось учесть подключение {user_id} в Redis: {e}")
+
+    async def count(
+        self, user_id: int, loader: Callable[[], Awaitable[list[datetime]]]
+    ) -> int:
+        """Подключений за окно; loader - времена подключений из БД для заполнения"""
+        client = self.manager.client
+        if client is None:
+            return len(await loader())
+        key = self._key(user_id)
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.zremrangebyscore(key, "-inf", time.time() - self.window)
+                pipe.zcard(key)
+                _, total = await pipe.execute()
+            if total:
+                return total - 1
+
+            connected = await loader()
+            args = ["+inf", _SEED_MEMBER]
+            for i, at in enumerate(connected):
+                args += [at.timestamp(), f"{at.timestamp()}:{i}"]
+            await client.eval(_SEED_IF_ABSENT, 1, key, self.window, *args)
+            return len(connected)
+        except RedisError as e:
+            log.warning(f"Redis недоступен, подключения считаются по БД: {e}")
+            return len(await loader())
+
+
+class PendingInbox:
+    """
+    Входящие рекламные сообщения пользователя: список inbox:{user_id} с JSON
+    {id, message}. Флаг inbox:{user_id}:loaded означает, что список уже
+    совпадает с pendingmessages - тогда подключение делает один LPOP без БД.
+    """
+
+    prefix = "inbox:"
+
+    def __init__(self, manager: RedisManager, ttl: int):
+        self.manager = manager
+        self.ttl = ttl
+
+    def _keys(self, user_id: int) -> tuple[str, str]:
+        return f"{self.prefix}{user_id}:loaded", f"{self.prefix}{user_id}"
+
+    async def push(self, user_id: int, message_id: int, message: str) -> None:
+        """Новое сообщение в уже загруженный inbox; иначе его подберет загрузка из БД"""
+        if self.manager.client is None:
+            return
+        loaded_key, list_key = self._keys(user_id)
+        try:
+            await self.manager.client.eval(
+                _PUSH_IF_LOADED,
+                2,
+                loaded_key,
+                list_key,
+                json.dumps({"id": message_id, "message": message}),
+                self.ttl,
+            )
+        except RedisError as e:
+            log.warning(f"Не удалось добавить сообщение в inbox {user_id}: {e}")
+
+    async def pop(
+        self, user_id: int, loader: Callable[[], Awaitable[list[dict]]]
+    ) -> dict | None:
+        """
+        Следующее непрочитанное сообщение или None. loader - все pending из БД
+        в виде [{id, message}], вызывается только при пустом кэше.
+        """
+        client = self.manager.client
+        if client is None:
+            pending = await loader()
+            return pending[0] if pending else None
+        loaded_key, list_key = self._keys(user_id)
+        try:
+            if await client.set(loaded_key, 1, ex=self.ttl, nx=True):
+                # Список заменяется целиком - остатки прошлой загрузки не дублируются
+                pending = await loader()
+                async with client.pipeline(transaction=False) as pipe:
+                    pipe.delete(list_key)
+                    if pending:
+                        pipe.rpush(list_key, *(json.dumps(item) for item in pending))
+                        pipe.expire(list_key, self.ttl)
+                    await pipe.execute()
+            raw = await client.lpop(list_key)
+        except RedisError as e:
+            log.warning(f"Redis недоступен, inbox читается из БД: {e}")
+            pending = await loader()
+            return pending[0] if pending else None
+        return json.loads(raw) if raw else None
+
+
+connection_window = ConnectionWindow(
+    redis_manager, window=settings.redis.connection_window_days * 86400
+)
+pending_inbox = PendingInbox(redis_manager, ttl=settings.redis.inbox_ttl_seconds)
@@ -38,16 +38,27 @@ class RedisManager:
             self.client = None
             raise e
 
-    async def set(self, key: str, value: Any, ex: int = None) -> None:
-        """Установить значение с опциональным TTL"""
+    async def set(
+        self, key: str, value: Any, ex: int = None, nx: bool = False
+    ) -> bool | None:
+        """Установить значение с опциональным TTL; nx - только если ключа еще нет"""
         if not self.client:
             print("⚠️ Redis клиент не инициализирован")
             return None
 
-        if ex:
-            await self.client.setex(key, ex, value)
-        else:
-            await self.client.set(key, value)
+        return await self.client.set(key, value, ex=ex or None, nx=nx)
+
+    async def get(self, key: str) -> Any:
+        """Получить значение по ключу"""
+        if not self.client:
+            return None
+        return await self.client.get(key)
+
+    async def incr(self, key: str) -> int | None:
+        """Атомарно увеличить счетчик"""
+        if not self.client:
+            return None
+        return await self.client.incr(key)
 
     async def delete(self, key: str) -> None:
         """Удалить ключ"""
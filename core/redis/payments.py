@@ -0,0 +1,74 @@
+import json
+import logging
+from typing import Iterable
+
+from redis.exceptions import RedisError
+
+from core.config import settings
+from core.redis.manager import RedisManager, redis_manager
+
+log = logging.getLogger(__name__)
+
+
+class PaymentCache:
+    """
+    Кэш локальной модели платежей: payment:status:{payment_id} - последний
+    известный статус платежа, payment:method:{user_id} - сохраненный способ
+    оплаты (в том числе его отсутствие). Записи сбрасываются после COMMIT
+    вебхука, TTL - страховка от пропущенного сброса.
+    """
+
+    status_prefix = "payment:status:"
+    method_prefix = "payment:method:"
+
+    def __init__(self, manager: RedisManager, ttl: int):
+        self.manager = manager
+        self.ttl = ttl
+
+    async def _get(self, key: str) -> dict | None:
+        if self.manager.client is None:
+            return None
+        try:
+            raw = await self.manager.client.get(key)
+        except RedisError as e:
+            log.warning(f"Redis недоступен, {key} читается из БД: {e}")
+            return None
+        return json.loads(raw) if raw else None
+
+    async def _set(self, key: str, value: dict) -> None:
+        if self.manager.client is None:
+            return
+        try:
+            await self.manager.client.set(key, json.dumps(value), ex=self.ttl)
+        except RedisError as e:
+            log.warning(f"Не удалось закэшировать {key}: {e}")
+
+    async def get_payment(self, payment_id: str) -> dict | None:
+        return await self._get(f"{self.status_prefix}{payment_id}")
+
+    async def set_payment(self, payment: dict) -> None:
+        await self._set(f"{self.status_prefix}{payment['id']}", payment)
+
+    async def get_saved_method(self, user_id: int) -> dict | None:
+        """{"payment_method_id": ...} или None, если в кэше ничего нет"""
+        return await self._get(f"{self.method_prefix}{user_id}")
+
+    async def set_saved_method(self, user_id: int, payment_method_id: str | None):
+        await self._set(
+            f"{self.method_prefix}{user_id}", {"payment_method_id": payment_method_id}
+        )
+
+    async def invalidate(
+        self, payment_ids: Iterable[str] = (), user_ids: Iterable[int] = ()
+    ) -> None:
+        keys = [f"{self.status_prefix}{payment_id}" for payment_id in payment_ids]
+        keys += [f"{self.method_prefix}{user_id}" for user_id in user_ids]
+        if not keys or self.manager.client is None:
+            return
+        try:
+            await self.manager.client.delete(*keys)
+        except RedisError as e:
+            log.warning(f"Не удалось сбросить кэш платежей: {e}")
+
+
+payment_cache = PaymentCache(redis_manager, ttl=settings.redis.payment_cache_ttl_seconds)
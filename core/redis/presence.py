@@ -0,0 +1,100 @@
+import logging
+import os
+import socket
+import time
+
+from redis.exceptions import RedisError
+
+from core.config import settings
+from core.redis.manager import RedisManager, redis_manager
+
+log = logging.getLogger(__name__)
+
+# id этого воркера: у каждого uvicorn-процесса своя очередь в RabbitMQ
+NODE_ID = settings.chat.node_id or f"{socket.gethostname()}-{os.getpid()}"
+
+
+class ChatPresence:
+    """
+    Реестр присутствия чата в Redis: username -> id узла, на котором открыт его
+    websocket. По нему сообщение публикуется с routing key нужного узла.
+    Ключ живет ttl секунд и продлевается, пока пользователь пишет в сокет.
+    """
+
+    prefix = "chat:presence:"
+
+    def __init__(self, manager: RedisManager, node_id: str, ttl: int):
+        self.manager = manager
+        self.node_id = node_id
+        self.ttl = ttl
+        # username -> когда последний раз продлевали ключ
+        self._touched: dict[str, float] = {}
+
+    def _key(self, username: str) -> str:
+        return f"{self.prefix}{username}"
+
+    async def register(self, username: str) -> None:
+        try:
+            await self.manager.set(self._key(username), self.node_id, ex=self.ttl)
+            self._touched[username] = time.monotonic()
+        except RedisError as e:
+            log.warning(f"Не удалось записать присутствие {username} в Redis: {e}")
+
+    async def touch(self, username: str) -> None:
+        """Продлить ключ, но не чаще раза в половину ttl"""
+        touched = self._touched.get(username)
+        if touched is None or time.monotonic() - touched > self.ttl / 2:
+            await self.register(username)
+
+    async def unregister(self, username: str) -> None:
+        self._touched.pop(username, None)
+        try:
+            # Пользователь мог уже переподключиться к другому узлу - его ключ не трогаем
+            if await self.manager.get(self._key(username)) == self.node_id:
+                await self.manager.delete(self._key(username))
+        except RedisError as e:
+            log.warning(f"Не удалось удалить присутствие {username} из Redis: {e}")
+
+    async def node_of(self, username: str) -> str:
+        """
+        Узел, на котором подключен пользователь. Если он не в сети или Redis
+        недоступен - текущий узел: там сообщение просто попадет в историю.
+        """
+        if not username:
+            return self.node_id
+        try:
+            node_id = await self.manager.get(self._key(username))
+        except RedisError as e:
+            log.warning(f"Redis недоступен, сообщение обработает текущий узел: {e}")
+            return self.node_id
+        return node_id or self.node_id
+
+    async def claim(self, client: str, operator: str) -> bool:
+        """
+        Закрепить клиента за оператором. Запрос помощи получают все узлы - клиента
+        забирает тот, кто первым записал ключ. Без Redis узел считается единственным.
+        """
+        if self.manager.client is None:
+            return True
+        try:
+            return bool(
+                await self.manager.set(
+                    f"chat:assignment:{client}", operator, ex=self.ttl, nx=True
+                )
+            )
+        except RedisError as e:
+            log.warning(f"Redis недоступен, клиент {client} закреплен локально: {e}")
+            return True
+
+    async def release_claim(self, client: str) -> None:
+        try:
+            await self.manager.delete(f"chat:assignment:{client}")
+        except RedisError as e:
+            log.warning(f"Не удалось снять закрепление {client} в Redis: {e}")
+
+
+chat_presence = ChatPresence(
+    manager=redis_manager,
+    node_id=NODE_ID,
+    ttl=settings.chat.presence_ttl_seconds,
+)
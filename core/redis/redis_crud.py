@@ -1,60 +1,71 @@
-from typing import Iterable, cast
+import json
+import logging
+from typing import Any, Awaitable, Callable
 
-from redis import Redis
+from fastapi.encoders import jsonable_encoder
+from redis.exceptions import RedisError
+from starlette.responses import Response
 
 from core.config import settings
-from core.schemas import GamesBase
-
-redis = Redis(
-    host=settings.redis.host,
-    port=settings.redis.port,
-    db=1,
-    decode_responses=True,
-)
-
-
-class GamesCrud:
-    def __init__(self, redis: Redis, name_db):
-        self.redis = redis
-        self.name_db = name_db
-
-    async def save_games(self, game: GamesBase) -> None:
-        await redis.hset(
-            name=self.name_db,
-            key=game.name,
-            value=game.model_dump_json(),
-        )
-
-    async def get(self) -> list[GamesBase]:
-        return [
-            GamesBase.model_validate_json(value)
-            for value in cast(
-                Iterable[str],
-                redis.hvals(
-                    name=self.name_db,
-                ),
-            )
-        ]
-
-    async def get_by_name(self, name: str) -> GamesBase | None:
-        get_data = cast(
-            str | None,
-            await redis.hget(name=self.name_db, key=name),
-        )
-        if get_data:
-            return GamesBase.model_validate_json(get_data)
-        return None
-
-    async def create_game(self, game: GamesBase) -> GamesBase:
-        add_film = GamesBase(**game.model_dump())
-        await self.save_games(add_film)
-        return add_film
-
-    async def exists(self, name: str) -> bool:
-        return cast(
-            bool,
-            await redis.hexists(name=self.name_db, key=name),
-        )
-
-
-redis_crud = GamesCrud(redis, name_db="games")
+from core.redis.manager import RedisManager, redis_manager
+
+log = logging.getLogger(__name__)
+
+
+class CatalogCache:
+    """
+    Read-through кэш каталога игр. Ответ каждого эндпоинта хранится готовым JSON
+    под ключом catalog:v{version}:{shape}. Любая запись в каталог увеличивает
+    version - старые ключи больше не читаются и сами истекают по TTL.
+    """
+
+    version_key = "catalog:version"
+
+    def __init__(self, manager: RedisManager, ttl: int):
+        self.manager = manager
+        self.ttl = ttl
+
+    async def get_or_set(
+        self, shape: str, loader: Callable[[], Awaitable[Any]]
+    ) -> Response:
+        if self.manager.client is None:
+            # Без Redis кэша нет - не пытаемся в него писать на каждый запрос
+            raw = json.dumps(jsonable_encoder(await loader()))
+            return Response(content=raw, media_type="application/json")
+        try:
+            version = await self.manager.get(self.version_key) or "0"
+            key = f"catalog:v{version}:{shape}"
+            raw = await self.manager.get(key)
+        except RedisError as e:
+            log.warning(f"Redis недоступен, каталог берется из БД: {e}")
+            key, raw = None, None
+
+        if raw is None:
+            raw = json.dumps(jsonable_encoder(await loader()))
+            if key is not None:
+                try:
+                    await self.manager.set(key, raw, ex=self.ttl)
+                except RedisError as e:
+                    log.warning(f"Не удалось сохранить каталог в Redis: {e}")
+
+        return Response(content=raw, media_type="application/json")
+
+    async def version(self) -> str | None:
+        """Текущая версия каталога; None - Redis недоступен"""
+        if self.manager.client is None:
+            return None
+        try:
+            return await self.manager.get(self.version_key) or "0"
+        except RedisError as e:
+            log.warning(f"Redis недоступен, версия каталога неизвестна: {e}")
+            return None
+
+    async def bump(self) -> None:
+        """Сбросить кэш каталога после изменения игр, оценок или лайков"""
+        try:
+            await self.manager.incr(self.version_key)
+        except RedisError as e:
+            log.warning(f"Не удалось сбросить кэш каталога: {e}")
+
+
+catalog_cache = CatalogCache(redis_manager, ttl=settings.redis.catalog_ttl_seconds)
@@ -0,0 +1,77 @@
+import json
+import logging
+from datetime import datetime, timezone
+
+from redis.exceptions import RedisError
+
+from core.redis.manager import RedisManager, redis_manager
+
+log = logging.getLogger(__name__)
+
+
+class RedisSessionStore:
+    """
+    Сессии пользователей в Redis: session_id -> {user_id, username, is_superuser,
+    privilege, expires}. TTL ключа совпадает с cookie_expires, поэтому все воркеры
+    видят одну и ту же сессию. Если Redis недоступен - возвращаем None и
+    вызывающий код идет в Postgres.
+    """
+
+    prefix = "session:"
+
+    def __init__(self, manager: RedisManager):
+        self.manager = manager
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.prefix}{session_id}"
+
+    async def save(
+        self,
+        session_id: str,
+        user_id: int,
+        username: str,
+        is_superuser: bool,
+        privilege,
+        expires: datetime,
+    ) -> None:
+        ttl = int((expires - datetime.now(tz=timezone.utc)).total_seconds())
+        if ttl <= 0:
+            return
+        value = json.dumps(
+            {
+                "user_id": user_id,
+                "username": username,
+                "is_superuser": is_superuser,
+                "privilege": getattr(privilege, "value", privilege),
+                "expires": expires.isoformat(),
+            }
+        )
+        try:
+            await self.manager.set(self._key(session_id), value, ex=ttl)
+        except RedisError as e:
+            log.warning(f"Не удалось сохранить сессию в Redis: {e}")
+
+    async def get(self, session_id: str) -> dict | None:
+        try:
+            value = await self.manager.get(self._key(session_id))
+        except RedisError as e:
+            log.warning(f"Redis недоступен, сессия берется из БД: {e}")
+            return None
+        if not value:
+            return None
+        data = json.loads(value)
+        data["expires"] = datetime.fromisoformat(data["expires"])
+        if data["expires"] < datetime.now(tz=timezone.utc):
+            return None
+        return data
+
+    async def delete(self, session_id: str | None) -> None:
+        if not session_id:
+            return
+        try:
+            await self.manager.delete(self._key(session_id))
+        except RedisError as e:
+            log.warning(f"Не удалось удалить сессию из Redis: {e}")
+
+
+session_store = RedisSessionStore(redis_manager)
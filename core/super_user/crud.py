@@ -9,6 +9,7 @@ from starlette import status
 from core import db_helper
 from core.auth.crud import get_user_by_cookie
 from core.models import Games, GamesCharacteristics, Users
+from core.redis.redis_crud import catalog_cache
 from core.schemas import GamesBase
 from core.schemas.games import GamesCharacteristicsPost
 
@@ -20,6 +21,7 @@ async def add_game(
     print(stmt.release_year)
     session.add(stmt)
     await session.commit()
+    await catalog_cache.bump()
     return {f"Game: {game.name} - added"}
 
 
@@ -31,6 +33,7 @@ async def add_game_characteristic(
         stmt = GamesCharacteristics(**characteristic.model_dump())
         session.add(stmt)
         await session.commit()
+        await catalog_cache.bump()
 
     except IntegrityError:
         raise HTTPException(
@@ -5,6 +5,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from core import db_helper
 from core.super_user.crud import add_game, add_game_characteristic, get_super_user
 from core.models import GamesUserLiked
+from core.redis.redis_crud import catalog_cache
 from core.schemas import GamesBase
 from core.schemas.games import GamesCharacteristicsPost
 from fastapi import APIRouter
@@ -41,3 +42,4 @@ async def delete_games(
     for game in games:
         await session.delete(game)
         await session.commit()
+    await catalog_cache.bump()
@@ -26,6 +26,8 @@ from core.crud import (
     get_games,
     my_account,
 )
+from core.pagination import DEFAULT_LIMIT, MAX_LIMIT
+from core.redis.redis_crud import catalog_cache
 from core.schemas.privilege_level import PrivilegeLevel
 
 router = APIRouter(
@@ -38,9 +40,21 @@ router = APIRouter(
 @router.get("/", name="games")
 async def watch_games(
     request: Request,
+    cursor: str | None = Query(None, description="Cursor from next_cursor"),
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    fields: str | None = Query(None, description="Columns, e.g. 'name,genre'"),
     session: AsyncSession = Depends(db_helper.session_dependency),
 ):
-    return await get_games(request=request, session=session)
+    return await catalog_cache.get_or_set(
+        f"games:{cursor}:{limit}:{fields}",
+        lambda: get_games(
+            request=request,
+            session=session,
+            cursor=cursor,
+            limit=limit,
+            fields=fields,
+        ),
+    )
 
 
 @router.get("/find")
@@ -55,7 +69,9 @@ async def find_game(
 async def watch_game_catalog(
     session: AsyncSession = Depends(db_helper.session_dependency),
 ):
-    return await games_catalog(session=session)
+    return await catalog_cache.get_or_set(
+        "to-watch-part", lambda: games_catalog(session=session)
+    )
 
 
 @router.get("/select-by-genre", name="get_genre")
@@ -63,9 +79,21 @@ async def watch_catalog(
     genre: Literal["ACTION", "ADVENTURE", "RPG", "STRATEGY", "SIMULATION"] = Query(
         description="Watch genre"
     ),
+    cursor: str | None = Query(None, description="Cursor from next_cursor"),
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    fields: str | None = Query(None, description="Columns, e.g. 'name,genre'"),
     session: AsyncSession = Depends(db_helper.session_dependency),
 ):
-    return await game_select_genre(genre=genre, session=session)
+    return await catalog_cache.get_or_set(
+        f"genre:{genre}:{cursor}:{limit}:{fields}",
+        lambda: game_select_genre(
+            genre=genre,
+            session=session,
+            cursor=cursor,
+            limit=limit,
+            fields=fields,
+        ),
+    )
 
 
 @router.post("/add-like")
@@ -96,9 +124,19 @@ async def sort_by_date(
         "date",
         description="Sort by: 'date' for full date sorting, 'year' for year-only sorting",
     ),
+    cursor: str | None = Query(None, description="Cursor from next_cursor"),
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    fields: str | None = Query(None, description="Columns, e.g. 'name,genre'"),
     session: AsyncSession = Depends(db_helper.session_dependency),
 ):
-    return await sort_date(session=session, sort_by=sort_by, decreasing=decreasing)
+    return await sort_date(
+        session=session,
+        sort_by=sort_by,
+        decreasing=decreasing,
+        cursor=cursor,
+        limit=limit,
+        fields=fields,
+    )
 
 
 @router.post("/vote/rating")
@@ -135,10 +173,18 @@ async def get_rating(
 async def hidden(
     request: Request,
     selected_games: bool = Query(True, description="Фильтровать выбранные игры"),
+    cursor: str | None = Query(None, description="Cursor from next_cursor"),
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    fields: str | None = Query(None, description="Columns, e.g. 'name,genre'"),
     session: AsyncSession = Depends(db_helper.session_dependency),
 ):
     return await hidden_games(
-        request=request, selected_games=selected_games, session=session
+        request=request,
+        selected_games=selected_games,
+        session=session,
+        cursor=cursor,
+        limit=limit,
+        fields=fields,
     )
 
 
@@ -146,7 +192,9 @@ async def hidden(
 async def future_games(
     session: AsyncSession = Depends(db_helper.session_dependency),
 ):
-    return await distribution_future(session=session)
+    return await catalog_cache.get_or_set(
+        "future", lambda: distribution_future(session=session)
+    )
 
 
 @router.get("/liked")
@@ -191,28 +239,36 @@ async def payment_create(
 
 @router.get("/watch/genres")
 async def watch_genres(session: AsyncSession = Depends(db_helper.session_dependency)):
-    return await get_genres(session=session)
+    return await catalog_cache.get_or_set(
+        "genres", lambda: get_genres(session=session)
+    )
 
 
 @router.get("/watch/genre/rpg")
 async def watch_genre(
     session: AsyncSession = Depends(db_helper.session_dependency),
 ):
-    return await get_genre_rpg(session=session)
+    return await catalog_cache.get_or_set(
+        "genre-page:rpg", lambda: get_genre_rpg(session=session)
+    )
 
 
 @router.get("/watch/genre/action")
 async def watch_genre(
     session: AsyncSession = Depends(db_helper.session_dependency),
 ):
-    return await get_genre_action(session=session)
+    return await catalog_cache.get_or_set(
+        "genre-page:action", lambda: get_genre_action(session=session)
+    )
 
 
 @router.get("/watch/genre/strategy")
 async def watch_genre(
     session: AsyncSession = Depends(db_helper.session_dependency),
 ):
-    return await get_genre_strategy(session=session)
+    return await catalog_cache.get_or_set(
+        "genre-page:strategy", lambda: get_genre_strategy(session=session)
+    )
 
 
 @router.get("/account")
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import insert, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core import db_helper
+from core.batch_writer import BatchWriter
+from core.config import settings
+from core.models.ws_connections import WebsocketConnections
+
+log = logging.getLogger(__name__)
+
+MAINTENANCE_INTERVAL_SECONDS = 24 * 60 * 60
+
+
+class ConnectionAuditWriter(BatchWriter):
+    """
+    Журнал подключений websocket: connect - INSERT, disconnect - UPDATE по
+    (id, connected_at) самой строки подключения. События копятся и пишутся
+    пачками; если подключение и отключение попали в одну пачку, строка сразу
+    вставляется закрытой. Раз в сутки создаются партиции на следующие месяцы
+    и удаляются партиции старше retention_months.
+    """
+
+    name = "журнал подключений"
+
+    def __init__(self, *args, retention_months: int, partitions_ahead: int, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.retention_months = retention_months
+        self.partitions_ahead = partitions_ahead
+        self._maintenance: asyncio.Task | None = None
+
+    async def connected(
+        self,
+        user_id: int,
+        username: str,
+        connection_type: str,
+        ip_address: str,
+        user_agent: str,
+    ) -> tuple[uuid.UUID, datetime]:
+        """Записать подключение; вернуть ключ строки для последующего disconnected"""
+        connection_id = uuid.uuid4()
+        connected_at = datetime.now(tz=timezone.utc)
+        await self.put(
+            (
+                "connect",
+                {
+                    "id": connection_id,
+                    "user_id": user_id,
+                    "username": username,
+                    "connection_type": connection_type,
+                    "ip_address": ip_address,
+                    "user_agent": user_agent,
+                    "connected_at": connected_at,
+                    "is_active": True,
+                },
+            )
+        )
+        return connection_id, connected_at
+
+    async def disconnected(self, connection_id: uuid.UUID, connected_at: datetime):
+        disconnected_at = datetime.now(tz=timezone.utc)
+        await self.put(
+            (
+                "disconnect",
+                {
+                    "id": connection_id,
+                    "connected_at": connected_at,
+                    "disconnected_at": disconnected_at,
+                    "duration_seconds": (disconnected_at - connected_at).total_seconds(),
+                    "is_active": False,
+                },
+            )
+        )
+
+    async def _write(self, session: AsyncSession, batch: list[tuple[str, dict]]):
+        inserts: dict[uuid.UUID, dict] = {}
+        updates: list[dict] = []
+        for event, row in batch:
+            if event == "connect":
+                inserts[row["id"]] = row
+            elif row["id"] in inserts:
+                inserts[row["id"]].update(row)
+            else:
+                updates.append(row)
+        if inserts:
+            await session.execute(
+                insert(WebsocketConnections).values(list(inserts.values()))
+            )
+        if updates:
+            # Bulk UPDATE по первичному ключу (id, connected_at) - одна партиция на строку
+            await session.execute(update(WebsocketConnections), updates)
+
+    async def maintain_partitions(self) -> None:
+        async with self.session_factory() as session:
+            await session.execute(
+                text("SELECT websocketconnections_maintain(:ahead, :retention)"),
+                {"ahead": self.partitions_ahead, "retention": self.retention_months},
+            )
+            await session.commit()
+
+    async def _maintain_forever(self) -> None:
+        while True:
+            try:
+                await self.maintain_partitions()
+            except Exception as e:
+                log.error(f"✗ Не удалось обслужить партиции websocketconnections: {e}")
+            await asyncio.sleep(MAINTENANCE_INTERVAL_SECONDS)
+
+    def start(self) -> None:
+        super().start()
+        if self._maintenance is None:
+            self._maintenance = asyncio.create_task(self._maintain_forever())
+
+    async def stop(self) -> None:
+        if self._maintenance is not None:
+            self._maintenance.cancel()
+            try:
+                await self._maintenance
+            except asyncio.CancelledError:
+                pass
+            self._maintenance = None
+        await super().stop()
+
+
+connection_audit = ConnectionAuditWriter(
+    session_factory=db_helper.session_factory,
+    batch_size=settings.connection_audit.batch_size,
+    flush_interval=settings.connection_audit.flush_interval_ms / 1000,
+    max_queue=settings.connection_audit.max_queue,
+    retention_months=settings.connection_audit.retention_months,
+    partitions_ahead=settings.connection_audit.partitions_ahead,
+)
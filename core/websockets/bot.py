@@ -0,0 +1,98 @@
+import re
+import time
+from typing import Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from core.crud import get_list_games, get_list_genres
+from core.redis.redis_crud import CatalogCache, catalog_cache
+from core.websockets.codec import OPERATOR_RUSHING, Frame
+
+CALL_OPERATOR = "call_operator"
+
+# (фраза, intent) в порядке приоритета: вызов оператора важнее команд бота
+TRIGGERS = [
+    ("help me", CALL_OPERATOR),
+    ("call the operator", CALL_OPERATOR),
+    ("View the movie catalog", "games"),
+    ("View the genre catalog", "genres"),
+    ("Find out the creator of the website", "creator"),
+    ("Call the operator with command - 'help me'", "operator_rushing"),
+]
+
+STATIC_ANSWERS = {
+    "creator": Frame(
+        {
+            "type": "bot_message",
+            "message": "The creator comes from a small town. "
+            "The site was created in 2026 as part of a single developer",
+        }
+    ),
+    "operator_rushing": OPERATOR_RUSHING,
+}
+
+CATALOG_LOADERS: dict[str, Callable[[AsyncSession], Awaitable]] = {
+    "games": get_list_games,
+    "genres": get_list_genres,
+}
+
+
+class IntentMatcher:
+    """
+    Все фразы собраны в одно регулярное выражение при импорте: сообщение
+    просматривается один раз, а не по разу на каждую фразу. Lookahead находит и
+    вложенные фразы ("help me" внутри длинной команды), побеждает приоритетная.
+    """
+
+    def __init__(self, triggers: list[tuple[str, str]]):
+        self.priority = {}
+        self.intents = {}
+        for priority, (phrase, intent) in enumerate(triggers):
+            self.priority.setdefault(phrase, priority)
+            self.intents.setdefault(phrase, intent)
+        phrases = sorted(self.intents, key=len, reverse=True)
+        alternatives = "|".join(re.escape(phrase) for phrase in phrases)
+        self.pattern = re.compile(f"(?=({alternatives}))")
+
+    def match(self, message: str) -> str | None:
+        found = {m.group(1) for m in self.pattern.finditer(message)}
+        if not found:
+            return None
+        return self.intents[min(found, key=self.priority.__getitem__)]
+
+
+class BotAnswers:
+    """
+    Готовые кадры ответов бота. Ответы по каталогу грузятся из БД один раз и
+    живут, пока не изменится версия каталога (CatalogCache.bump). Без Redis
+    версия неизвестна - тогда ответ перечитывается раз в ttl секунд.
+    """
+
+    def __init__(self, catalog: CatalogCache, ttl: int):
+        self.catalog = catalog
+        self.ttl = ttl
+        # intent -> (версия каталога, время загрузки, кадр)
+        self._cache: dict[str, tuple[str | None, float, Frame]] = {}
+
+    async def get(self, intent: str, session: AsyncSession) -> Frame:
+        if intent in STATIC_ANSWERS:
+            return STATIC_ANSWERS[intent]
+
+        version = await self.catalog.version()
+        cached = self._cache.get(intent)
+        if cached is not None:
+            cached_version, loaded_at, frame = cached
+            if version is not None and cached_version == version:
+                return frame
+            if version is None and time.monotonic() - loaded_at < self.ttl:
+                return frame
+
+        answer = await CATALOG_LOADERS[intent](session)
+        frame = Frame({"type": "bot_message", "message": answer})
+        self._cache[intent] = (version, time.monotonic(), frame)
+        return frame
+
+
+intent_matcher = IntentMatcher(TRIGGERS)
+bot_answers = BotAnswers(catalog_cache, ttl=settings.redis.catalog_ttl_seconds)
@@ -0,0 +1,135 @@
+import json
+
+import msgpack
+from starlette.websockets import WebSocket
+
+# Клиент, приславший этот subprotocol, получает кадры msgpack вместо JSON
+SUBPROTOCOL_MSGPACK = "chat.msgpack.v1"
+CONTENT_TYPE_MSGPACK = "application/msgpack"
+
+# В msgpack ключи и тип сообщения передаются целыми числами
+KEY_TAGS = {
+    "type": 0,
+    "from": 1,
+    "to": 2,
+    "message": 3,
+    "file_url": 4,
+    "mime_type": 5,
+    "wait_seconds": 6,
+    "operator": 7,
+}
+TYPE_TAGS = {
+    "greeting": 1,
+    "bot_message": 2,
+    "client_message": 3,
+    "operator_message": 4,
+    "media": 5,
+    "notify_connect": 6,
+    "notify_disconnect": 7,
+    "notify_connect_to_client": 8,
+    "advertising": 9,
+    "assignment_expired": 10,
+}
+KEY_NAMES = {tag: key for key, tag in KEY_TAGS.items()}
+TYPE_NAMES = {tag: name for name, tag in TYPE_TAGS.items()}
+
+
+def pack(payload: dict) -> bytes:
+    compact = {}
+    for key, value in payload.items():
+        if key == "type":
+            value = TYPE_TAGS.get(value, value)
+        compact[KEY_TAGS.get(key, key)] = value
+    return msgpack.packb(compact)
+
+
+def unpack(raw: bytes) -> dict:
+    payload = {}
+    for key, value in msgpack.unpackb(raw, strict_map_key=False).items():
+        key = KEY_NAMES.get(key, key)
+        if key == "type":
+            value = TYPE_NAMES.get(value, value)
+        payload[key] = value
+    return payload
+
+
+def dump_json(payload: dict) -> str:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+class Frame:
+    """
+    Сообщение чата, сериализуемое не больше одного раза на формат: одни и те же
+    байты уходят в RabbitMQ и во все websocket с msgpack, одна строка - в JSON.
+    """
+
+    __slots__ = ("payload", "_packed", "_text")
+
+    def __init__(
+        self, payload: dict, packed: bytes | None = None, text: str | None = None
+    ):
+        self.payload = payload
+        self._packed = packed
+        self._text = text
+
+    @classmethod
+    def from_packed(cls, raw: bytes) -> "Frame":
+        return cls(unpack(raw), packed=raw)
+
+    @property
+    def packed(self) -> bytes:
+        if self._packed is None:
+            self._packed = pack(self.payload)
+        return self._packed
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = dump_json(self.payload)
+        return self._text
+
+
+def negotiate(websocket: WebSocket) -> str | None:
+    """subprotocol для accept(): msgpack, если клиент его предложил"""
+    if SUBPROTOCOL_MSGPACK in websocket.scope.get("subprotocols", []):
+        return SUBPROTOCOL_MSGPACK
+    return None
+
+
+async def receive(websocket: WebSocket, binary: bool) -> dict:
+    if binary:
+        return unpack(await websocket.receive_bytes())
+    return await websocket.receive_json()
+
+
+# Меню бота не меняется - кодируем один раз при импорте
+GREETING_MENU = [
+    "1)View the movie catalog",
+    "2) View the genre catalog",
+    "3) Find out the creator of the website",
+    "4) Call the operator with command - 'help me'",
+]
+_MENU_PACKED = b"".join(msgpack.packb(line) for line in GREETING_MENU)
+_MENU_JSON = ",".join(dump_json(line) for line in GREETING_MENU)
+# msgpack конкатенативен: map из 2 полей, тип, ключ message, массив из 5 строк
+_GREETING_HEAD = (
+    b"\x82"
+    + msgpack.packb(KEY_TAGS["type"])
+    + msgpack.packb(TYPE_TAGS["greeting"])
+    + msgpack.packb(KEY_TAGS["message"])
+    + bytes([0x90 | (len(GREETING_MENU) + 1)])
+)
+
+
+def greeting_frame(client: str) -> Frame:
+    """Приветствие: меняется только первая строка, меню берется готовым"""
+    hello = f"Hello, {client}, how can I help you?"
+    payload = {"type": "greeting", "message": [hello, *GREETING_MENU]}
+    packed = _GREETING_HEAD + msgpack.packb(hello) + _MENU_PACKED
+    text = f'{{"type":"greeting","message":[{dump_json(hello)},{_MENU_JSON}]}}'
+    return Frame(payload, packed=packed, text=text)
+
+
+OPERATOR_RUSHING = Frame(
+    {"type": "bot_message", "message": "The operator is already rushing to you"}
+)
@@ -1,51 +1,71 @@
 import json
+
 from sqlalchemy import insert, select, func, and_, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import WebSocket, WebSocketException
 from fastapi import Request, Depends
 from core import db_helper
 from core.auth.crud import get_user_by_cookie
+from core.media.helper import acquire_media
 from core.models import Users
-from core.models.ws_connections import WebsocketConnections
 from core.models.ws_history_message import WebsocketMessageHistory, TypeMessage
+from core.pagination import DEFAULT_LIMIT, fetch_page
+from core.redis.sessions import session_store
+from core.websockets.history_writer import lock_history_seq
+
+
+# Компактная форма сообщения истории: без is_resolved и связей
+DIALOG_FIELDS = {
+    "id": WebsocketMessageHistory.id,
+    "from_user_id": WebsocketMessageHistory.from_user_id,
+    "to_user_id": WebsocketMessageHistory.to_user_id,
+    "type": WebsocketMessageHistory.type_message,
+    "message": WebsocketMessageHistory.message,
+    "file_url": WebsocketMessageHistory.file_url,
+    "mime_type": WebsocketMessageHistory.mime_type,
+    "created_at": WebsocketMessageHistory.created_at,
+    "seq": WebsocketMessageHistory.seq,
+}
 
 
 async def get_user_dialog(
     request: Request,
     session: AsyncSession = Depends(db_helper.session_dependency),
+    cursor: str | None = None,
+    since: int | None = None,
+    limit: int = DEFAULT_LIMIT,
 ):
+    """
+    История сообщений пользователя по возрастанию (seq, id) - seq выдает БД и он
+    растет в порядке COMMIT, поэтому порядок не зависит от часов узлов. since -
+    seq последнего полученного сообщения, отдаются только более новые, cursor -
+    следующая страница той же выборки.
+    """
     user = await get_user_by_cookie(session=session, request=request)
-    stmt = select(WebsocketMessageHistory).where(
+    stmt = select(*(column.label(name) for name, column in DIALOG_FIELDS.items()))
+    stmt = stmt.where(
         or_(
             WebsocketMessageHistory.to_user_id == user["user_id"],
             WebsocketMessageHistory.from_user_id == user["user_id"],
         )
     )
-
-    result = await session.execute(stmt)
-    msg = result.scalars().all()
-    return msg
-
-
-async def insert_websocket_db(
-    session: AsyncSession,
-    username: str,
-    user_id: int,
-    ip_address: str,
-    user_agent: str,
-    is_active: bool,
-    connection_type: str,
-):
-    stmt = insert(WebsocketConnections).values(
-        username=username,
-        user_id=user_id,
-        ip_address=ip_address,
-        user_agent=user_agent,
-        is_active=is_active,
-        connection_type=connection_type,
+    if since is not None:
+        stmt = stmt.where(WebsocketMessageHistory.seq > since)
+
+    page = await fetch_page(
+        session,
+        stmt,
+        sort_key=WebsocketMessageHistory.seq,
+        id_col=WebsocketMessageHistory.id,
+        cursor=cursor,
+        limit=limit,
     )
-    await session.execute(stmt)
-    await session.commit()
+    # Пустые поля (file_url, mime_type у текстовых сообщений) не отдаем
+    page["items"] = [
+        {key: value for key, value in item.items() if value is not None}
+        for item in page["items"]
+    ]
+    return page
 
 
 async def get_user_by_name(
@@ -67,6 +87,7 @@ async def insert_message_history(
     to_user_id: int | None = None,
     session: AsyncSession = Depends(db_helper.session_dependency),
 ):
+    await lock_history_seq(session)
     stmt = insert(WebsocketMessageHistory).values(
         from_user_id=from_user_id,
         to_user_id=to_user_id,
@@ -76,6 +97,7 @@ async def insert_message_history(
         mime_type=mime_type,
     )
     await session.execute(stmt)
+    await acquire_media(session, [file_url])
     await session.commit()
 
 
@@ -98,13 +120,20 @@ async def get_user_from_cookies(websocket: WebSocket, session: AsyncSession):
     user_agent = headers.get(b"user-agent", b"").decode()
     ip = websocket.client.host if websocket.client else "0.0.0.0"
 
-    stmt = select(Users).where(Users.cookie == session_id)
-    result = await session.execute(stmt)
-    user = result.scalar_one_or_none()
+    stored = await session_store.get(session_id)
+    if stored:
+        user_id, username = stored["user_id"], stored["username"]
+    else:
+        stmt = select(Users.id, Users.username).where(Users.cookie == session_id)
+        result = await session.execute(stmt)
+        user = result.one_or_none()
+        if user is None:
+            raise WebSocketException(code=1008)
+        user_id, username = user.id, user.username
 
     return {
-        "id": user.id,
-        "username": user.username,
+        "id": user_id,
+        "username": username,
         "headers": headers,
         "user_agent": user_agent,
         "ip": ip,
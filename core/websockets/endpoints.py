@@ -5,12 +5,12 @@ from fastapi import (
     Depends,
     WebSocketException,
     Request,
+    Query,
 )
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import update
-from datetime import datetime, timezone
+from datetime import datetime
 from core import db_helper
-from core.models import WebsocketsConnections
+from core.pagination import DEFAULT_LIMIT, MAX_LIMIT
 from core.websockets import manager
 import logging
 from core.websockets.crud import (
@@ -22,10 +22,11 @@ from faststream.rabbit import RabbitExchange, RabbitQueue
 from core.faststream.broker import (
     broker,
     exchange,
-    queue_operators,
-    queue_clients,
     queue_notify_client,
+    route_key,
 )
+from core.redis.presence import chat_presence
+from core.websockets.codec import CONTENT_TYPE_MSGPACK, Frame, negotiate, receive
 
 log = logging.getLogger(__name__)
 router = APIRouter()
@@ -42,7 +43,10 @@ async def operator_ws(
     operator: str,
     session: AsyncSession = Depends(db_helper.session_dependency),
 ):
-    await websocket.accept()
+    # Клиент может договориться о msgpack через subprotocol, по умолчанию JSON
+    subprotocol = negotiate(websocket)
+    binary = subprotocol is not None
+    await websocket.accept(subprotocol=subprotocol)
     user = await get_user_from_cookies(websocket, session)
     await manager.connect_operator(
         session=session,
@@ -52,30 +56,47 @@ async def operator_ws(
         ip_address=user["ip"],
         user_agent=user["user_agent"],
         is_active=True,
+        binary=binary,
     )
 
     try:
         while True:
-            data: dict = await websocket.receive_json()
+            data: dict = await receive(websocket, binary)
             log.info(f"🔍 ПОЛУЧЕНО: {data}")
+            await chat_presence.touch(operator)
+            # Сообщение уходит в очередь узла, на котором подключен клиент
+            node_id = await chat_presence.node_of(data.get("to", ""))
+            manager.scheduler.touch(data.get("to", ""))
 
             msg_type = data.get("type")
             if msg_type == "notify_connect_to_client":
-                await manager.notify_connect_to_client(
-                    client=data["to"], operator=data["from"]
+                await broker.publish(
+                    message=Frame(
+                        {
+                            "type": "notify_connect_to_client",
+                            "from": data["from"],
+                            "to": data["to"],
+                        }
+                    ).packed,
+                    content_type=CONTENT_TYPE_MSGPACK,
+                    exchange=exchange,
+                    routing_key=route_key("from_operators", node_id),
                 )
             elif "file_url" in data or msg_type == "media":
                 await broker.publish(
-                    message={
-                        "type": "media",
-                        "from": data["from"],
-                        "to": data["to"],
-                        "message": data.get("message", ""),
-                        "mime_type": data["mime_type"],
-                        "file_url": data["file_url"],
-                    },
-                    queue=queue_operators,
+                    message=Frame(
+                        {
+                            "type": "media",
+                            "from": data["from"],
+                            "to": data["to"],
+                            "message": data.get("message", ""),
+                            "mime_type": data["mime_type"],
+                            "file_url": data["file_url"],
+                        }
+                    ).packed,
+                    content_type=CONTENT_TYPE_MSGPACK,
                     exchange=exchange,
+                    routing_key=route_key("from_operators", node_id),
                 )
             elif msg_type == "operator_message" or (
                 msg_type is None and "message" in data
@@ -84,14 +105,17 @@ async def operator_ws(
                     f"💬 Сообщение от {data['from']} для {data['to']}: {data.get('message')}"
                 )
                 await broker.publish(
-                    message={
-                        "type": "operator_message",
-                        "from": data["from"],
-                        "to": data["to"],
-                        "message": data.get("message", ""),
-                    },
-                    queue=queue_operators,
+                    message=Frame(
+                        {
+                            "type": "operator_message",
+                            "from": data["from"],
+                            "to": data["to"],
+                            "message": data.get("message", ""),
+                        }
+                    ).packed,
+                    content_type=CONTENT_TYPE_MSGPACK,
                     exchange=exchange,
+                    routing_key=route_key("from_operators", node_id),
                 )
 
             else:
@@ -99,13 +123,7 @@ async def operator_ws(
 
     except WebSocketDisconnect:
         if operator in manager.operators:
-            await session.execute(
-                update(WebsocketsConnections)
-                .where(WebsocketsConnections.username == operator)
-                .values(is_active=False, disconnected_at=datetime.now(tz=timezone.utc))
-            )
-            await session.commit()
-            del manager.operators[operator]
+            await manager.disconnect_operator(operator)
         log.info("✗ Оператор отключился")
     except Exception as e:
         log.info(f"Ошибка: {e}")
@@ -115,8 +133,15 @@ async def operator_ws(
 async def show_user_dialog(
     request: Request,
     session: AsyncSession = Depends(db_helper.session_dependency),
+    cursor: str | None = Query(None, description="Cursor from next_cursor"),
+    since: int | None = Query(
+        None, description="Only messages with seq greater than this one"
+    ),
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
 ):
-    return await get_user_dialog(session=session, request=request)
+    return await get_user_dialog(
+        session=session, request=request, cursor=cursor, since=since, limit=limit
+    )
 
 
 @router.websocket("/clients/{client}")
@@ -125,7 +150,9 @@ async def clients_ws(
     client: str,
     session: AsyncSession = Depends(db_helper.session_dependency),
 ):
-    await websocket.accept()
+    subprotocol = negotiate(websocket)
+    binary = subprotocol is not None
+    await websocket.accept(subprotocol=subprotocol)
     user = await get_user_from_cookies(websocket, session)
 
     await manager.connect_client(
@@ -137,11 +164,13 @@ async def clients_ws(
         user_agent=user["user_agent"],
         is_active=True,
         is_advertising=True,
+        binary=binary,
     )
     log.info(f"Клиент {client} подключился")
     try:
         while True:
-            data = await websocket.receive_json()
+            data = await receive(websocket, binary)
+            await chat_presence.touch(client)
 
             handler_bot = await manager.sender_bot(
                 client=client,
@@ -149,40 +178,44 @@ async def clients_ws(
                 session=session,
                 websocket=websocket,
             )
+            # Сообщение уходит в очередь узла, на котором подключен оператор
+            node_id = await chat_presence.node_of(data.get("to", ""))
             if not handler_bot and "to" in data:
                 log.info(f"data: {data['from']} ; {data['message']}")
                 await broker.publish(
-                    message={
-                        "from": data["from"],
-                        "to": data["to"],
-                        "message": data["message"],
-                    },
-                    queue=queue_clients,
+                    message=Frame(
+                        {
+                            "type": "client_message",
+                            "from": data["from"],
+                            "to": data["to"],
+                            "message": data["message"],
+                        }
+                    ).packed,
+                    content_type=CONTENT_TYPE_MSGPACK,
                     exchange=exchange,
+                    routing_key=route_key("from_clients", node_id),
                 )
             # elif not handler_bot:
             #     log.info("Кликает по ответу бота")
 
             if "file_url" in data:
                 await broker.publish(
-                    message={
-                        "from": data["from"],
-                        "to": data["to"],
-                        "message": data.get("message", ""),
-                        "mime_type": data["mime_type"],
-                        "file_url": data["file_url"],
-                    },
-                    queue=queue_clients,
+                    message=Frame(
+                        {
+                            "type": "media",
+                            "from": data["from"],
+                            "to": data["to"],
+                            "message": data.get("message", ""),
+                            "mime_type": data["mime_type"],
+                            "file_url": data["file_url"],
+                        }
+                    ).packed,
+                    content_type=CONTENT_TYPE_MSGPACK,
                     exchange=exchange,
+                    routing_key=route_key("from_clients", node_id),
                 )
 
     except WebSocketDisconnect:
-        await session.execute(
-            update(WebsocketsConnections)
-            .where(WebsocketsConnections.username == client)
-            .values(is_active=False, disconnected_at=datetime.now(tz=timezone.utc))
-        )
-        await session.commit()
         """Через брокер disconnect_client не вызывается почему то. напрямую всё ок"""
         await manager.disconnect_client(client=client)
         # await broker.publish(
@@ -1,70 +1,130 @@
 import asyncio
 import logging
-from collections import defaultdict
-from datetime import datetime, timedelta
 
-from sqlalchemy import select
+from sqlalchemy import delete, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.websockets import WebSocket, WebSocketDisconnect
 
 from core import db_helper
-from core.crud import get_list_games, get_list_genres
-from core.faststream.broker import broker, exchange, queue_notify_client
+from core.config import settings
+from core.faststream.broker import (
+    broker,
+    exchange,
+    exchange_broadcast,
+    queue_notify_client,
+    route_key,
+)
 from core.models import PendingMessages
 from core.models.ws_history_message import WebsocketMessageHistory, TypeMessage
-from core.websockets.crud import (
-    insert_websocket_db,
-    insert_message_history,
-    get_user_by_name,
+from core.redis.advertising import connection_window, pending_inbox
+from core.redis.presence import chat_presence
+from core.websockets.history_writer import history_writer
+from core.websockets.codec import (
+    CONTENT_TYPE_MSGPACK,
+    OPERATOR_RUSHING,
+    Frame,
+    greeting_frame,
 )
+from core.websockets.bot import CALL_OPERATOR, bot_answers, intent_matcher
+from core.websockets.outbound import OutboundConnection
+from core.websockets.scheduler import OperatorScheduler
+from core.websockets.audit_writer import connection_audit
+from core.websockets.crud import get_user_by_name
 
 log = logging.getLogger(__name__)
 
 
 class WebsocketManager:
     def __init__(self):
-        self.operators: dict[str, WebSocket] = {}
-        self.clients: dict[str, WebSocket] = {}
+        self.operators: dict[str, OutboundConnection] = {}
+        self.clients: dict[str, OutboundConnection] = {}
         self.clients_asks_help: dict = {}
-        self.timeout_busy_operator: defaultdict[str, dict[str, datetime]] = defaultdict(
-            dict
+        self.scheduler = OperatorScheduler(
+            max_conversations=settings.chat.operator_max_conversations,
+            idle_timeout=settings.chat.assignment_idle_seconds,
+            tick=settings.chat.assignment_tick_seconds,
+        )
+        self.scheduler.on_expire = self.assignment_expired
+        # username -> users.id подключенных клиентов и операторов
+        self.user_ids: dict[str, int] = {}
+        # username -> (id, connected_at) строки журнала websocketconnections
+        self.connection_keys: dict[str, tuple] = {}
+
+    @staticmethod
+    async def _attach(
+        connections: dict[str, OutboundConnection],
+        name: str,
+        websocket: WebSocket,
+        binary: bool,
+    ) -> None:
+        """Обернуть websocket в очередь отправки, прежнее соединение закрыть"""
+        previous = connections.get(name)
+        if previous is not None:
+            await previous.close()
+        connections[name] = OutboundConnection(
+            websocket=websocket,
+            name=name,
+            max_size=settings.chat.send_queue_size,
+            policy=settings.chat.send_overflow_policy,
+            binary=binary,
         )
 
+    def outbound_metrics(self) -> dict:
+        return {
+            "policy": settings.chat.send_overflow_policy,
+            "operators": {op: conn.metrics() for op, conn in self.operators.items()},
+            "clients": {client: conn.metrics() for client, conn in self.clients.items()},
+        }
+
+    async def resolve_user_id(self, username: str, session: AsyncSession) -> int | None:
+        """id из кэша подключенных пользователей, в БД - только для неподключенных"""
+        user_id = self.user_ids.get(username)
+        if user_id is None:
+            user_id = await get_user_by_name(username, session)
+        return user_id
+
     async def send_to_operator(
         self,
         session: AsyncSession,
         client: str,
         operator: str,
         message: str,
+        frame: Frame | None = None,
     ):
         if operator == "":
-            from_user_id = await get_user_by_name(client, session)
-            await insert_message_history(
-                session=session,
+            from_user_id = await self.resolve_user_id(client, session)
+            await history_writer.add(
                 from_user_id=from_user_id,
                 message=message,
                 type_message=TypeMessage.client.value,
             )
             pass
         else:
-            await self.operators[operator].send_json(
-                {
-                    "type": "client_message",
-                    "from": client,
-                    "to": operator,
-                    "message": message,
-                }
-            )
-            from_user_id = await get_user_by_name(client, session)
-            to_user_id = await get_user_by_name(operator, session)
-            await insert_message_history(
-                session=session,
+            self.scheduler.touch(client)
+            websocket = self.operators.get(operator)
+            if websocket is None:
+                log.warning(f"Оператор {operator} не в сети, сообщение только в историю")
+            else:
+                await websocket.send(
+                    frame
+                    or Frame(
+                        {
+                            "type": "client_message",
+                            "from": client,
+                            "to": operator,
+                            "message": message,
+                        }
+                    )
+                )
+                log.info(f"Сообщение отправлено оператору: {operator}")
+            from_user_id = await self.resolve_user_id(client, session)
+            to_user_id = await self.resolve_user_id(operator, session)
+            await history_writer.add(
                 from_user_id=from_user_id,
                 to_user_id=to_user_id,
                 message=message,
                 type_message=TypeMessage.client.value,
             )
-            log.info(f"Сообщение отправлено оператору: {operator}")
 
     async def send_to_client(
         self,
@@ -72,24 +132,28 @@ class WebsocketManager:
         client: str,
         operator: str,
         message: str,
+        frame: Frame | None = None,
     ):
 
         try:
-            self.timeout_busy_operator[operator][client] = datetime.now()
-            print(f"BUSY: {self.timeout_busy_operator}")
-            await self.busy_operator_clear(operator)
-            await self.clients[client].send_json(
-                {
-                    "type": "operator_message",
-                    "from": operator,
-                    "to": client,
-                    "message": message,
-                }
-            )
-            from_user_id = await get_user_by_name(operator, session)
-            to_user_id = await get_user_by_name(client, session)
-            await insert_message_history(
-                session=session,
+            websocket = self.clients.get(client)
+            if websocket is None:
+                log.warning(f"Клиент {client} не в сети, сообщение только в историю")
+            else:
+                await websocket.send(
+                    frame
+                    or Frame(
+                        {
+                            "type": "operator_message",
+                            "from": operator,
+                            "to": client,
+                            "message": message,
+                        }
+                    )
+                )
+            from_user_id = await self.resolve_user_id(operator, session)
+            to_user_id = await self.resolve_user_id(client, session)
+            await history_writer.add(
                 from_user_id=from_user_id,
                 to_user_id=to_user_id,
                 message=message,
@@ -102,61 +166,95 @@ class WebsocketManager:
 
     async def disconnect_client(self, client: str):
         try:
-            await self.notify_disconnect_to_operators(client)
+            await broker.publish(
+                message={"type": "notify_disconnect", "from": client},
+                exchange=exchange_broadcast,
+            )
+            await chat_presence.unregister(client)
+            self.user_ids.pop(client, None)
+            if client in self.connection_keys:
+                await connection_audit.disconnected(*self.connection_keys.pop(client))
             if client in self.clients:
-                self.clients.pop(client)
-                del self.clients_asks_help[client]
+                await self.clients.pop(client).close()
+                self.clients_asks_help.pop(client, None)
                 log.info(f"✓ Клиент {client} удален из self.clients")
-            for operator, clients_dict in self.timeout_busy_operator.items():
-                if client in clients_dict:
-                    clients_dict.pop(client)
-                    log.info(f"  → Удален из оператора {operator}")
             if hasattr(self, "client_operators"):
                 self.client_operators.pop(client, None)
         except Exception as e:
             log.error(f"✗ Ошибка при отключении клиента {client}: {e}")
 
     async def notify_disconnect_to_operators(self, client: str):
-        busy_operators = set(self.timeout_busy_operator.keys())
-        for op in self.operators.keys():
-            # для отладки not убрал, т.к отработает если только время пройдет
-            if op in busy_operators:
-                log.info(f"Оповещение оператора об отключении клиента")
-
-                await self.operators[op].send_json(
-                    {
-                        "type": "notify_disconnect",
-                        "from": client,
-                    }
-                )
+        """Клиент ушел: убрать из очереди, оповестить только его оператора"""
+        self.scheduler.dequeue(client)
+        operator = self.scheduler.release(client)
+        if operator is None:
+            return
+        await chat_presence.release_claim(client)
+        if operator in self.operators:
+            log.info(f"Оповещение оператора {operator} об отключении клиента")
+            await self.operators[operator].send_json(
+                {
+                    "type": "notify_disconnect",
+                    "from": client,
+                }
+            )
+        await self.assign_waiting()
 
-    async def busy_operator_clear(self, operator: str):
-        """
-        Убрать клиента из связки оператор-клиенты, если оператор давно ему не отвечал
-        """
-        if operator in self.timeout_busy_operator:
-            for client, timeout in self.timeout_busy_operator[operator].items():
-                if timeout + timedelta(minutes=1) < datetime.now():
-                    self.timeout_busy_operator[operator].pop(client)
+    async def request_operator(self, client: str):
+        """Клиент позвал оператора: в очередь и сразу попытаться назначить"""
+        self.scheduler.enqueue(client)
+        await self.assign_waiting()
 
-    async def notify_connect_to_operators(
-        self,
-        client: str,
-    ):
-        busy_operators = set(self.timeout_busy_operator.keys())
-        for op in self.operators.keys():
-            # для отладки not убрал, т.к отработает если только время пройдет
-            if op in busy_operators:
-
-                await self.operators[op].send_json(
-                    {
-                        "type": "notify_connect",
-                        "from": client,
-                        "to": op,
-                    }
-                )
+    async def assign_waiting(self):
+        """Раздать клиентов из очереди наименее загруженным операторам этого узла"""
+        while (client := self.scheduler.next_waiting()) is not None:
+            operator = self.scheduler.pick()
+            if operator is None:
+                return
+            if not await chat_presence.claim(client, operator):
+                # Клиента уже забрал оператор другого узла
+                self.scheduler.dequeue(client)
+                continue
+            waited = self.scheduler.assign(client, operator)
+            await broker.publish(
+                message={"type": "assigned", "from": client, "operator": operator},
+                exchange=exchange_broadcast,
+            )
+            await self.operators[operator].send_json(
+                {
+                    "type": "notify_connect",
+                    "from": client,
+                    "to": operator,
+                    "wait_seconds": round(waited, 3),
+                }
+            )
+            await broker.publish(
+                message=Frame(
+                    {"type": "notify_connect_to_client", "from": operator, "to": client}
+                ).packed,
+                content_type=CONTENT_TYPE_MSGPACK,
+                exchange=exchange,
+                routing_key=route_key(
+                    "from_operators", await chat_presence.node_of(client)
+                ),
+            )
+            log.info(f"Клиент {client} назначен оператору {operator} ({waited:.1f}с)")
+
+    async def assignment_expired(self, client: str, operator: str):
+        """Диалог простаивал дольше assignment_idle_seconds"""
+        await chat_presence.release_claim(client)
+        if operator in self.operators:
+            await self.operators[operator].send_json(
+                {
+                    "type": "assignment_expired",
+                    "from": client,
+                }
+            )
+        await self.assign_waiting()
 
     async def notify_connect_to_client(self, client: str, operator: str):
+        if client not in self.clients:
+            return
         await self.clients[client].send_json(
             {
                 "type": "notify_connect_to_client",
@@ -176,44 +274,42 @@ class WebsocketManager:
         user_id: int,
         session: AsyncSession,
         is_advertising: bool = False,
+        binary: bool = False,
     ):
-        self.clients[client] = websocket
+        await self._attach(self.clients, client, websocket, binary)
+        self.user_ids[client] = user_id
+        await chat_presence.register(client)
+        await connection_window.record(user_id)
         await self.init_communication_with_client(client)
 
-        if not is_advertising:
-            await insert_websocket_db(
-                session=session,
-                username=client,
-                user_id=user_id,
-                ip_address=ip_address,
-                user_agent=user_agent,
-                is_active=is_active,
-                connection_type="client",
-            )
-        else:
-            await insert_websocket_db(
-                session=session,
-                username=client,
-                user_id=user_id,
-                ip_address=ip_address,
-                user_agent=user_agent,
-                is_active=is_active,
-                connection_type="client",
-            )
-            stmt = (
-                select(PendingMessages)
-                .where(PendingMessages.user_id == user_id)
-                .limit(1)
-            )
-            res = await session.execute(stmt)
-            message = res.scalar_one_or_none()
+        self.connection_keys[client] = await connection_audit.connected(
+            user_id=user_id,
+            username=client,
+            connection_type="client",
+            ip_address=ip_address,
+            user_agent=user_agent,
+        )
+        if is_advertising:
+            async def load_pending() -> list[dict]:
+                stmt = (
+                    select(PendingMessages.id, PendingMessages.message)
+                    .where(PendingMessages.user_id == user_id)
+                    .order_by(PendingMessages.id)
+                )
+                return [dict(row) for row in (await session.execute(stmt)).mappings()]
+
+            # Обычно это один LPOP в Redis, БД - только при пустом кэше
+            message = await pending_inbox.pop(user_id, load_pending)
             if not message:
                 return
             await self.advertising_to_client(
                 client=client,
-                message=message.message,
+                message=message["message"],
+            )
+            await session.execute(
+                delete(PendingMessages).where(PendingMessages.id == message["id"])
             )
-            await session.delete(message)
+            await session.commit()
 
     async def connect_operator(
         self,
@@ -224,24 +320,42 @@ class WebsocketManager:
         user_agent: str,
         is_active: bool,
         session: AsyncSession,
+        binary: bool = False,
     ):
-
-        self.timeout_busy_operator[operator] = {}
-        # Если по ключу оператор пусто - значит можно считать оператора НЕ занятым
-        log.info(
-            f"Оператор добавлен в список для помощи клиентам {dict(self.timeout_busy_operator)}"
-        )
-        self.operators[operator] = websocket
-        await insert_websocket_db(
-            session=session,
-            username=operator,
+        await self._attach(self.operators, operator, websocket, binary)
+        self.user_ids[operator] = user_id
+        await chat_presence.register(operator)
+        await connection_window.record(user_id)
+        self.connection_keys[operator] = await connection_audit.connected(
             user_id=user_id,
+            username=operator,
+            connection_type="operator",
             ip_address=ip_address,
             user_agent=user_agent,
-            is_active=is_active,
-            connection_type="operator",
         )
         log.info(f"✓ Оператор {operator} подключен")
+        self.scheduler.add_operator(operator)
+        await self.assign_waiting()
+
+    async def disconnect_operator(self, operator: str):
+        connection = self.operators.pop(operator, None)
+        if connection is not None:
+            await connection.close()
+        self.user_ids.pop(operator, None)
+        await chat_presence.unregister(operator)
+        if operator in self.connection_keys:
+            await connection_audit.disconnected(*self.connection_keys.pop(operator))
+        # Клиенты ушедшего оператора снова встают в очередь на всех узлах
+        for client in self.scheduler.remove_operator(operator):
+            await chat_presence.release_claim(client)
+            await broker.publish(
+                message={
+                    "type": "notify_connect",
+                    "from": client,
+                    "message": self.clients_asks_help.get(client, ""),
+                },
+                exchange=exchange_broadcast,
+            )
 
     async def get_clients(self):
         return list(self.clients_asks_help.keys())
@@ -250,53 +364,24 @@ class WebsocketManager:
         self, client: str, message: str, session: AsyncSession, websocket: WebSocket
     ):
 
-        triggers_operator = {"help me", "call the operator"}
-        triggers_bot = {
-            "View the movie catalog": lambda: get_list_games(session),
-            "View the genre catalog": lambda: get_list_genres(session),
-            "Find out the creator of the website": "The creator comes from a small town. The site was created in 2026 as part of a single developer",
-            "Call the operator with command - 'help me'": "The operator is already rushing to you",
-        }
+        intent = intent_matcher.match(message)
+        if intent is None:
+            return False
         # Проверка на вызов оператора
-        if any(trigger in message for trigger in triggers_operator):
-            await self.clients[client].send_json(
-                {
-                    "type": "bot_message",
-                    "message": "The operator is already rushing to you",
-                }
+        if intent == CALL_OPERATOR:
+            await self.clients[client].send(OPERATOR_RUSHING)
+            # clients_asks_help и оповещение операторов - на всех узлах через fanout
+            await broker.publish(
+                message={"type": "notify_connect", "from": client, "message": message},
+                exchange=exchange_broadcast,
             )
-            self.clients_asks_help[client] = message
-            await self.notify_connect_to_operators(client)
             return True
-        # Проверка на остальные команды в боте
-        for question, response in triggers_bot.items():
-            if question in message:
-                if callable(response):
-                    answer = await response()
-                else:
-                    answer = response
-                await self.clients[client].send_json(
-                    {
-                        "type": "bot_message",
-                        "message": answer,
-                    }
-                )
-                return True
-        return False
+        # Остальные команды: готовый кадр, каталог берется из кэша
+        await self.clients[client].send(await bot_answers.get(intent, session))
+        return True
 
     async def init_communication_with_client(self, client: str):
-        await self.clients[client].send_json(
-            {
-                "type": "greeting",
-                "message": [
-                    f"Hello, {client}, how can I help you?",
-                    "1)View the movie catalog",
-                    "2) View the genre catalog",
-                    "3) Find out the creator of the website",
-                    "4) Call the operator with command - 'help me'",
-                ],
-            }
-        )
+        await self.clients[client].send(greeting_frame(client))
 
     async def advertising_to_client(self, client: str, message: str):
         await self.clients.get(client).send_json(
@@ -315,11 +400,11 @@ class WebsocketManager:
         file_url: str,
         mime_type: str,
         message: str = "",
+        frame: Frame | None = None,
     ):
         if client == "":
-            from_user_id = await get_user_by_name(operator, session)
-            await insert_message_history(
-                session=session,
+            from_user_id = await self.resolve_user_id(operator, session)
+            await history_writer.add(
                 from_user_id=from_user_id,
                 message=message,
                 type_message=TypeMessage.media.value,
@@ -327,20 +412,26 @@ class WebsocketManager:
                 mime_type=mime_type,
             )
         else:
-            await self.clients[client].send_json(
-                {
-                    "type": "media",
-                    "from": operator,
-                    "to": client,
-                    "message": message,
-                    "file_url": file_url,
-                    "mime_type": mime_type,
-                }
-            )
-            from_user_id = await get_user_by_name(operator, session)
-            to_user_id = await get_user_by_name(client, session)
-            await insert_message_history(
-                session=session,
+            websocket = self.clients.get(client)
+            if websocket is None:
+                log.warning(f"Клиент {client} не в сети, файл только в историю")
+            else:
+                await websocket.send(
+                    frame
+                    or Frame(
+                        {
+                            "type": "media",
+                            "from": operator,
+                            "to": client,
+                            "message": message,
+                            "file_url": file_url,
+                            "mime_type": mime_type,
+                        }
+                    )
+                )
+            from_user_id = await self.resolve_user_id(operator, session)
+            to_user_id = await self.resolve_user_id(client, session)
+            await history_writer.add(
                 from_user_id=from_user_id,
                 to_user_id=to_user_id,
                 message=message,
@@ -357,12 +448,12 @@ class WebsocketManager:
         file_url: str,
         mime_type: str,
         message: str = "",
+        frame: Frame | None = None,
     ):
 
         if operator == "":
-            from_user_id = await get_user_by_name(client, session)
-            await insert_message_history(
-                session=session,
+            from_user_id = await self.resolve_user_id(client, session)
+            await history_writer.add(
                 from_user_id=from_user_id,
                 message=message,
                 type_message=TypeMessage.media.value,
@@ -370,20 +461,26 @@ class WebsocketManager:
                 mime_type=mime_type,
             )
         else:
-            await self.operators[operator].send_json(
-                {
-                    "type": "media",
-                    "from": client,
-                    "to": operator,
-                    "message": message,
-                    "file_url": file_url,
-                    "mime_type": mime_type,
-                }
-            )
-            from_user_id = await get_user_by_name(client, session)
-            to_user_id = await get_user_by_name(operator, session)
-            await insert_message_history(
-                session=session,
+            websocket = self.operators.get(operator)
+            if websocket is None:
+                log.warning(f"Оператор {operator} не в сети, файл только в историю")
+            else:
+                await websocket.send(
+                    frame
+                    or Frame(
+                        {
+                            "type": "media",
+                            "from": client,
+                            "to": operator,
+                            "message": message,
+                            "file_url": file_url,
+                            "mime_type": mime_type,
+                        }
+                    )
+                )
+            from_user_id = await self.resolve_user_id(client, session)
+            to_user_id = await self.resolve_user_id(operator, session)
+            await history_writer.add(
                 from_user_id=from_user_id,
                 to_user_id=to_user_id,
                 message=message,
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core import db_helper
+from core.batch_writer import BatchWriter
+from core.config import settings
+from core.media.helper import acquire_media, sweep_unreferenced_media
+from core.models.ws_history_message import WebsocketMessageHistory, TypeMessage
+
+log = logging.getLogger(__name__)
+
+MEDIA_SWEEP_INTERVAL_SECONDS = 60 * 60
+
+# Ключ advisory-блокировки, под которой пишется история чата
+HISTORY_LOCK_KEY = "websocketmessagehistory_seq"
+
+
+async def lock_history_seq(session: AsyncSession) -> None:
+    """
+    Блокировка до конца транзакции: пишущие историю транзакции берут seq и
+    коммитятся по очереди, поэтому seq растет в порядке COMMIT и клиент,
+    получивший seq N, не пропустит позже закоммиченное сообщение с меньшим.
+    """
+    await session.execute(
+        text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": HISTORY_LOCK_KEY}
+    )
+
+
+class MessageHistoryWriter(BatchWriter):
+    """
+    Write-behind запись истории чата: пачка сообщений пишется одним
+    INSERT ... VALUES (...), (...) - доставка по websocket не ждет COMMIT.
+    Каждая строка с file_url берет ссылку на медиафайл в той же транзакции;
+    раз в час удаляются загрузки, которые так и не попали в историю.
+    """
+
+    name = "история чата"
+
+    def __init__(self, *args, unreferenced_media_hours: int, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.unreferenced_media_hours = unreferenced_media_hours
+        self._maintenance: asyncio.Task | None = None
+
+    async def add(
+        self,
+        message: str,
+        type_message: TypeMessage,
+        file_url: str | None = None,
+        mime_type: str | None = None,
+        from_user_id: int | None = None,
+        to_user_id: int | None = None,
+    ) -> None:
+        await self.put(
+            {
+                "from_user_id": from_user_id,
+                "to_user_id": to_user_id,
+                "message": message,
+                "type_message": type_message,
+                "file_url": file_url,
+                "mime_type": mime_type,
+            }
+        )
+
+    async def _write(self, session: AsyncSession, batch: list[dict]) -> None:
+        # created_at и seq проставляет БД в момент вставки, а не часы узла
+        await lock_history_seq(session)
+        await session.execute(insert(WebsocketMessageHistory).values(batch))
+        await acquire_media(session, (item["file_url"] for item in batch))
+
+    async def sweep_media(self) -> None:
+        async with self.session_factory() as session:
+            removed = await sweep_unreferenced_media(
+                session, self.unreferenced_media_hours * 60 * 60
+            )
+        if removed:
+            log.info(f"{self.name}: удалено неотправленных медиафайлов: {removed}")
+
+    async def _maintain_forever(self) -> None:
+        while True:
+            try:
+                await self.sweep_media()
+            except Exception as e:
+                log.error(f"✗ Не удалось удалить неотправленные медиафайлы: {e}")
+            await asyncio.sleep(MEDIA_SWEEP_INTERVAL_SECONDS)
+
+    def start(self) -> None:
+        super().start()
+        if self._maintenance is None:
+            self._maintenance = asyncio.create_task(self._maintain_forever())
+
+    async def stop(self) -> None:
+        if self._maintenance is not None:
+            self._maintenance.cancel()
+            try:
+                await self._maintenance
+            except asyncio.CancelledError:
+                pass
+            self._maintenance = None
+        await super().stop()
+
+
+history_writer = MessageHistoryWriter(
+    session_factory=db_helper.session_factory,
+    batch_size=settings.chat_history.batch_size,
+    flush_interval=settings.chat_history.flush_interval_ms / 1000,
+    max_queue=settings.chat_history.max_queue,
+    unreferenced_media_hours=settings.chat_history.unreferenced_media_hours,
+)
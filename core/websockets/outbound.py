@@ -0,0 +1,121 @@
+import asyncio
+import logging
+from collections import deque
+
+from starlette.websockets import WebSocket
+
+from core.websockets.codec import Frame
+
+log = logging.getLogger(__name__)
+
+# Оповещения, из которых важно только последнее - при coalesce заменяют предыдущее
+# с тем же ключом и тем же from. connect и disconnect - одно состояние отправителя,
+# поэтому ключ у них общий: в очереди остается его последнее состояние
+COALESCE_KEYS = {
+    "notify_connect": "presence",
+    "notify_disconnect": "presence",
+    "notify_connect_to_client": "notify_connect_to_client",
+}
+
+
+class OutboundConnection:
+    """
+    Websocket с собственной ограниченной очередью исходящих сообщений и задачей,
+    которая ее разбирает. send/send_json только кладут сообщение в очередь, поэтому
+    медленный получатель не задерживает рассылку остальным. binary - соединение
+    договорилось о msgpack, иначе уходит JSON-текст.
+
+    При переполнении:
+        drop_oldest - выбрасываем самое старое сообщение;
+        disconnect - закрываем соединение медленного получателя;
+        coalesce - оповещение вытесняет такое же из очереди и встает в конец,
+                   иначе drop_oldest.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        name: str,
+        max_size: int,
+        policy: str,
+        binary: bool = False,
+    ):
+        self.websocket = websocket
+        self.name = name
+        self.max_size = max_size
+        self.policy = policy
+        self.binary = binary
+        self.queue: deque[Frame] = deque()
+        self.dropped = 0
+        self.sent = 0
+        self.closed = False
+        self._ready = asyncio.Event()
+        self._task = asyncio.create_task(self._writer())
+
+    async def send_json(self, data: dict) -> None:
+        await self.send(Frame(data))
+
+    async def send(self, frame: Frame) -> None:
+        if self.closed:
+            return
+        if self.policy == "coalesce" and self._coalesce(frame):
+            return
+        if len(self.queue) >= self.max_size:
+            if self.policy == "disconnect":
+                log.warning(f"✗ {self.name} не успевает читать сообщения, отключаем")
+                await self.close(code=1013)
+                return
+            self.queue.popleft()
+            self.dropped += 1
+        self.queue.append(frame)
+        self._ready.set()
+
+    def _coalesce(self, frame: Frame) -> bool:
+        data = frame.payload
+        if data.get("type") not in COALESCE_KEYS:
+            return False
+        key = (COALESCE_KEYS[data["type"]], data.get("from"))
+        for i, queued in enumerate(self.queue):
+            queued_type = queued.payload.get("type")
+            if (COALESCE_KEYS.get(queued_type), queued.payload.get("from")) == key:
+                # Новое оповещение встает в конец - после всего, что пришло раньше
+                del self.queue[i]
+                self.queue.append(frame)
+                self.dropped += 1
+                self._ready.set()
+                return True
+        return False
+
+    async def _writer(self) -> None:
+        try:
+            while True:
+                await self._ready.wait()
+                while self.queue:
+                    frame = self.queue.popleft()
+                    if self.binary:
+                        await self.websocket.send_bytes(frame.packed)
+                    else:
+                        await self.websocket.send_text(frame.text)
+                    self.sent += 1
+                self._ready.clear()
+        except Exception as e:
+            # Сокет уже закрыт - дальше отключение обработает endpoint
+            log.info(f"✗ Отправка {self.name} остановлена: {e}")
+            self.closed = True
+            self.queue.clear()
+
+    async def close(self, code: int | None = None) -> None:
+        """Остановить отправку; с code - еще и закрыть сам websocket"""
+        if self.closed and self._task.done():
+            return
+        self.closed = True
+        self.queue.clear()
+        self._task.cancel()
+        if code is not None:
+            try:
+                await self.websocket.close(code=code)
+            except Exception as e:
+                log.info(f"Не удалось закрыть websocket {self.name}: {e}")
+
+    def metrics(self) -> dict:
+        return {"queue_depth": len(self.queue), "sent": self.sent, "dropped": self.dropped}
@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import math
+import time
+from collections import defaultdict
+from typing import Awaitable, Callable
+
+log = logging.getLogger(__name__)
+
+
+class OperatorScheduler:
+    """
+    Распределение клиентов, позвавших оператора, по операторам этого узла.
+
+    Операторы лежат в корзинах по числу активных диалогов, поэтому наименее
+    загруженный находится за O(1). Простаивающие диалоги снимаются колесом
+    таймеров: каждое сообщение переносит клиента в слот через idle_timeout,
+    фоновая задача раз в tick секунд освобождает клиентов из текущего слота.
+    """
+
+    def __init__(self, max_conversations: int, idle_timeout: float, tick: float):
+        self.max_conversations = max_conversations
+        # оператор -> его клиенты; корзины: число диалогов -> операторы (по порядку)
+        self.clients_of: dict[str, set[str]] = {}
+        self.buckets: defaultdict[int, dict[str, None]] = defaultdict(dict)
+        self.min_load = 0
+        self.assignments: dict[str, str] = {}
+        # клиент -> время постановки в очередь, порядок вставки = порядок очереди
+        self.waiting: dict[str, float] = {}
+        self.assigned_total = 0
+        self.wait_seconds_total = 0.0
+
+        self.tick = tick
+        self.idle_slots = max(1, math.ceil(idle_timeout / tick))
+        self.wheel: list[set[str]] = [set() for _ in range(self.idle_slots + 1)]
+        self.slot_of: dict[str, int] = {}
+        self.cursor = 0
+        self.on_expire: Callable[[str, str], Awaitable[None]] | None = None
+        self._task: asyncio.Task | None = None
+
+    # --- операторы ---
+
+    def add_operator(self, operator: str) -> None:
+        if operator in self.clients_of:
+            return
+        self.clients_of[operator] = set()
+        self.buckets[0][operator] = None
+        self.min_load = 0
+
+    def remove_operator(self, operator: str) -> list[str]:
+        """Убрать оператора, вернуть клиентов, которые остались без него"""
+        clients = self.clients_of.pop(operator, None)
+        if clients is None:
+            return []
+        self._unbucket(operator, len(clients))
+        for client in clients:
+            self.assignments.pop(client, None)
+            self._cancel_timer(client)
+        self._fix_min()
+        return list(clients)
+
+    def pick(self) -> str | None:
+        """Наименее загруженный оператор или None, если все заняты"""
+        if not self.buckets or self.min_load >= self.max_conversations:
+            return None
+        return next(iter(self.buckets[self.min_load]))
+
+    # --- клиенты ---
+
+    def enqueue(self, client: str) -> None:
+        if client not in self.assignments:
+            self.waiting.setdefault(client, time.monotonic())
+
+    def dequeue(self, client: str) -> None:
+        self.waiting.pop(client, None)
+
+    def next_waiting(self) -> str | None:
+        return next(iter(self.waiting), None)
+
+    def assign(self, client: str, operator: str) -> float:
+        """Закрепить клиента за оператором, вернуть сколько он ждал в очереди"""
+        clients = self.clients_of[operator]
+        self._move(operator, len(clients), len(clients) + 1)
+        clients.add(client)
+        self.assignments[client] = operator
+        self._schedule_timer(client)
+
+        waited = time.monotonic() - self.waiting.pop(client, time.monotonic())
+        self.assigned_total += 1
+        self.wait_seconds_total += waited
+        return waited
+
+    def release(self, client: str) -> str | None:
+        """Снять клиента с оператора, вернуть оператора"""
+        self._cancel_timer(client)
+        operator = self.assignments.pop(client, None)
+        clients = self.clients_of.get(operator)
+        if clients is not None and client in clients:
+            self._move(operator, len(clients), len(clients) - 1)
+            clients.discard(client)
+        return operator
+
+    def touch(self, client: str) -> None:
+        """Диалог активен - отодвинуть таймаут"""
+        if client in self.assignments:
+            self._schedule_timer(client)
+
+    def wait_times(self) -> dict[str, float]:
+        now = time.monotonic()
+        return {client: now - since for client, since in self.waiting.items()}
+
+    # --- корзины ---
+
+    def _unbucket(self, operator: str, load: int) -> None:
+        bucket = self.buckets[load]
+        bucket.pop(operator, None)
+        if not bucket:
+            del self.buckets[load]
+
+    def _move(self, operator: str, old: int, new: int) -> None:
+        self._unbucket(operator, old)
+        self.buckets[new][operator] = None
+        # Нагрузка меняется на 1, поэтому минимум сдвигается тоже на 1
+        if new < self.min_load:
+            self.min_load = new
+        elif old == self.min_load and old not in self.buckets:
+            self.min_load = new
+
+    def _fix_min(self) -> None:
+        if self.min_load not in self.buckets:
+            self.min_load = min(self.buckets, default=0)
+
+    # --- колесо таймеров ---
+
+    def _schedule_timer(self, client: str) -> None:
+        self._cancel_timer(client)
+        slot = (self.cursor + self.idle_slots) % len(self.wheel)
+        self.wheel[slot].add(client)
+        self.slot_of[client] = slot
+
+    def _cancel_timer(self, client: str) -> None:
+        slot = self.slot_of.pop(client, None)
+        if slot is not None:
+            self.wheel[slot].discard(client)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.tick)
+            self.cursor = (self.cursor + 1) % len(self.wheel)
+            expired, self.wheel[self.cursor] = self.wheel[self.cursor], set()
+            for client in expired:
+                self.slot_of.pop(client, None)
+                operator = self.release(client)
+                if operator is None or self.on_expire is None:
+                    continue
+                try:
+                    await self.on_expire(client, operator)
+                except Exception as e:
+                    log.error(f"✗ Ошибка при снятии {client} с оператора {operator}: {e}")
+
+    def metrics(self) -> dict:
+        return {
+            "operators": {op: len(clients) for op, clients in self.clients_of.items()},
+            "max_conversations": self.max_conversations,
+            "assigned": len(self.assignments),
+            "waiting": self.wait_times(),
+            "assigned_total": self.assigned_total,
+            "avg_wait_seconds": (
+                self.wait_seconds_total / self.assigned_total
+                if self.assigned_total
+                else 0.0
+            ),
+        }
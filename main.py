@@ -1,4 +1,6 @@
+import asyncio
 import logging
+import signal
 from contextlib import asynccontextmanager
 
 import uvicorn
@@ -11,24 +13,48 @@ from core.redis.manager import redis_manager
 from core.views import router as games_router
 from core.super_user import super_user_games_router
 
+from core.auth.helper import helper
+from core.auth.password_hasher import password_hasher
 from core.auth.views import router as auth_router
+from core import db_helper
 from core.config import settings
 from core.frontend_db.views import router
 from core.users.views import router as users_router
 from core.websockets.endpoints import router as ws_router
+from core.websockets import manager
+from core.websockets.history_writer import history_writer
+from core.websockets.audit_writer import connection_audit
 from core.faststream.handlers import broker
 from core.payments.views import router as payment_router
+from core.payments.client import yookassa_client
+from core.payments.events import payment_events
 from core.payments.webhooks import router as payment_webhooks_router
 from core.media.views import router as media_router
+from core.internal.views import router as internal_router
 
 
 @asynccontextmanager
 async def lifespan(app):
     await broker.start()
     await redis_manager.initialize()
+    await yookassa_client.initialize()
+    history_writer.start()
+    connection_audit.start()
+    payment_events.start()
+    manager.scheduler.start()
+    if hasattr(signal, "SIGHUP"):
+        # kill -HUP <pid> - перечитать ключи JWT без рестарта
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, helper.reload_keys)
     yield
     await broker.stop()
+    await history_writer.stop()
+    await connection_audit.stop()
+    await payment_events.stop()
+    await manager.scheduler.stop()
     await redis_manager.close()
+    await yookassa_client.close()
+    password_hasher.close()
+    await db_helper.dispose()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -40,6 +66,7 @@ app.include_router(payment_router)
 app.include_router(payment_webhooks_router)
 app.include_router(media_router)
 app.include_router(auth_router)
+app.include_router(internal_router)
 
 app.include_router(router)
 
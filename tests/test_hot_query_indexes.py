@@ -0,0 +1,136 @@
+"""
+EXPLAIN горячих запросов на тестовой БД: каждый должен идти по своему индексу.
+Нужен Postgres в TEST_DB_URL (postgresql+asyncpg://...), без него тесты
+пропускаются. Пустая БД получает схему моделей (create_all + stamp head -
+цепочка миграций с нуля не проходит), уже мигрированная - upgrade head.
+"""
+
+import asyncio
+import os
+import re
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from core.config import BASE_DIR, Base, settings
+from core.models.media import MediaFiles  # noqa: F401
+from core.models.payments import Payments  # noqa: F401
+from core.models.pending_messages import PendingMessages  # noqa: F401
+from core.models.ws_history_message import WebsocketMessageHistory  # noqa: F401
+
+TEST_DB_URL = os.getenv("TEST_DB_URL")
+
+pytestmark = pytest.mark.skipif(not TEST_DB_URL, reason="TEST_DB_URL не задан")
+
+# Запрос в том виде, в каком его строит приложение, индекс, по которому он идет,
+# и подготовка в той же транзакции (откатывается после EXPLAIN)
+HOT_QUERIES = {
+    "cookie": (
+        "SELECT id FROM users WHERE cookie = 'session'",
+        "ix_users_cookie",
+        (),
+    ),
+    "genre": (
+        "SELECT id FROM games WHERE genre = 'ACTION'",
+        "ix_games_genre",
+        (),
+    ),
+    "release_date": (
+        "SELECT id FROM games ORDER BY release_date DESC NULLS LAST, id DESC LIMIT 21",
+        "ix_games_release_date_id",
+        (),
+    ),
+    # На заполненной таблице планировщик может взять ix_gamesuserliked_game_id -
+    # проверяем, что уникальный индекс пригоден для поиска пары сам по себе
+    "like_by_user_game": (
+        "SELECT id FROM gamesuserliked WHERE user_id = 1 AND game_id = 1",
+        "uq_gamesuserliked_user_id_game_id",
+        ("DROP INDEX ix_gamesuserliked_game_id",),
+    ),
+    "likes_by_game": (
+        "SELECT count(*) FROM gamesuserliked WHERE game_id = 1",
+        "ix_gamesuserliked_game_id",
+        (),
+    ),
+    "dialog_from": (
+        "SELECT id FROM websocketmessagehistory WHERE from_user_id = 1 "
+        "ORDER BY seq, id LIMIT 21",
+        "ix_websocketmessagehistory_from_user_id_seq",
+        (),
+    ),
+    "dialog_to": (
+        "SELECT id FROM websocketmessagehistory WHERE to_user_id = 1 "
+        "ORDER BY seq, id LIMIT 21",
+        "ix_websocketmessagehistory_to_user_id_seq",
+        (),
+    ),
+    # Таблица партиционирована - в плане индексы партиций, <партиция>_user_id_...
+    # Без партиции на текущий месяц планировщик отбросит таблицу целиком
+    "connection_window": (
+        "SELECT connected_at FROM websocketconnections "
+        "WHERE user_id = 1 AND connected_at >= now() - interval '7 days'",
+        "user_id_connected_at",
+        (
+            "CREATE TABLE websocketconnections_explain "
+            "PARTITION OF websocketconnections DEFAULT",
+        ),
+    ),
+}
+
+# Узел плана, который читает индекс: Index [Only] Scan [Backward] using <индекс>,
+# Bitmap Index Scan on <индекс>
+INDEX_SCAN = r"Index (?:Only )?Scan (?:Backward )?(?:using|on) \S*{index}"
+
+
+async def prepare_schema(url: str) -> bool:
+    """Создать схему моделей в пустой БД; False - БД уже под alembic"""
+    engine = create_async_engine(url, poolclass=NullPool)
+    try:
+        async with engine.begin() as conn:
+            if await conn.scalar(text("SELECT to_regclass('alembic_version')")):
+                return False
+            await conn.run_sync(Base.metadata.create_all)
+            return True
+    finally:
+        await engine.dispose()
+
+
+@pytest.fixture(scope="module")
+def migrated_db() -> str:
+    settings.db_url = TEST_DB_URL
+    config = Config(str(BASE_DIR / "alembic.ini"))
+    if asyncio.run(prepare_schema(TEST_DB_URL)):
+        command.stamp(config, "head")
+    else:
+        command.upgrade(config, "head")
+    return TEST_DB_URL
+
+
+def explain(url: str, sql: str, setup: tuple[str, ...]) -> str:
+    async def run() -> list:
+        engine = create_async_engine(url, poolclass=NullPool)
+        try:
+            async with engine.connect() as conn:
+                for statement in setup:
+                    await conn.execute(text(statement))
+                # На пустых таблицах планировщик и так выбрал бы seq scan
+                await conn.execute(text("SET LOCAL enable_seqscan = off"))
+                rows = (await conn.execute(text(f"EXPLAIN {sql}"))).all()
+                await conn.rollback()
+                return rows
+        finally:
+            await engine.dispose()
+
+    return "\n".join(row[0] for row in asyncio.run(run()))
+
+
+@pytest.mark.parametrize(
+    "sql, index, setup", list(HOT_QUERIES.values()), ids=list(HOT_QUERIES)
+)
+def test_hot_query_uses_index(migrated_db, sql, index, setup):
+    plan = explain(migrated_db, sql, setup)
+    assert re.search(INDEX_SCAN.format(index=re.escape(index)), plan), plan
@@ -0,0 +1,46 @@
+from datetime import date
+
+import pytest
+from fastapi import HTTPException
+
+from core.models import Games
+from core.models.ws_history_message import WebsocketMessageHistory
+from core.pagination import decode_cursor, encode_cursor
+
+
+@pytest.mark.parametrize(
+    "cursor, sort_key, nullable, expected",
+    [
+        (
+            encode_cursor("2016-05-13", 5),
+            Games.release_date,
+            True,
+            [date(2016, 5, 13), 5],
+        ),
+        (encode_cursor(None, 5), Games.release_date, True, [None, 5]),
+        (encode_cursor(10, 3), WebsocketMessageHistory.seq, False, [10, 3]),
+    ],
+)
+def test_decode_cursor(cursor, sort_key, nullable, expected):
+    assert decode_cursor(cursor, sort_key, Games.id, nullable) == expected
+
+
+@pytest.mark.parametrize(
+    "cursor, sort_key, nullable",
+    [
+        ("not base64!", Games.id, False),
+        (encode_cursor("2016-02-30", 5), Games.release_date, True),
+        (encode_cursor(20160513, 5), Games.release_date, True),
+        (encode_cursor("2016-05-13", "5"), Games.release_date, True),
+        (encode_cursor(None, 5), WebsocketMessageHistory.seq, False),
+        (encode_cursor(10, None), WebsocketMessageHistory.seq, False),
+        (encode_cursor(1.5, 5), Games.id, False),
+        (encode_cursor(True, 5), Games.id, False),
+        (encode_cursor([1], 5), Games.id, False),
+    ],
+)
+def test_invalid_cursor_is_400(cursor, sort_key, nullable):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, sort_key, Games.id, nullable)
+
+    assert error.value.status_code == 400
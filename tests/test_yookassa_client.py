@@ -0,0 +1,149 @@
+import asyncio
+
+import httpx
+import pytest
+
+from core.payments import client as client_module
+from core.payments.client import PaymentGatewayError, YooKassaClient
+
+
+def make_client(handler, **overrides) -> YooKassaClient:
+    options = {
+        "api_url": "https://yookassa.test/v3",
+        "account_id": "shop",
+        "secret_key": "secret",
+        "timeout": 1.0,
+        "connect_timeout": 1.0,
+        "max_connections": 10,
+        "max_keepalive_connections": 10,
+        "keepalive_expiry": 5.0,
+        "max_concurrency": 10,
+        "max_retries": 2,
+        "retry_backoff": 0.0,
+        "transport": httpx.MockTransport(handler),
+    }
+    options.update(overrides)
+    return YooKassaClient(**options)
+
+
+async def call(yookassa: YooKassaClient, method: str, *args, **kwargs):
+    try:
+        return await getattr(yookassa, method)(*args, **kwargs)
+    finally:
+        await yookassa.close()
+
+
+@pytest.fixture
+def delays(monkeypatch) -> list[float]:
+    """Паузы между попытками записываются, а не выжидаются"""
+    recorded = []
+
+    async def sleep(delay):
+        recorded.append(delay)
+
+    monkeypatch.setattr(client_module.asyncio, "sleep", sleep)
+    return recorded
+
+
+def test_retries_reuse_idempotence_key(delays):
+    keys = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        keys.append(request.headers["Idempotence-Key"])
+        if len(keys) < 3:
+            return httpx.Response(500, json={"code": "internal_server_error"})
+        return httpx.Response(200, json={"id": "p1", "status": "pending"})
+
+    payment = asyncio.run(
+        call(make_client(handler), "create_payment", {"amount": {}}, "key-1")
+    )
+
+    assert payment["id"] == "p1"
+    assert keys == ["key-1", "key-1", "key-1"]
+    assert len(delays) == 2
+
+
+def test_generated_idempotence_key_is_kept_between_attempts(delays):
+    keys = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        keys.append(request.headers["Idempotence-Key"])
+        if len(keys) == 1:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"id": "p1"})
+
+    asyncio.run(call(make_client(handler), "create_payment", {"amount": {}}))
+
+    assert len(keys) == 2
+    assert keys[0] == keys[1]
+
+
+def test_202_waits_retry_after(delays):
+    responses = iter(
+        [
+            httpx.Response(202, json={"type": "processing", "retry_after": 1500}),
+            httpx.Response(200, json={"id": "p1", "status": "succeeded"}),
+        ]
+    )
+
+    payment = asyncio.run(
+        call(make_client(lambda request: next(responses)), "capture_payment", "p1")
+    )
+
+    assert payment["status"] == "succeeded"
+    assert delays == [1.5]
+
+
+def test_202_on_last_attempt_raises(delays):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(202, json={"retry_after": 100})
+
+    with pytest.raises(PaymentGatewayError) as error:
+        asyncio.run(call(make_client(handler), "find_payment", "p1"))
+
+    assert error.value.status_code == 202
+    assert delays == [0.1, 0.1]
+
+
+def test_transport_error_raises_after_last_attempt(delays):
+    attempts = 0
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal attempts
+        attempts += 1
+        raise httpx.ConnectError("connection refused", request=request)
+
+    with pytest.raises(PaymentGatewayError) as error:
+        asyncio.run(call(make_client(handler), "find_payment", "p1"))
+
+    assert attempts == 3
+    assert error.value.status_code == 503
+    assert error.value.code == "transport_error"
+    assert isinstance(error.value.__cause__, httpx.ConnectError)
+
+
+def test_semaphore_caps_concurrent_requests():
+    active = 0
+    peak = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return httpx.Response(200, json={"id": request.url.path.rsplit("/", 1)[-1]})
+
+    async def main():
+        yookassa = make_client(handler, max_concurrency=2)
+        try:
+            return await asyncio.gather(
+                *(yookassa.find_payment(f"p{i}") for i in range(6))
+            )
+        finally:
+            await yookassa.close()
+
+    payments = asyncio.run(main())
+
+    assert [payment["id"] for payment in payments] == [f"p{i}" for i in range(6)]
+    assert peak == 2